@@ -0,0 +1,631 @@
+"""
+Alert Engine - Watchlist alert rules evaluated incrementally on new bars and scores
+Rules are indexed by ticker, so each update only evaluates the rules of tickers that changed
+"""
+
+import asyncio
+import ipaddress
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import List, Dict, Optional, Iterable
+from urllib.parse import urlsplit
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from config import CACHE_DIR, ALERT_WEBHOOK_URL, ALERT_WEBHOOK_TIMEOUT
+from price_store import PriceSeries
+
+
+# Condition name -> message template
+CONDITIONS = {
+    'cross_above_ma': "Price crossed above its {window}-day moving average",
+    'cross_below_ma': "Price crossed below its {window}-day moving average",
+    'rsi_below': "RSI(14) dropped below {threshold:g}",
+    'rsi_above': "RSI(14) rose above {threshold:g}",
+    'price_above': "Price rose above {threshold:g}",
+    'price_below': "Price fell below {threshold:g}",
+    'recommendation': "Screener recommendation changed to {value}",
+}
+PRICE_CONDITIONS = frozenset(CONDITIONS) - {'recommendation'}
+SCORE_CONDITIONS = frozenset({'recommendation'})
+
+MA_WINDOWS = (20, 50, 100, 200)
+RSI_WINDOW = 14
+DEFAULT_RSI_THRESHOLDS = {'rsi_below': 30.0, 'rsi_above': 70.0}
+RECOMMENDATIONS = ('Buy', 'Hold', 'Avoid')
+
+# Rule changes kept in the shared change log; a worker further behind than this reloads every rule
+CHANGE_LOG_SIZE = 10000
+
+_EPOCH_DAY = pd.Timestamp('1970-01-01')
+
+
+class IndicatorState:
+    """
+    One ticker's rolling close window and Wilder RSI averages, updated one bar at a time
+    
+    A bar for the same day as the last one replaces it, so intraday quotes can revise
+    today's provisional bar until the daily close arrives. The RSI matches the screener's
+    (exponential smoothing with alpha 1/14, valid after 14 bars).
+    """
+    
+    __slots__ = ('day', 'closes', 'bars', 'avg_gain', 'avg_loss', '_before_last')
+    
+    def __init__(self):
+        self.day: Optional[int] = None
+        self.closes: deque = deque(maxlen=max(MA_WINDOWS))
+        self.bars = 0
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        # (avg_gain, avg_loss, previous close) before the last bar, to revise it
+        self._before_last = (0.0, 0.0, None)
+    
+    @classmethod
+    def from_series(cls, days: np.ndarray, closes: np.ndarray) -> 'IndicatorState':
+        """State after a whole history, computed in one vectorized pass"""
+        state = cls()
+        valid = np.isfinite(closes)
+        days, closes = days[valid].tolist(), closes[valid].astype(np.float64)
+        if not days:
+            return state
+        change = np.diff(closes, prepend=closes[0])
+        smooth = lambda x: pd.Series(x).ewm(alpha=1 / RSI_WINDOW, adjust=False).mean().to_numpy()
+        gains, losses = smooth(np.maximum(change, 0.0)), smooth(np.maximum(-change, 0.0))
+        state.day = days[-1]
+        state.closes.extend(closes[-state.closes.maxlen:].tolist())
+        state.bars = len(days)
+        state.avg_gain, state.avg_loss = float(gains[-1]), float(losses[-1])
+        if len(days) > 1:
+            state._before_last = (float(gains[-2]), float(losses[-2]), float(closes[-2]))
+        return state
+    
+    def update(self, day: int, close: float) -> bool:
+        """Apply a daily bar (day number since 1970-01-01); False if it is older than the last one"""
+        if not np.isfinite(close) or (self.day is not None and day < self.day):
+            return False
+        if day == self.day:
+            self.closes.pop()
+            self.bars -= 1
+            self.avg_gain, self.avg_loss, previous = self._before_last
+        else:
+            previous = self.closes[-1] if self.closes else None
+            self._before_last = (self.avg_gain, self.avg_loss, previous)
+        
+        change = close - previous if previous is not None else 0.0
+        gain, loss = max(change, 0.0), max(-change, 0.0)
+        if self.bars == 0:
+            self.avg_gain, self.avg_loss = gain, loss
+        else:
+            self.avg_gain += (gain - self.avg_gain) / RSI_WINDOW
+            self.avg_loss += (loss - self.avg_loss) / RSI_WINDOW
+        self.closes.append(close)
+        self.bars += 1
+        self.day = day
+        return True
+    
+    def snapshot(self) -> Dict:
+        """Latest price, moving averages (windows with enough bars) and RSI (None before 14 bars)"""
+        rsi = None
+        if self.bars >= RSI_WINDOW:
+            rsi = 100.0 if self.avg_loss == 0 else 100 - 100 / (1 + self.avg_gain / self.avg_loss)
+        return {
+            'price': self.closes[-1],
+            'ma': {w: sum(islice(reversed(self.closes), w)) / w for w in MA_WINDOWS if len(self.closes) >= w},
+            'rsi': rsi,
+        }
+
+
+class AlertRule:
+    """A user's condition on one ticker; state is the condition's last evaluated value"""
+    
+    __slots__ = ('id', 'user', 'ticker', 'condition', 'threshold', 'window', 'value', 'webhook',
+                 'created_at', 'state', 'last_fired_at')
+    
+    def __init__(self, id: int, user: str, ticker: str, condition: str, threshold: Optional[float],
+                 window: Optional[int], value: Optional[str], webhook: Optional[str], created_at: float,
+                 state: Optional[bool] = None, last_fired_at: Optional[float] = None):
+        self.id = id
+        self.user = user
+        self.ticker = ticker
+        self.condition = condition
+        self.threshold = threshold
+        self.window = window
+        self.value = value
+        self.webhook = webhook
+        self.created_at = created_at
+        self.state = state
+        self.last_fired_at = last_fired_at
+    
+    def check(self, snapshot: Optional[Dict], recommendation: Optional[str]) -> Optional[bool]:
+        """Whether the condition holds now, or None when there is not enough data yet"""
+        if self.condition == 'recommendation':
+            return None if recommendation is None else recommendation == self.value
+        if snapshot is None:
+            return None
+        price = snapshot['price']
+        if self.condition in ('cross_above_ma', 'cross_below_ma'):
+            ma = snapshot['ma'].get(self.window)
+            if ma is None:
+                return None
+            return price > ma if self.condition == 'cross_above_ma' else price < ma
+        if self.condition in ('rsi_below', 'rsi_above'):
+            rsi = snapshot['rsi']
+            if rsi is None:
+                return None
+            return rsi < self.threshold if self.condition == 'rsi_below' else rsi > self.threshold
+        return price > self.threshold if self.condition == 'price_above' else price < self.threshold
+    
+    def message(self) -> str:
+        return CONDITIONS[self.condition].format(window=self.window, threshold=self.threshold or 0, value=self.value)
+    
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.id,
+            'user': self.user,
+            'ticker': self.ticker,
+            'condition': self.condition,
+            'threshold': self.threshold,
+            'window': self.window,
+            'value': self.value,
+            'webhook': self.webhook,
+            'created_at': self.created_at,
+            'state': self.state,
+            'last_fired_at': self.last_fired_at,
+        }
+
+
+class AlertListener:
+    """A local consumer of fired alerts (e.g. an SSE client), fed from any thread"""
+    
+    def __init__(self, user: Optional[str], loop: asyncio.AbstractEventLoop, max_queue: int = 100):
+        self.user = user
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._loop = loop
+    
+    def push(self, event: Dict):
+        if self.user is None or event['user'] == self.user:
+            self._loop.call_soon_threadsafe(self._put, event)
+    
+    def _put(self, event: Dict):
+        """Queue an event, dropping the oldest one if a slow client has fallen behind"""
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(event)
+
+
+class AlertEngine:
+    """
+    Alert rules in SQLite, indexed in memory by ticker
+    
+    Price rules are evaluated when new daily bars load (on_series) or live quotes arrive
+    (on_quotes); recommendation rules when screen or daily-picks scores are recorded
+    (on_scores). Each update costs the rules of the tickers it touches, independent of how
+    many rules exist in total.
+    
+    Rules are edge-triggered: a rule fires when its condition turns from false to true, so a
+    new rule whose condition already holds waits for the next crossing. The transition is
+    claimed with a conditional UPDATE, so when several workers see the same bar only one of
+    them fires. Fired alerts are stored, pushed to local listeners and POSTed to the rule's
+    webhook (or ALERT_WEBHOOK_URL) in the background.
+    
+    Every added or removed rule is appended to a change log, from which other workers reload
+    only the rules that changed.
+    """
+    
+    def __init__(self, db_path: str = None, webhook_url: Optional[str] = ALERT_WEBHOOK_URL,
+                 webhook_timeout: float = ALERT_WEBHOOK_TIMEOUT):
+        self.db_path = db_path or os.path.join(CACHE_DIR, 'alerts.sqlite')
+        self.webhook_url = webhook_url
+        self.webhook_timeout = webhook_timeout
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._rules: Dict[str, Dict[int, AlertRule]] = {}
+        self._rule_tickers: Dict[int, str] = {}
+        self._indicators: Dict[str, IndicatorState] = {}
+        self._recommendations: Dict[str, str] = {}
+        self._listeners: List[AlertListener] = []
+        self._webhooks = ThreadPoolExecutor(max_workers=2, thread_name_prefix='alert-webhook')
+        self._rules_version = None
+        self.counters = {'bar_updates': 0, 'score_updates': 0, 'rules_evaluated': 0, 'fired': 0,
+                         'webhook_sent': 0, 'webhook_errors': 0}
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS alert_rules (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user TEXT NOT NULL,
+                    ticker TEXT NOT NULL,
+                    condition TEXT NOT NULL,
+                    threshold REAL,
+                    ma_window INTEGER,
+                    value TEXT,
+                    webhook TEXT,
+                    created_at REAL NOT NULL,
+                    state INTEGER,
+                    last_fired_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS alert_rules_ticker ON alert_rules (ticker);
+                CREATE INDEX IF NOT EXISTS alert_rules_user ON alert_rules (user);
+                CREATE TABLE IF NOT EXISTS alert_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    rule_id INTEGER NOT NULL,
+                    user TEXT NOT NULL,
+                    ticker TEXT NOT NULL,
+                    condition TEXT NOT NULL,
+                    message TEXT NOT NULL,
+                    price REAL,
+                    fired_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS alert_events_user ON alert_events (user, id);
+                CREATE TABLE IF NOT EXISTS alert_rule_changes (
+                    version INTEGER PRIMARY KEY AUTOINCREMENT,
+                    rule_id INTEGER NOT NULL
+                );
+            """)
+            self._conn.commit()
+            self._sync_rules()
+    
+    def add_rule(self, user: str, ticker: str, condition: str, threshold: Optional[float] = None,
+                 window: Optional[int] = None, value: Optional[str] = None,
+                 webhook: Optional[str] = None) -> Dict:
+        """
+        Create an alert rule
+        
+        Args:
+            user: Owner of the rule
+            ticker: Stock ticker symbol
+            condition: One of CONDITIONS
+            threshold: Level for rsi_* (default 30 / 70) and price_* (required) conditions
+            window: Moving-average length for cross_*_ma (one of MA_WINDOWS, default 200)
+            value: Recommendation to alert on for 'recommendation' (default 'Buy')
+            webhook: URL to POST this rule's alerts to instead of the default webhook; must be
+                http(s) and resolve to public addresses only
+        
+        Returns:
+            The stored rule
+        """
+        user, ticker = (user or '').strip(), (ticker or '').upper().strip()
+        if not user or not ticker:
+            raise ValueError("user and ticker are required")
+        if condition not in CONDITIONS:
+            raise ValueError(f"Unknown condition '{condition}'. Choose from: {', '.join(CONDITIONS)}")
+        if condition in ('cross_above_ma', 'cross_below_ma'):
+            window = window or max(MA_WINDOWS)
+            if window not in MA_WINDOWS:
+                raise ValueError(f"window must be one of {', '.join(map(str, MA_WINDOWS))}")
+            threshold = value = None
+        elif condition in DEFAULT_RSI_THRESHOLDS:
+            threshold = DEFAULT_RSI_THRESHOLDS[condition] if threshold is None else threshold
+            if not 0 < threshold < 100:
+                raise ValueError("RSI threshold must be between 0 and 100")
+            window = value = None
+        elif condition == 'recommendation':
+            value = (value or 'Buy').capitalize()
+            if value not in RECOMMENDATIONS:
+                raise ValueError(f"value must be one of {', '.join(RECOMMENDATIONS)}")
+            threshold = window = None
+        else:
+            if threshold is None or threshold <= 0:
+                raise ValueError(f"{condition} needs a positive price threshold")
+            window = value = None
+        if webhook:
+            check_webhook_url(webhook)
+        
+        now = time.time()
+        with self._lock:
+            self._sync_rules()
+            cursor = self._conn.execute(
+                "INSERT INTO alert_rules (user, ticker, condition, threshold, ma_window, value, webhook, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (user, ticker, condition, threshold, window, value, webhook or None, now)
+            )
+            rule = AlertRule(cursor.lastrowid, user, ticker, condition, threshold, window, value, webhook or None, now)
+            self._index(rule)
+            self._record_change(rule.id)
+            self._conn.commit()
+            # Arm the rule against what is already known, without firing
+            recommendation = self._recommendations.get(ticker)
+            state = self._indicators.get(ticker)
+            self._apply([rule], state.snapshot() if state else None, recommendation)
+        return rule.to_dict()
+    
+    def remove_rule(self, rule_id: int, user: str) -> bool:
+        """Delete a rule owned by user; False if user has no such rule"""
+        with self._lock:
+            self._sync_rules()
+            removed = self._conn.execute(
+                "DELETE FROM alert_rules WHERE id = ? AND user = ?", (rule_id, (user or '').strip())
+            ).rowcount > 0
+            if removed:
+                self._unindex(rule_id)
+                self._record_change(rule_id)
+            self._conn.commit()
+        return removed
+    
+    def rules(self, user: Optional[str] = None, ticker: Optional[str] = None) -> List[Dict]:
+        """Rules, optionally for one user and/or ticker"""
+        with self._lock:
+            self._sync_rules()
+            tickers = [ticker.upper().strip()] if ticker else list(self._rules)
+            found = [
+                rule.to_dict() for t in tickers for rule in self._rules.get(t, {}).values()
+                if user is None or rule.user == user
+            ]
+        return sorted(found, key=lambda r: r['id'])
+    
+    def tickers(self) -> List[str]:
+        """Tickers with at least one rule"""
+        with self._lock:
+            self._sync_rules()
+            return sorted(self._rules)
+    
+    def on_series(self, series: PriceSeries) -> List[Dict]:
+        """
+        New daily bars for a ticker (e.g. a refreshed price history)
+        
+        Only bars on or after the last one seen are applied; a ticker seen for the first
+        time is seeded from the whole series.
+        """
+        if len(series) == 0:
+            return []
+        closes = series.column('Close')
+        with self._lock:
+            self._sync_rules()
+            rules = self._rules.get(series.ticker)
+            if not rules:
+                return []
+            state = self._indicators.get(series.ticker)
+            if state is None:
+                state = self._indicators[series.ticker] = IndicatorState.from_series(series.days, closes)
+                if state.day is None:
+                    return []
+            else:
+                start = int(np.searchsorted(series.days, state.day, side='left'))
+                changed = False
+                for day, close in zip(series.days[start:].tolist(), closes[start:].tolist()):
+                    changed |= state.update(day, close)
+                if not changed:
+                    return []
+            self.counters['bar_updates'] += 1
+            fired = self._apply(self._matching(rules, PRICE_CONDITIONS), state.snapshot(), None)
+        self._dispatch(fired)
+        return fired
+    
+    def on_quotes(self, quotes: Dict[str, Dict]) -> List[Dict]:
+        """
+        Live quotes ({ticker: {'price', 'timestamp'}}) revise today's bar for tickers with rules
+        
+        Tickers whose daily history has not been loaded yet are skipped: a moving average
+        needs the preceding bars.
+        """
+        fired = []
+        with self._lock:
+            self._sync_rules()
+            for ticker, quote in quotes.items():
+                rules = self._rules.get(ticker)
+                state = self._indicators.get(ticker)
+                if not rules or state is None or quote.get('price') is None:
+                    continue
+                if not state.update(_day_number(quote.get('timestamp')), float(quote['price'])):
+                    continue
+                self.counters['bar_updates'] += 1
+                fired += self._apply(self._matching(rules, PRICE_CONDITIONS), state.snapshot(), None)
+        self._dispatch(fired)
+        return fired
+    
+    def on_scores(self, results: Iterable[Dict]) -> List[Dict]:
+        """Screen or daily-picks rows with 'ticker' and 'recommendation'"""
+        fired = []
+        with self._lock:
+            self._sync_rules()
+            for row in results:
+                ticker, recommendation = row.get('ticker'), row.get('recommendation')
+                if recommendation is None or ticker not in self._rules:
+                    continue
+                self._recommendations[ticker] = recommendation
+                self.counters['score_updates'] += 1
+                fired += self._apply(self._matching(self._rules[ticker], SCORE_CONDITIONS), None, recommendation)
+        self._dispatch(fired)
+        return fired
+    
+    def events(self, user: Optional[str] = None, since_id: int = 0, limit: int = 100) -> List[Dict]:
+        """Fired alerts after since_id, oldest first (from every worker)"""
+        query = "SELECT id, rule_id, user, ticker, condition, message, price, fired_at FROM alert_events WHERE id > ?"
+        params: list = [since_id]
+        if user is not None:
+            query += " AND user = ?"
+            params.append(user)
+        query += " ORDER BY id LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        columns = ['id', 'rule_id', 'user', 'ticker', 'condition', 'message', 'price', 'fired_at']
+        return [dict(zip(columns, row)) for row in rows]
+    
+    def listen(self, user: Optional[str] = None) -> AlertListener:
+        """Register a local listener on the running event loop (all users when user is None)"""
+        listener = AlertListener(user, asyncio.get_running_loop())
+        with self._lock:
+            self._listeners.append(listener)
+        return listener
+    
+    def unlisten(self, listener: AlertListener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+    
+    def stats(self) -> Dict:
+        """Rule counts, indicator states and evaluation/delivery counters"""
+        with self._lock:
+            self._sync_rules()
+            return {
+                'rules': sum(len(rules) for rules in self._rules.values()),
+                'tickers': len(self._rules),
+                'tracked_tickers': len(self._indicators),
+                'listeners': len(self._listeners),
+                'webhook_url': self.webhook_url,
+                **self.counters,
+            }
+    
+    def _matching(self, rules: Dict[int, AlertRule], conditions: frozenset) -> List[AlertRule]:
+        return [rule for rule in rules.values() if rule.condition in conditions]
+    
+    def _apply(self, rules: List[AlertRule], snapshot: Optional[Dict], recommendation: Optional[str]) -> List[Dict]:
+        """Evaluate rules and record state transitions; returns the alerts that fired"""
+        fired = []
+        now = time.time()
+        self.counters['rules_evaluated'] += len(rules)
+        for rule in rules:
+            holds = rule.check(snapshot, recommendation)
+            if holds is None or holds == rule.state:
+                continue
+            rule.state = holds
+            if not holds:
+                self._conn.execute("UPDATE alert_rules SET state = 0 WHERE id = ?", (rule.id,))
+                continue
+            # Only the worker that flips false -> true fires; unarmed rules are just armed
+            claimed = self._conn.execute(
+                "UPDATE alert_rules SET state = 1, last_fired_at = ? WHERE id = ? AND state = 0", (now, rule.id)
+            ).rowcount
+            if not claimed:
+                self._conn.execute("UPDATE alert_rules SET state = 1 WHERE id = ? AND state IS NULL", (rule.id,))
+                continue
+            rule.last_fired_at = now
+            price = snapshot['price'] if snapshot else None
+            cursor = self._conn.execute(
+                "INSERT INTO alert_events (rule_id, user, ticker, condition, message, price, fired_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (rule.id, rule.user, rule.ticker, rule.condition, rule.message(), price, now)
+            )
+            fired.append({
+                'id': cursor.lastrowid, 'rule_id': rule.id, 'user': rule.user, 'ticker': rule.ticker,
+                'condition': rule.condition, 'message': rule.message(), 'price': price, 'fired_at': now,
+                'webhook': rule.webhook,
+            })
+        self._conn.commit()
+        self.counters['fired'] += len(fired)
+        return fired
+    
+    def _dispatch(self, fired: List[Dict]):
+        """Push fired alerts to local listeners and webhooks (one POST per URL)"""
+        if not fired:
+            return
+        with self._lock:
+            listeners = list(self._listeners)
+        by_url: Dict[str, List[Dict]] = {}
+        for alert in fired:
+            event = {k: v for k, v in alert.items() if k != 'webhook'}
+            for listener in listeners:
+                listener.push(event)
+            url = alert['webhook'] or self.webhook_url
+            if url:
+                by_url.setdefault(url, []).append(event)
+        for url, events in by_url.items():
+            self._webhooks.submit(self._post, url, events)
+    
+    def _post(self, url: str, events: List[Dict]):
+        try:
+            httpx.post(url, json={'alerts': events}, timeout=self.webhook_timeout).raise_for_status()
+            outcome = 'webhook_sent'
+        except httpx.HTTPError as e:
+            outcome = 'webhook_errors'
+            print(f"Alert webhook {url} failed: {e}")
+        with self._lock:
+            self.counters[outcome] += 1
+    
+    def _index(self, rule: AlertRule):
+        self._rules.setdefault(rule.ticker, {})[rule.id] = rule
+        self._rule_tickers[rule.id] = rule.ticker
+    
+    def _unindex(self, rule_id: int):
+        ticker = self._rule_tickers.pop(rule_id, None)
+        rules = self._rules.get(ticker)
+        if rules is not None and rules.pop(rule_id, None) is not None and not rules:
+            del self._rules[ticker]
+            self._indicators.pop(ticker, None)
+    
+    def _record_change(self, rule_id: int):
+        """Log a rule change for other workers; this worker has already applied it to its index"""
+        version = self._conn.execute("INSERT INTO alert_rule_changes (rule_id) VALUES (?)", (rule_id,)).lastrowid
+        if version == self._rules_version + 1:
+            self._rules_version = version
+        if version % 1000 == 0:
+            self._conn.execute("DELETE FROM alert_rule_changes WHERE version <= ?", (version - CHANGE_LOG_SIZE,))
+    
+    def _sync_rules(self):
+        """Apply rules other workers added or removed since the last sync (call with the lock held)"""
+        if self._rules_version is None:
+            self._load_rules()
+            return
+        changes = self._conn.execute(
+            "SELECT version, rule_id FROM alert_rule_changes WHERE version > ? ORDER BY version", (self._rules_version,)
+        ).fetchall()
+        if not changes:
+            return
+        if changes[0][0] != self._rules_version + 1:
+            # The log was trimmed past this worker's position
+            self._load_rules()
+            return
+        
+        changed = list({rule_id for _, rule_id in changes})
+        stored = {rule.id: rule for rule in self._read_rules("WHERE id IN (%s)" % ', '.join('?' * len(changed)), changed)}
+        for rule_id in changed:
+            if rule_id not in stored:
+                self._unindex(rule_id)
+            elif rule_id not in self._rule_tickers:
+                self._index(stored[rule_id])
+        self._rules_version = changes[-1][0]
+    
+    def _load_rules(self):
+        """Rebuild the whole rule index from the database"""
+        version = self._conn.execute("SELECT COALESCE(MAX(version), 0) FROM alert_rule_changes").fetchone()[0]
+        self._rules, self._rule_tickers = {}, {}
+        for rule in self._read_rules("", []):
+            self._index(rule)
+        self._rules_version = version
+        self._indicators = {t: s for t, s in self._indicators.items() if t in self._rules}
+    
+    def _read_rules(self, where: str, params: List) -> List[AlertRule]:
+        rows = self._conn.execute(
+            "SELECT id, user, ticker, condition, threshold, ma_window, value, webhook, created_at, state, last_fired_at "
+            f"FROM alert_rules {where}", params
+        ).fetchall()
+        return [AlertRule(*row[:9], state=None if row[9] is None else bool(row[9]), last_fired_at=row[10]) for row in rows]
+
+
+def check_webhook_url(url: str):
+    """Raise ValueError unless url is http(s) and its host resolves only to public addresses"""
+    try:
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+    except ValueError:
+        raise ValueError("webhook is not a valid URL")
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ValueError("webhook must be an http or https URL")
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(parts.hostname, port, proto=socket.IPPROTO_TCP)}
+    except (socket.gaierror, UnicodeError):
+        raise ValueError(f"webhook host '{parts.hostname}' could not be resolved")
+    for address in addresses:
+        if not ipaddress.ip_address(address.split('%')[0]).is_global:
+            raise ValueError("webhook must point to a public host, not a private, loopback or reserved address")
+
+
+def _day_number(timestamp: Optional[str]) -> int:
+    """Days since 1970-01-01 of a quote timestamp's (exchange-local) date; today when missing"""
+    moment = pd.Timestamp(timestamp) if timestamp else pd.Timestamp.now()
+    if moment.tz is not None:
+        moment = moment.tz_localize(None)
+    return (moment.normalize() - _EPOCH_DAY).days
@@ -0,0 +1,234 @@
+"""
+Screener Backtester - Walk-forward replay of the screener scoring model
+Forms top-N portfolios at each rebalance date and measures forward returns, hit rate and turnover
+"""
+
+import numpy as np
+import pandas as pd
+from typing import List, Dict, Optional, Tuple
+
+from config import BENCHMARK_TICKER
+from market_data import PriceHistoryCache
+from stock_screener import StockScreener
+
+
+class ScreenerBacktester:
+    """Vectorized walk-forward backtest of StockScreener's technical and risk scores"""
+    
+    def __init__(self, screener: StockScreener = None, price_cache: PriceHistoryCache = None,
+                 benchmark: str = BENCHMARK_TICKER):
+        self.screener = screener or StockScreener()
+        self.price_cache = price_cache or PriceHistoryCache()
+        self.benchmark = benchmark
+        self.warmup_days = 200  # technical_score needs 200 bars
+        self.chunk_size = 32  # Weight combinations evaluated per batch
+    
+    def prepare(self, tickers: List[str], period: str = '10y') -> Dict[str, pd.DataFrame]:
+        """
+        Load the close panel and replay the technical and risk scores for every date
+        
+        Args:
+            tickers: Universe to backtest
+            period: History length to load (e.g. '5y', '10y')
+        
+        Returns:
+            Dict with 'close', 'technical', 'risk' panels (dates x tickers) and 'benchmark' series
+        """
+        tickers = [t.upper().strip() for t in tickers]
+        panel = self.price_cache.get_panel(tickers + [self.benchmark], period=period, fields=['Close'])
+        close = panel['Close'].ffill(limit=5)
+        
+        benchmark = close[self.benchmark] if self.benchmark in close.columns else None
+        close = close[[t for t in dict.fromkeys(tickers) if t in close.columns]]
+        if close.empty:
+            raise ValueError("No price history available for the requested tickers")
+        
+        return {
+            'close': close,
+            'benchmark': benchmark,
+            'technical': self.screener.technical_score_panel(close),
+            'risk': self.screener.risk_score_panel(close, benchmark),
+        }
+    
+    def run(self, tickers: List[str], period: str = '10y', top_n: int = 10,
+            rebalance_days: int = 21, weights: Optional[Tuple[float, float, float]] = None,
+            fundamental_scores: Optional[Dict[str, float]] = None) -> Dict:
+        """
+        Backtest a single weighting (defaults to the screener's own weights)
+        
+        Args:
+            tickers: Universe to backtest
+            period: History length to load
+            top_n: Number of stocks held between rebalances
+            rebalance_days: Trading days between rebalances (also the holding period)
+            weights: (fundamental, technical, risk) weights
+            fundamental_scores: Optional current fundamental score per ticker, held constant over
+                the whole backtest (fundamentals have no point-in-time history, so this adds look-ahead)
+        
+        Returns:
+            Backtest statistics for the weighting
+        """
+        if weights is None:
+            weights = (self.screener.fundamental_weight, self.screener.technical_weight, self.screener.risk_weight)
+        prepared = self.prepare(tickers, period)
+        return self.evaluate(prepared, [weights], top_n, rebalance_days, fundamental_scores)[0]
+    
+    def sweep(self, tickers: List[str], weight_grid: List[Tuple[float, float, float]],
+              period: str = '10y', top_n: int = 10, rebalance_days: int = 21,
+              fundamental_scores: Optional[Dict[str, float]] = None) -> List[Dict]:
+        """
+        Backtest many weightings against one set of replayed scores
+        
+        Returns:
+            Backtest statistics per weighting, best annualized return first
+        """
+        prepared = self.prepare(tickers, period)
+        results = self.evaluate(prepared, weight_grid, top_n, rebalance_days, fundamental_scores)
+        results.sort(key=lambda x: x['annualized_return'], reverse=True)
+        return results
+    
+    def evaluate(self, prepared: Dict[str, pd.DataFrame], weight_grid: List[Tuple[float, float, float]],
+                 top_n: int = 10, rebalance_days: int = 21,
+                 fundamental_scores: Optional[Dict[str, float]] = None,
+                 buy_cutoff: float = 20, hold_cutoff: float = 15) -> List[Dict]:
+        """
+        Evaluate weightings on prepared score panels
+        
+        All weightings, rebalance dates and tickers are scored and ranked as one
+        (weights x dates x tickers) array, so a sweep costs a few array operations.
+        """
+        close = prepared['close']
+        n_days = len(close)
+        rows = np.arange(self.warmup_days, n_days - rebalance_days, rebalance_days)
+        if len(rows) < 2:
+            raise ValueError("Not enough history for a walk-forward backtest")
+        
+        prices = close.values
+        technical = prepared['technical'].values[rows]
+        risk = prepared['risk'].values[rows]
+        forward = prices[rows + rebalance_days] / prices[rows] - 1
+        tradeable = ~np.isnan(technical) & ~np.isnan(risk) & ~np.isnan(prices[rows])
+        
+        fundamental = np.zeros(close.shape[1])
+        if fundamental_scores:
+            fundamental = np.array([fundamental_scores.get(t, 0.0) for t in close.columns], dtype=float)
+        
+        universe = np.where(tradeable, forward, np.nan)
+        universe_return = np.nanmean(universe, axis=1)
+        benchmark_return = None
+        if prepared.get('benchmark') is not None:
+            bench = prepared['benchmark'].values
+            benchmark_return = bench[rows + rebalance_days] / bench[rows] - 1
+        
+        results = []
+        grid = np.asarray(weight_grid, dtype=float).reshape(-1, 3)
+        for start in range(0, len(grid), self.chunk_size):
+            chunk = grid[start:start + self.chunk_size]
+            total = (
+                chunk[:, 0, None, None] * fundamental[None, None, :] +
+                chunk[:, 1, None, None] * technical[None] +
+                chunk[:, 2, None, None] * risk[None]
+            )
+            total = np.where(tradeable[None], total, -np.inf)
+            stats = self._portfolio_stats(total, forward, universe, universe_return,
+                                          top_n, rebalance_days, buy_cutoff, hold_cutoff)
+            for i, weights in enumerate(chunk):
+                result = {key: value[i] for key, value in stats.items()}
+                result['weights'] = {
+                    'fundamental': float(weights[0]),
+                    'technical': float(weights[1]),
+                    'risk': float(weights[2]),
+                }
+                result['periods'] = len(rows)
+                result['start_date'] = close.index[rows[0]].strftime('%Y-%m-%d')
+                result['end_date'] = close.index[rows[-1] + rebalance_days].strftime('%Y-%m-%d')
+                result['universe_avg_period_return'] = round(float(np.nanmean(universe_return)) * 100, 3)
+                if benchmark_return is not None:
+                    result['benchmark_avg_period_return'] = round(float(np.nanmean(benchmark_return)) * 100, 3)
+                results.append(result)
+        
+        return results
+    
+    def _portfolio_stats(self, total: np.ndarray, forward: np.ndarray, universe: np.ndarray,
+                         universe_return: np.ndarray, top_n: int, rebalance_days: int,
+                         buy_cutoff: float, hold_cutoff: float) -> Dict[str, List]:
+        """Top-N selection and performance statistics for a (weights x dates x tickers) score array"""
+        # Stable sort keeps input order for tied scores, like screen_stocks()
+        order = np.argsort(-total, axis=2, kind='stable')[..., :top_n]
+        picked_score = np.take_along_axis(total, order, axis=2)
+        picked_valid = np.isfinite(picked_score)
+        picked_forward = np.take_along_axis(np.broadcast_to(forward, total.shape), order, axis=2)
+        picked_forward = np.where(picked_valid, picked_forward, np.nan)
+        
+        with np.errstate(invalid='ignore'):
+            # Equal-weight portfolio return per rebalance period
+            period_return = np.nanmean(picked_forward, axis=2)
+            excess = period_return - universe_return[None, :]
+            
+            # Share of picks that beat the equal-weight universe over their holding period
+            beat = picked_forward > universe_return[None, :, None]
+            hit_rate = np.where(~np.isnan(picked_forward), beat, False).sum(axis=(1, 2)) / \
+                np.maximum((~np.isnan(picked_forward)).sum(axis=(1, 2)), 1)
+        
+        # Turnover: share of the portfolio replaced at each rebalance
+        selected = np.zeros(total.shape, dtype=bool)
+        np.put_along_axis(selected, order, picked_valid, axis=2)
+        entered = (selected[:, 1:] & ~selected[:, :-1]).sum(axis=2)
+        held = np.maximum(selected[:, 1:].sum(axis=2), 1)
+        turnover = (entered / held).mean(axis=1)
+        
+        periods_per_year = 252 / rebalance_days
+        clean_return = np.nan_to_num(period_return)
+        cumulative = np.prod(1 + clean_return, axis=1) - 1
+        years = total.shape[1] / periods_per_year
+        annualized = (1 + cumulative) ** (1 / years) - 1
+        volatility = clean_return.std(axis=1, ddof=1) * np.sqrt(periods_per_year)
+        sharpe = np.where(volatility > 0, clean_return.mean(axis=1) * periods_per_year / np.where(volatility > 0, volatility, 1), 0)
+        
+        stats = {
+            'avg_period_return': [round(float(v) * 100, 3) for v in np.nanmean(period_return, axis=1)],
+            'cumulative_return': [round(float(v) * 100, 2) for v in cumulative],
+            'annualized_return': [round(float(v) * 100, 2) for v in annualized],
+            'annualized_volatility': [round(float(v) * 100, 2) for v in volatility],
+            'sharpe_ratio': [round(float(v), 3) for v in sharpe],
+            'avg_excess_return': [round(float(v) * 100, 3) for v in np.nanmean(excess, axis=1)],
+            'period_win_rate': [round(float(v) * 100, 1) for v in np.nanmean(excess > 0, axis=1)],
+            'hit_rate': [round(float(v) * 100, 1) for v in hit_rate],
+            'avg_turnover': [round(float(v) * 100, 1) for v in turnover],
+        }
+        stats['recommendations'] = self._bucket_stats(total, universe, universe_return, buy_cutoff, hold_cutoff)
+        return stats
+    
+    @staticmethod
+    def _bucket_stats(total: np.ndarray, universe: np.ndarray, universe_return: np.ndarray,
+                      buy_cutoff: float, hold_cutoff: float) -> List[Dict]:
+        """Forward performance of the Buy/Hold/Avoid buckets implied by the cutoffs"""
+        valid = np.isfinite(total) & ~np.isnan(universe)[None]
+        buckets = {
+            'Buy': valid & (total >= buy_cutoff),
+            'Hold': valid & (total >= hold_cutoff) & (total < buy_cutoff),
+            'Avoid': valid & (total < hold_cutoff),
+        }
+        
+        per_weighting = [{} for _ in range(total.shape[0])]
+        for name, mask in buckets.items():
+            count = mask.sum(axis=(1, 2))
+            returns = np.where(mask, universe[None], 0.0).sum(axis=(1, 2))
+            beat = (mask & (universe[None] > universe_return[None, :, None])).sum(axis=(1, 2))
+            for i in range(total.shape[0]):
+                per_weighting[i][name] = {
+                    'avg_stocks_per_period': round(float(count[i]) / total.shape[1], 2),
+                    'avg_forward_return': round(float(returns[i] / count[i]) * 100, 3) if count[i] else None,
+                    'hit_rate': round(float(beat[i] / count[i]) * 100, 1) if count[i] else None,
+                }
+        return per_weighting
+
+
+def weight_grid(step: float = 0.1) -> List[Tuple[float, float, float]]:
+    """All (fundamental, technical, risk) weightings on a simplex grid that sum to 1"""
+    steps = int(round(1 / step))
+    return [
+        (round(f * step, 4), round(t * step, 4), round((steps - f - t) * step, 4))
+        for f in range(steps + 1)
+        for t in range(steps + 1 - f)
+    ]
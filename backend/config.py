@@ -0,0 +1,97 @@
+"""
+Backend configuration
+Paths and tunables shared by the analysis services (overridable via environment variables)
+"""
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Local cache directory for downloaded price history and derived data
+CACHE_DIR = os.getenv('STOCK_CACHE_DIR', os.path.join(BACKEND_DIR, 'cache'))
+
+# How long cached daily price history is considered fresh
+PRICE_CACHE_MAX_AGE_HOURS = float(os.getenv('PRICE_CACHE_MAX_AGE_HOURS', '12'))
+
+# Benchmark used for beta and relative performance
+BENCHMARK_TICKER = os.getenv('BENCHMARK_TICKER', 'SPY')
+
+# Live quote polling cadence and source ('yahoo' or 'fake' for a local random-walk feed)
+QUOTE_POLL_SECONDS = float(os.getenv('QUOTE_POLL_SECONDS', '15'))
+QUOTE_FEED = os.getenv('QUOTE_FEED', 'yahoo')
+
+# Seconds computed results are shared between identical requests
+ANALYSIS_CACHE_TTL = float(os.getenv('ANALYSIS_CACHE_TTL', '300'))
+SCREEN_CACHE_TTL = float(os.getenv('SCREEN_CACHE_TTL', '600'))
+DAILY_PICKS_CACHE_TTL = float(os.getenv('DAILY_PICKS_CACHE_TTL', '900'))
+
+# Seconds past ANALYSIS_CACHE_TTL an analysis is still served (marked stale) while it is refreshed in the background
+ANALYSIS_STALE_SECONDS = float(os.getenv('ANALYSIS_STALE_SECONDS', str(24 * 3600)))
+
+# Upstream market-data budget: requests per second (with burst), total concurrent requests,
+# and per-class caps that keep headroom for interactive requests
+UPSTREAM_RATE_PER_SECOND = float(os.getenv('UPSTREAM_RATE_PER_SECOND', '10'))
+UPSTREAM_BURST = float(os.getenv('UPSTREAM_BURST', '20'))
+UPSTREAM_MAX_CONCURRENCY = int(os.getenv('UPSTREAM_MAX_CONCURRENCY', '8'))
+UPSTREAM_CLASS_CONCURRENCY = {
+    'interactive': UPSTREAM_MAX_CONCURRENCY,
+    'screen': int(os.getenv('UPSTREAM_SCREEN_CONCURRENCY', '5')),
+    'prefetch': int(os.getenv('UPSTREAM_PREFETCH_CONCURRENCY', '2')),
+}
+
+# Tickers per bulk price download, so large batches yield to interactive requests between chunks
+UPSTREAM_BATCH_SIZE = int(os.getenv('UPSTREAM_BATCH_SIZE', '100'))
+
+# How long tickers that are invalid or have no data are skipped before being retried
+NEGATIVE_CACHE_TTL_SECONDS = float(os.getenv('NEGATIVE_CACHE_TTL_SECONDS', str(6 * 3600)))
+# How long a ticker left out of a bulk download is skipped when a single-ticker check could not confirm it
+NEGATIVE_CACHE_MISS_SECONDS = float(os.getenv('NEGATIVE_CACHE_MISS_SECONDS', '300'))
+
+# Circuit breaker: open when at least this share of recent upstream calls failed,
+# then retry one request after the cooldown
+CIRCUIT_FAILURE_RATE = float(os.getenv('CIRCUIT_FAILURE_RATE', '0.5'))
+CIRCUIT_MIN_CALLS = int(os.getenv('CIRCUIT_MIN_CALLS', '10'))
+CIRCUIT_COOLDOWN_SECONDS = float(os.getenv('CIRCUIT_COOLDOWN_SECONDS', '30'))
+
+# Symbol master (CSV with ticker, name, exchange, sector and optional popularity) used for search
+SYMBOL_MASTER_PATH = os.getenv('SYMBOL_MASTER_PATH', os.path.join(BACKEND_DIR, 'data', 'symbols.csv'))
+
+# Candidates from the price-only first stage that get fundamentals fetched for daily picks
+DAILY_PICKS_SHORTLIST = int(os.getenv('DAILY_PICKS_SHORTLIST', '30'))
+
+# Memory budget for price history held in memory per worker (compact float32 arrays, LRU-evicted)
+PRICE_STORE_MAX_MB = float(os.getenv('PRICE_STORE_MAX_MB', '256'))
+
+# Host-wide cache shared by all API workers, and how long one worker may hold a key's fill lock
+SHARED_CACHE_PATH = os.getenv('SHARED_CACHE_PATH', os.path.join(CACHE_DIR, 'shared_cache.sqlite'))
+SHARED_CACHE_LEASE_SECONDS = float(os.getenv('SHARED_CACHE_LEASE_SECONDS', '120'))
+
+# Seconds company info (yfinance Ticker.info) is reused across requests and workers
+INFO_CACHE_TTL = float(os.getenv('INFO_CACHE_TTL', '3600'))
+
+# Upstream for info, statements and prices: 'yahoo', 'http' for a local JSON server such as fake_upstream.py,
+# or 'synthetic' for a generated in-process universe (synthetic_universe.py)
+MARKET_DATA_SOURCE = os.getenv('MARKET_DATA_SOURCE', 'yahoo')
+MARKET_DATA_URL = os.getenv('MARKET_DATA_URL', 'http://127.0.0.1:8900')
+
+# Size and seed of the synthetic universe; the same seed always generates the same market
+SYNTHETIC_UNIVERSE_SIZE = int(os.getenv('SYNTHETIC_UNIVERSE_SIZE', '2000'))
+SYNTHETIC_UNIVERSE_SEED = int(os.getenv('SYNTHETIC_UNIVERSE_SEED', '42'))
+
+# Default webhook that receives fired watchlist alerts (rules may set their own), and its timeout in seconds
+ALERT_WEBHOOK_URL = os.getenv('ALERT_WEBHOOK_URL') or None
+ALERT_WEBHOOK_TIMEOUT = float(os.getenv('ALERT_WEBHOOK_TIMEOUT', '5'))
+
+# Responses at least this many bytes are gzip-compressed for clients that accept it
+GZIP_MIN_BYTES = int(os.getenv('GZIP_MIN_BYTES', '1000'))
+
+# Upstream HTTP connections per worker: pool size (threads and connections), connect and read timeouts
+# in seconds, and how long idle keep-alive connections are kept for reuse. The pool is never smaller than
+# the scheduler's concurrency limit, so an admitted call never waits for a pool thread.
+UPSTREAM_POOL_SIZE = max(int(os.getenv('UPSTREAM_POOL_SIZE', str(UPSTREAM_MAX_CONCURRENCY))), UPSTREAM_MAX_CONCURRENCY)
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv('UPSTREAM_CONNECT_TIMEOUT', '5'))
+UPSTREAM_READ_TIMEOUT = float(os.getenv('UPSTREAM_READ_TIMEOUT', '30'))
+UPSTREAM_KEEPALIVE_SECONDS = float(os.getenv('UPSTREAM_KEEPALIVE_SECONDS', '60'))
@@ -0,0 +1,257 @@
+"""
+Covariance Service - Rolling covariance and correlation for the screened universe
+Maintains running cross-product sums so each new daily bar costs O(N^2) instead of a full recompute
+"""
+
+import threading
+import time
+import numpy as np
+import pandas as pd
+from typing import List, Dict, Optional
+
+from market_data import PriceHistoryCache
+
+
+class RollingCovariance:
+    """Rolling-window covariance of daily returns, updated one bar at a time"""
+    
+    def __init__(self, tickers: List[str], window: int = 504):
+        self.tickers = list(tickers)
+        self.index = {t: i for i, t in enumerate(self.tickers)}
+        self.window = window
+        n = len(self.tickers)
+        
+        # Ring buffer of the returns currently inside the window
+        self._buffer = np.full((window, n), np.nan)
+        self._position = 0
+        self._filled = 0
+        
+        # Pairwise-complete running sums: counts, sum x_i, sum x_i^2 and sum x_i x_j
+        # over the bars where both i and j have a return
+        self._count = np.zeros((n, n))
+        self._sum = np.zeros((n, n))
+        self._sum_sq = np.zeros((n, n))
+        self._cross = np.zeros((n, n))
+    
+    def load(self, returns: np.ndarray):
+        """Initialise the window from a (bars x tickers) block of returns in one pass"""
+        returns = returns[-self.window:]
+        mask = (~np.isnan(returns)).astype(float)
+        values = np.nan_to_num(returns)
+        
+        self._count = mask.T @ mask
+        self._sum = values.T @ mask
+        self._sum_sq = (values ** 2).T @ mask
+        self._cross = values.T @ values
+        
+        self._buffer[:] = np.nan
+        self._buffer[:len(returns)] = returns
+        self._filled = len(returns)
+        self._position = len(returns) % self.window
+    
+    def update(self, returns: np.ndarray):
+        """Add one bar of returns (one value per ticker, NaN if missing), dropping the oldest bar"""
+        if self._filled == self.window:
+            self._apply(self._buffer[self._position], -1.0)
+        else:
+            self._filled += 1
+        self._apply(returns, 1.0)
+        self._buffer[self._position] = returns
+        self._position = (self._position + 1) % self.window
+    
+    def replace_last(self, returns: np.ndarray):
+        """Swap the newest bar for a revised one (e.g. today's bar once more of the session has traded)"""
+        if self._filled == 0:
+            self.update(returns)
+            return
+        last = (self._position - 1) % self.window
+        self._apply(self._buffer[last], -1.0)
+        self._apply(returns, 1.0)
+        self._buffer[last] = returns
+    
+    def _apply(self, returns: np.ndarray, sign: float):
+        mask = (~np.isnan(returns)).astype(float)
+        values = np.nan_to_num(returns)
+        self._count += sign * np.outer(mask, mask)
+        self._sum += sign * np.outer(values, mask)
+        self._sum_sq += sign * np.outer(values ** 2, mask)
+        self._cross += sign * np.outer(values, values)
+    
+    def covariance(self, tickers: Optional[List[str]] = None) -> np.ndarray:
+        """Sample covariance matrix for a subset of tickers (all by default)"""
+        idx = self._positions(tickers)
+        count = self._count[np.ix_(idx, idx)]
+        sum_i = self._sum[np.ix_(idx, idx)]
+        sum_j = sum_i.T
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = (self._cross[np.ix_(idx, idx)] - sum_i * sum_j / count) / (count - 1)
+        return np.where(count > 1, cov, np.nan)
+    
+    def correlation(self, tickers: Optional[List[str]] = None) -> np.ndarray:
+        """Pairwise-complete correlation matrix for a subset of tickers (all by default)"""
+        idx = self._positions(tickers)
+        count = self._count[np.ix_(idx, idx)]
+        sum_i = self._sum[np.ix_(idx, idx)]
+        sum_j = sum_i.T
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cross = self._cross[np.ix_(idx, idx)] - sum_i * sum_j / count
+            var_i = self._sum_sq[np.ix_(idx, idx)] - sum_i ** 2 / count
+            var_j = var_i.T
+            corr = cross / np.sqrt(var_i * var_j)
+        corr = np.where(count > 1, np.clip(corr, -1, 1), np.nan)
+        np.fill_diagonal(corr, 1.0)
+        return corr
+    
+    def _positions(self, tickers: Optional[List[str]]) -> np.ndarray:
+        if tickers is None:
+            return np.arange(len(self.tickers))
+        return np.array([self.index[t] for t in tickers], dtype=int)
+
+
+class CovarianceService:
+    """
+    Keeps rolling covariance/correlation matrices for the universe up to date
+    
+    The matrices are updated in place, so every read extracts its sub-matrix under the
+    same lock as the refresh that precedes it.
+    """
+    
+    def __init__(self, price_cache: PriceHistoryCache = None, window: int = 504):
+        self.price_cache = price_cache or PriceHistoryCache()
+        self.window = window
+        self._rolling: Optional[RollingCovariance] = None
+        self._last_date: Optional[pd.Timestamp] = None
+        self._checked_at = 0.0
+        self._missing: set = set()  # Requested tickers without usable data, not retried until the next check
+        self._requested_at: Dict[str, float] = {}  # Last request time of each ticker in the universe
+        self.refresh_interval = 300  # Seconds between checks for new bars
+        self.max_universe = 1000  # Tickers kept in the matrices; least recently requested are evicted on rebuild
+        self._lock = threading.Lock()
+    
+    def _refresh(self, tickers: List[str]) -> RollingCovariance:
+        """
+        Bring the matrices up to date for a set of tickers (call with the lock held)
+        
+        A universe that already covers the tickers is rolled forward one O(N^2) update
+        per new bar, after re-ingesting the latest bar it already holds so a bar taken
+        mid-session is revised once the session completes. New tickers trigger a one-off
+        rebuild over the union, capped at max_universe by dropping the tickers requested
+        least recently. Tickers that came back without data count as covered until the
+        next check for new bars.
+        """
+        now = time.time()
+        tickers = list(dict.fromkeys(t.upper().strip() for t in tickers))
+        self._requested_at.update((t, now) for t in tickers)
+        fresh = now - self._checked_at < self.refresh_interval
+        if (self._rolling is not None and fresh and
+                all(t in self._rolling.index or t in self._missing for t in tickers)):
+            return self._rolling
+        
+        universe = self._rolling.tickers if self._rolling else []
+        others = sorted((t for t in universe if t not in tickers), key=lambda t: -self._requested_at.get(t, 0))
+        needed = tickers + others[:max(self.max_universe - len(tickers), 0)]
+        returns = self._load_returns(needed)
+        if not fresh:
+            self._missing = set()
+        self._missing.update(t for t in needed if t not in returns.columns)
+        
+        rebuild = (self._rolling is None or len(needed) < len(tickers) + len(others) or
+                   any(t not in self._rolling.index for t in returns.columns))
+        if rebuild:
+            self._rolling = RollingCovariance(list(returns.columns), self.window)
+            self._rolling.load(returns.values)
+            self._requested_at = {t: self._requested_at[t] for t in needed}
+        elif self._last_date is not None:
+            new_bars = returns[returns.index >= self._last_date].reindex(columns=self._rolling.tickers)
+            rows = new_bars.values
+            if len(new_bars) and new_bars.index[0] == self._last_date:
+                self._rolling.replace_last(rows[0])
+                rows = rows[1:]
+            for row in rows:
+                self._rolling.update(row)
+        
+        if not returns.empty:
+            self._last_date = returns.index[-1]
+        self._checked_at = time.time()
+        return self._rolling
+    
+    def covariance(self, tickers: List[str], annualize: bool = True) -> pd.DataFrame:
+        """Covariance sub-matrix for the given tickers (tickers without data are left out)"""
+        with self._lock:
+            rolling = self._refresh(tickers)
+            tickers = self._known(rolling, tickers)
+            matrix = rolling.covariance(tickers) * (252 if annualize else 1)
+        return pd.DataFrame(matrix, index=tickers, columns=tickers)
+    
+    def correlation(self, tickers: List[str]) -> pd.DataFrame:
+        """Correlation sub-matrix for the given tickers (tickers without data are left out)"""
+        with self._lock:
+            rolling = self._refresh(tickers)
+            tickers = self._known(rolling, tickers)
+            matrix = rolling.correlation(tickers)
+        return pd.DataFrame(matrix, index=tickers, columns=tickers)
+    
+    def correlation_to_picks(self, candidates: List[str], picks: List[str]) -> Dict[str, Dict]:
+        """
+        Highest correlation of each candidate with any of the picks
+        
+        Returns:
+            Dict mapping candidate to {'max_correlation', 'most_correlated_with'}
+        """
+        with self._lock:
+            rolling = self._refresh(candidates + picks)
+            candidates = self._known(rolling, candidates)
+            picks = self._known(rolling, picks)
+            if not candidates or not picks:
+                return {}
+            corr = rolling.correlation(candidates + picks)[:len(candidates), len(candidates):]
+        
+        result = {}
+        for i, ticker in enumerate(candidates):
+            row = np.where([p == ticker for p in picks], np.nan, corr[i])
+            if np.all(np.isnan(row)):
+                continue
+            j = int(np.nanargmax(row))
+            result[ticker] = {
+                'max_correlation': round(float(row[j]), 3),
+                'most_correlated_with': picks[j],
+            }
+        return result
+    
+    def diversify(self, ranked_tickers: List[str], top_n: int, max_correlation: float = 0.85) -> List[str]:
+        """
+        Greedily keep the highest-ranked tickers whose correlation with every ticker
+        already kept stays below max_correlation
+        
+        Args:
+            ranked_tickers: Tickers in rank order (best first)
+            top_n: Number of tickers to keep
+            max_correlation: Maximum allowed pairwise correlation
+        
+        Returns:
+            Up to top_n tickers, in rank order
+        """
+        with self._lock:
+            rolling = self._refresh(ranked_tickers)
+            known = set(self._known(rolling, ranked_tickers))
+            corr = rolling.correlation(sorted(known))
+        position = {t: i for i, t in enumerate(sorted(known))}
+        
+        kept = []
+        for ticker in ranked_tickers:
+            if len(kept) >= top_n:
+                break
+            if ticker in known:
+                others = [position[k] for k in kept if k in known]
+                if others and np.nanmax(corr[position[ticker], others]) >= max_correlation:
+                    continue
+            kept.append(ticker)
+        return kept
+    
+    def _load_returns(self, tickers: List[str]) -> pd.DataFrame:
+        close = self.price_cache.get_panel(tickers, period='2y', fields=['Close'])['Close']
+        return close.ffill(limit=5).pct_change(fill_method=None).iloc[1:]
+    
+    @staticmethod
+    def _known(rolling: RollingCovariance, tickers: List[str]) -> List[str]:
+        return [t for t in dict.fromkeys(t.upper().strip() for t in tickers) if t in rolling.index]
@@ -3,19 +3,25 @@ Daily Stock Picker - Automatically selects top 10 stocks daily
 Provides detailed reasoning for Buy/Hold/Avoid recommendations
 """
 
-import yfinance as yf
 import pandas as pd
 import numpy as np
 from datetime import datetime
-from typing import List, Dict
-from stock_screener import StockScreener
+from typing import List, Dict, Optional
+from stock_screener import StockScreener, MAX_SCORES
+from covariance_service import CovarianceService
+from risk_engine import RiskEngine
+from ticker_status import negative_cache, error_entry, TickerError, NO_DATA
+from market_source import market_source
+from config import DAILY_PICKS_SHORTLIST
 
 
 class DailyStockPicker:
     """Automatically picks and analyzes top stocks daily"""
     
-    def __init__(self):
-        self.screener = StockScreener()
+    def __init__(self, covariance_service: CovarianceService = None, risk_engine: RiskEngine = None):
+        self.screener = StockScreener(risk_engine=risk_engine)
+        self.covariance_service = covariance_service
+        self.shortlist_size = DAILY_PICKS_SHORTLIST
         
         # Popular stock lists - can be expanded
         self.popular_tickers = [
@@ -57,15 +63,31 @@ class DailyStockPicker:
         # - Fetch S&P 500 list
         # - Get most active stocks
         # - Use a stock screener API
-        return self.popular_tickers
+        # A source with its own universe (e.g. synthetic) replaces the list
+        return market_source.tickers() or self.popular_tickers
     
-    def analyze_and_rank(self, tickers: List[str] = None, top_n: int = 10) -> List[Dict]:
+    def analyze_and_rank(self, tickers: List[str] = None, top_n: int = 10,
+                         max_correlation: Optional[float] = None,
+                         errors: Optional[List[Dict]] = None,
+                         shortlist_size: Optional[int] = None,
+                         scored: Optional[List[Dict]] = None) -> List[Dict]:
         """
         Analyze stocks and return top picks with detailed reasoning
         
+        Runs in two stages. Stage one scores the whole universe on technicals and risk
+        from the bulk price panel. Stage two fetches company info only for the best
+        stage-one candidates, in order, and stops early once no remaining candidate
+        can reach the top picks even with a perfect fundamental score.
+        
         Args:
             tickers: List of tickers to analyze (if None, uses default list)
             top_n: Number of top stocks to return
+            max_correlation: If set, skip picks whose return correlation with a
+                higher-ranked pick is at or above this value
+            errors: If given, a structured entry is appended for every ticker that
+                could not be analyzed
+            shortlist_size: Most candidates analyzed in stage two (default: self.shortlist_size)
+            scored: If given, every candidate scored in stage two is appended
             
         Returns:
             List of top stocks with detailed analysis and reasoning
@@ -74,73 +96,91 @@ class DailyStockPicker:
             tickers = self.get_top_stocks_list()
         
         results = []
+        errors = errors if errors is not None else []
+        shortlist_size = max(shortlist_size or self.shortlist_size, top_n)
         
-        print(f"Analyzing {len(tickers)} stocks...")
+        # Known-bad tickers are reported straight away without touching the upstream
+        tickers, cached_errors = negative_cache.partition(
+            list(dict.fromkeys(t.upper().strip() for t in tickers))
+        )
+        errors.extend(cached_errors)
         
+        # Stage one: technical and risk scores for the whole universe from the price panel
+        price_scores = self.screener.price_scores(tickers)
         for ticker in tickers:
+            if ticker not in price_scores.index:
+                errors.append(TickerError(ticker, NO_DATA, f"No price history available for {ticker}").to_dict())
+        
+        # The fundamental score can add at most this much to a candidate's price score
+        fundamental_headroom = MAX_SCORES['fundamental'] * self.screener.fundamental_weight
+        
+        print(f"Analyzing {len(tickers)} stocks, shortlisting up to {shortlist_size}...")
+        
+        # Stage two: fundamentals for the shortlist, best price score first
+        infos = {}
+        for ticker, price_score in price_scores['price_score'].head(shortlist_size).items():
+            # With correlation filtering, lower-ranked picks may still be needed to fill in
+            if max_correlation is None and len(results) >= top_n:
+                cutoff = sorted((r['total_score'] for r in results), reverse=True)[top_n - 1]
+                if price_score + fundamental_headroom < cutoff:
+                    break
             try:
-                ticker = ticker.upper().strip()
-                
                 # Get comprehensive analysis
-                stock = yf.Ticker(ticker)
-                info = stock.info
-                
-                if not info or 'symbol' not in info:
-                    continue
+                info = self.screener.fetch_info(ticker)
                 
                 # Calculate scores
-                f_score = self.screener.fundamental_score(ticker)
-                t_score = self.screener.technical_score(ticker)
-                r_score = self.screener.risk_score(ticker)
-                
-                # Weighted total score
-                total_score = (
-                    f_score * self.screener.fundamental_weight +
-                    t_score * self.screener.technical_weight +
-                    r_score * self.screener.risk_weight
-                )
-                
-                # Get detailed metrics for reasoning
-                current_price = info.get('currentPrice') or info.get('regularMarketPrice')
-                company_name = info.get('longName') or info.get('shortName') or ticker
-                
-                # Generate detailed reasoning
-                reasoning = self._generate_detailed_reasoning(
-                    ticker, company_name, info, f_score, t_score, r_score, total_score
-                )
-                
-                # Determine recommendation
-                if total_score >= 20:
-                    recommendation = "Buy"
-                elif total_score >= 15:
-                    recommendation = "Hold"
-                else:
-                    recommendation = "Avoid"
+                scores = self.screener.score_ticker(ticker, info)
+                infos[ticker] = (info, scores)
                 
                 results.append({
                     'ticker': ticker,
-                    'company_name': company_name,
-                    'current_price': current_price,
-                    'fundamental_score': round(f_score, 2),
-                    'technical_score': round(t_score, 2),
-                    'risk_score': round(r_score, 2),
-                    'total_score': round(total_score, 2),
-                    'recommendation': recommendation,
-                    'reasoning': reasoning,
-                    'why_choose': reasoning['why_choose'],
-                    'why_avoid': reasoning['why_avoid'],
-                    'key_metrics': reasoning['key_metrics']
+                    'company_name': info.get('longName') or info.get('shortName') or ticker,
+                    'sector': info.get('sector'),
+                    'current_price': info.get('currentPrice') or info.get('regularMarketPrice'),
+                    'fundamental_score': round(scores['fundamental'], 2),
+                    'technical_score': round(scores['technical'], 2),
+                    'risk_score': round(scores['risk'], 2),
+                    'total_score': round(scores['total'], 2),
+                    'recommendation': self.screener.get_recommendation(scores['total']),
+                    'warnings': scores['warnings']
                 })
                 
             except Exception as e:
-                # Skip stocks that fail to analyze
-                continue
+                # Report stocks that fail to analyze instead of silently dropping them
+                errors.append(error_entry(ticker, e))
+        
+        print(f"Fetched fundamentals for {len(infos)} of {len(price_scores)} stocks")
         
         # Sort by total score (descending)
         results.sort(key=lambda x: x['total_score'], reverse=True)
+        if scored is not None:
+            scored.extend(results)
+        
+        # Skip near-duplicates of higher-ranked picks
+        if max_correlation is not None and self.covariance_service is not None:
+            kept = set(self.covariance_service.diversify(
+                [r['ticker'] for r in results], top_n, max_correlation
+            ))
+            results = [r for r in results if r['ticker'] in kept]
+        
+        # Detailed reasoning only for the picks actually returned
+        picks = results[:top_n]
+        for pick in picks:
+            info, scores = infos[pick['ticker']]
+            reasoning = self._generate_detailed_reasoning(
+                pick['ticker'], pick['company_name'], info,
+                scores['fundamental'], scores['technical'], scores['risk'], scores['total']
+            )
+            
+            pick.update({
+                'reasoning': reasoning,
+                'why_choose': reasoning['why_choose'],
+                'why_avoid': reasoning['why_avoid'],
+                'key_metrics': reasoning['key_metrics'],
+            })
+            pick['warnings'] = pick.pop('warnings')
         
-        # Return top N
-        return results[:top_n]
+        return picks
     
     def _generate_detailed_reasoning(
         self, ticker: str, company_name: str, info: Dict,
@@ -212,9 +252,9 @@ class DailyStockPicker:
             why_choose.append(f"Low beta of {beta:.2f} provides portfolio stability")
         
         # Overall recommendation reasoning
-        if total_score >= 20:
+        if total_score >= self.screener.buy_cutoff:
             why_choose.append(f"High overall score of {total_score:.1f}/30 indicates strong investment potential")
-        elif total_score < 15:
+        elif total_score < self.screener.hold_cutoff:
             why_avoid.append(f"Low overall score of {total_score:.1f}/30 suggests limited upside potential")
         
         # Technical indicators
@@ -229,7 +269,7 @@ class DailyStockPicker:
         
         # Ensure we have content
         if not why_choose and not why_avoid:
-            if total_score >= 15:
+            if total_score >= self.screener.hold_cutoff:
                 why_choose.append("Balanced metrics with decent growth potential")
             else:
                 why_avoid.append("Mixed signals - requires careful evaluation")
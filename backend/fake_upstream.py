@@ -0,0 +1,184 @@
+"""
+Fake Upstream - Local HTTP stand-in for the market-data provider
+Serves a synthetic universe (info, statements and price bars) with configurable latency, error rate and throttling
+
+Run standalone:
+    python fake_upstream.py --port 8900 --latency-ms 80 --error-rate 0.02 --rate-limit 50
+then start the API with MARKET_DATA_SOURCE=http MARKET_DATA_URL=http://127.0.0.1:8900
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import urlparse, parse_qs
+
+from synthetic_universe import SyntheticUniverse
+
+
+class FakeUpstream:
+    """
+    Threaded HTTP server with the routes HttpSource uses:
+        GET /info/{ticker}
+        GET /statements/{ticker}/{financials|balance_sheet|cashflow}
+        GET /history?tickers=A,B&period=1y&interval=1d
+        GET /stats
+    
+    Every data request waits a random latency, may fail with 500 (error_rate) and is
+    rejected with 429 once the token bucket (rate_limit requests/second) is empty.
+    Tickers starting with invalid_prefix are unknown (404 / no bars). By default the
+    universe is open: any other symbol is generated on demand from its name.
+    """
+    
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency_ms: float = 50.0,
+                 jitter_ms: float = 20.0, error_rate: float = 0.0, rate_limit: Optional[float] = None,
+                 invalid_prefix: str = 'ZZ', seed: Optional[int] = None,
+                 universe: Optional[SyntheticUniverse] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.invalid_prefix = invalid_prefix
+        self.universe = universe or SyntheticUniverse(size=0, seed=seed or 0, open_universe=True)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = rate_limit or 0.0
+        self._refilled_at = time.monotonic()
+        self.counts: Dict[str, int] = {}
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def start(self) -> 'FakeUpstream':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(sorted(self.counts.items()))
+    
+    def _count(self, key: str):
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+    
+    def _admit(self) -> Optional[int]:
+        """Status code to fail the request with, or None to serve it"""
+        if self.rate_limit:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.rate_limit, self._tokens + (now - self._refilled_at) * self.rate_limit)
+                self._refilled_at = now
+                if self._tokens < 1:
+                    return 429
+                self._tokens -= 1
+        delay = max(0.0, self._random.gauss(self.latency_ms, self.jitter_ms)) / 1000
+        time.sleep(delay)
+        if self._random.random() < self.error_rate:
+            return 500
+        return None
+    
+    def _route(self, path: str, query: Dict[str, List[str]]):
+        """(status, JSON payload) for a request"""
+        parts = [p for p in path.split('/') if p]
+        if parts == ['stats']:
+            return 200, self.stats()
+        
+        route = parts[0] if parts else ''
+        self._count(f"{route}_requests")
+        status = self._admit()
+        if status is not None:
+            self._count(f"{route}_{status}")
+            return status, {'error': 'throttled' if status == 429 else 'internal error'}
+        
+        if route == 'info' and len(parts) == 2:
+            ticker = parts[1].upper()
+            if ticker.startswith(self.invalid_prefix) or ticker not in self.universe:
+                return 404, {'error': f"Unknown symbol {ticker}"}
+            return 200, self.universe.info(ticker)
+        
+        if route == 'statements' and len(parts) == 3:
+            ticker = parts[1].upper()
+            if ticker.startswith(self.invalid_prefix) or ticker not in self.universe:
+                return 404, {'error': f"Unknown symbol {ticker}"}
+            try:
+                statement = self.universe.statement(ticker, parts[2])
+            except ValueError:
+                return 404, {'error': f"Unknown statement {parts[2]}"}
+            return 200, {
+                'index': list(statement.index),
+                'columns': [c.strftime('%Y-%m-%d') for c in statement.columns],
+                'data': statement.values.tolist(),
+            }
+        
+        if route == 'history':
+            tickers = [t.upper() for t in query.get('tickers', [''])[0].split(',') if t]
+            period = query.get('period', ['1y'])[0]
+            interval = query.get('interval', ['1d'])[0]
+            histories = self.universe.download(
+                [t for t in tickers if not t.startswith(self.invalid_prefix)], period, interval
+            )
+            payload = {
+                ticker: {'index': [d.isoformat() for d in hist.index], **{c: hist[c].tolist() for c in hist.columns}}
+                for ticker, hist in histories.items()
+            }
+            return 200, payload
+        
+        return 404, {'error': f"Unknown route {path}"}
+    
+    def _handler_class(self):
+        upstream = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            
+            def do_GET(self):
+                url = urlparse(self.path)
+                status, payload = upstream._route(url.path, parse_qs(url.query))
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass  # Quiet; counts are available from /stats
+        
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local fake market-data upstream")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency-ms', type=float, default=50.0)
+    parser.add_argument('--jitter-ms', type=float, default=20.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=float, default=None, help="Requests per second before 429s")
+    parser.add_argument('--seed', type=int, default=0, help="Synthetic universe seed")
+    args = parser.parse_args()
+    
+    upstream = FakeUpstream(args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit,
+                            seed=args.seed)
+    print(f"Fake upstream listening on {upstream.url}")
+    try:
+        upstream._server.serve_forever()
+    except KeyboardInterrupt:
+        upstream.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+"""
+Load Test - End-to-end load harness for the API
+Starts the fake upstream and the API (uvicorn, N workers), drives mixed open-loop traffic and reports latency percentiles
+
+Example:
+    python loadtest.py --rps 20 --duration 60 --workers 2 --mix analyze=6,screen=3,daily-picks=1 \
+        --upstream-latency-ms 80 --upstream-error-rate 0.02 --upstream-rate-limit 50 --json report.json
+
+Latency is measured from each request's scheduled send time, so queueing inside the
+harness (when the app falls behind the target rate) counts against the app.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Dict, Optional
+
+import httpx
+import numpy as np
+
+from config import SYMBOL_MASTER_PATH
+from fake_upstream import FakeUpstream
+from synthetic_universe import SyntheticUniverse
+
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_MIX = {'analyze': 6, 'screen': 3, 'daily-picks': 1}
+SCREEN_SIZE = 10
+
+
+def load_universe(path: str = SYMBOL_MASTER_PATH) -> List[str]:
+    """Tickers used for analyze and screen requests"""
+    with open(path, newline='', encoding='utf-8') as f:
+        return [row['ticker'] for row in csv.DictReader(f) if row.get('ticker')]
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in DEFAULT_MIX:
+            raise ValueError(f"Unknown endpoint '{name}'. Choose from: {', '.join(DEFAULT_MIX)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def build_request(endpoint: str, universe: List[str], rng: random.Random):
+    """(method, path, JSON body) for one request of the given kind"""
+    if endpoint == 'analyze':
+        return 'GET', f"/api/analyze/{rng.choice(universe)}", None
+    if endpoint == 'screen':
+        return 'POST', '/api/screen', {'tickers': rng.sample(universe, min(SCREEN_SIZE, len(universe))), 'top_n': 5}
+    return 'GET', '/api/daily-picks', None
+
+
+async def run_load(base_url: str, rps: float, duration: float, mix: Dict[str, float], universe: List[str],
+                   warmup: float = 0.0, timeout: float = 60.0, max_connections: int = 200,
+                   seed: Optional[int] = None) -> Dict[str, List]:
+    """
+    Send requests at a fixed rate for warmup + duration seconds
+    
+    Returns:
+        Per endpoint, a list of (latency seconds, status code or error name) for requests
+        scheduled after the warmup
+    """
+    rng = random.Random(seed)
+    names, weights = list(mix), list(mix.values())
+    samples: Dict[str, List] = {name: [] for name in names}
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def send(endpoint: str, scheduled: float, record: bool):
+            method, path, body = build_request(endpoint, universe, rng)
+            try:
+                response = await client.request(method, path, json=body)
+                outcome = response.status_code
+            except httpx.TimeoutException:
+                outcome = 'timeout'
+            except httpx.HTTPError as e:
+                outcome = type(e).__name__
+            if record:
+                samples[endpoint].append((time.perf_counter() - scheduled, outcome))
+        
+        tasks = []
+        start = time.perf_counter()
+        total = int((warmup + duration) * rps)
+        for i in range(total):
+            scheduled = start + i / rps
+            await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+            endpoint = rng.choices(names, weights)[0]
+            tasks.append(asyncio.create_task(send(endpoint, scheduled, record=i >= warmup * rps)))
+        await asyncio.gather(*tasks)
+    return samples
+
+
+def summarize(samples: Dict[str, List], duration: float) -> Dict:
+    """Latency percentiles (ms), throughput and error rates per endpoint and overall"""
+    def stats(rows: List) -> Dict:
+        if not rows:
+            return {'requests': 0}
+        latencies = np.array([r[0] for r in rows]) * 1000
+        errors: Dict[str, int] = {}
+        for _, outcome in rows:
+            if outcome != 200:
+                errors[str(outcome)] = errors.get(str(outcome), 0) + 1
+        failed = sum(errors.values())
+        return {
+            'requests': len(rows),
+            'ok': len(rows) - failed,
+            'error_rate': round(failed / len(rows), 4),
+            'errors': errors,
+            'throughput_rps': round((len(rows) - failed) / duration, 2),
+            'p50_ms': round(float(np.percentile(latencies, 50)), 1),
+            'p95_ms': round(float(np.percentile(latencies, 95)), 1),
+            'p99_ms': round(float(np.percentile(latencies, 99)), 1),
+            'max_ms': round(float(latencies.max()), 1),
+        }
+    
+    report = {name: stats(rows) for name, rows in samples.items()}
+    report['all'] = stats([row for rows in samples.values() for row in rows])
+    return report
+
+
+def print_report(report: Dict, upstream: Dict):
+    columns = ['requests', 'ok', 'error_rate', 'throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms']
+    print(f"\n{'endpoint':<13}" + ''.join(f"{c:>15}" for c in columns))
+    for name, stats in report.items():
+        print(f"{name:<13}" + ''.join(f"{stats.get(c, '-'):>15}" for c in columns))
+    for name, stats in report.items():
+        if stats.get('errors'):
+            print(f"  {name} errors: {stats['errors']}")
+    print(f"\nupstream: {upstream}")
+
+
+def start_api(upstream_url: str, workers: int, cache_dir: str, port: int) -> subprocess.Popen:
+    """Launch uvicorn against the fake upstream with an isolated cache directory"""
+    env = dict(
+        os.environ,
+        MARKET_DATA_SOURCE='http',
+        MARKET_DATA_URL=upstream_url,
+        STOCK_CACHE_DIR=cache_dir,
+        SHARED_CACHE_PATH=os.path.join(cache_dir, 'shared_cache.sqlite'),
+        QUOTE_FEED='fake',
+    )
+    return subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(port),
+         '--workers', str(workers), '--log-level', 'warning'],
+        cwd=BACKEND_DIR, env=env
+    )
+
+
+def wait_until_up(base_url: str, process: Optional[subprocess.Popen], timeout: float = 60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"API exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"API at {base_url} did not come up within {timeout:.0f}s")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test against a fake upstream")
+    parser.add_argument('--rps', type=float, default=10.0, help="Target request rate")
+    parser.add_argument('--duration', type=float, default=30.0, help="Measured seconds")
+    parser.add_argument('--warmup', type=float, default=5.0, help="Unmeasured seconds before the measurement")
+    parser.add_argument('--mix', default=','.join(f"{k}={v}" for k, v in DEFAULT_MIX.items()),
+                        help="Endpoint weights, e.g. analyze=6,screen=3,daily-picks=1")
+    parser.add_argument('--workers', type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument('--tickers', type=int, default=None, help="Limit the universe to the first N tickers")
+    parser.add_argument('--universe-size', type=int, default=0,
+                        help="Draw tickers from a generated universe of this size instead of the symbol master")
+    parser.add_argument('--target', default=None, help="Existing API base URL (skips starting the API)")
+    parser.add_argument('--upstream-latency-ms', type=float, default=50.0)
+    parser.add_argument('--upstream-jitter-ms', type=float, default=20.0)
+    parser.add_argument('--upstream-error-rate', type=float, default=0.0)
+    parser.add_argument('--upstream-rate-limit', type=float, default=None, help="Upstream requests/second before 429s")
+    parser.add_argument('--timeout', type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--json', default=None, help="Write the report to this file")
+    args = parser.parse_args()
+    
+    mix = parse_mix(args.mix)
+    synthetic = SyntheticUniverse(args.universe_size, seed=args.seed or 0, open_universe=True)
+    universe = (synthetic.tickers if args.universe_size else load_universe())[:args.tickers]
+    upstream = FakeUpstream(
+        latency_ms=args.upstream_latency_ms, jitter_ms=args.upstream_jitter_ms,
+        error_rate=args.upstream_error_rate, rate_limit=args.upstream_rate_limit, seed=args.seed,
+        universe=synthetic
+    ).start()
+    process = None
+    cache_dir = None
+    base_url = args.target
+    try:
+        if base_url is None:
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            cache_dir = tempfile.TemporaryDirectory(prefix='loadtest-', ignore_cleanup_errors=True)
+            process = start_api(upstream.url, args.workers, cache_dir.name, port)
+        wait_until_up(base_url, process)
+        
+        print(f"Driving {args.rps:g} req/s for {args.warmup:g}s warmup + {args.duration:g}s against {base_url} "
+              f"({args.workers} worker(s), mix {mix})")
+        samples = asyncio.run(run_load(
+            base_url, args.rps, args.duration, mix, universe,
+            warmup=args.warmup, timeout=args.timeout, seed=args.seed
+        ))
+        report = summarize(samples, args.duration)
+        upstream_stats = upstream.stats()
+        print_report(report, upstream_stats)
+        
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump({'config': vars(args), 'endpoints': report, 'upstream': upstream_stats}, f, indent=2)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        upstream.stop()
+        if cache_dir is not None:
+            cache_dir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
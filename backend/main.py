@@ -3,16 +3,45 @@ Stock Analysis API - FastAPI Backend
 Provides comprehensive stock analysis including fundamentals, valuation, technicals, and risk metrics
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse, Response, FileResponse
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
 from datetime import datetime
+import asyncio
+import json
 import uvicorn
 
-from stock_analyzer import StockAnalyzer
+from stock_analyzer import StockAnalyzer, ANALYSIS_SECTIONS, required_sections
 from stock_screener import StockScreener
 from daily_stock_picker import DailyStockPicker
+from backtester import ScreenerBacktester
+from market_data import PriceHistoryCache
+from portfolio_builder import PortfolioBuilder
+from covariance_service import CovarianceService
+from risk_engine import RiskEngine
+from monte_carlo import MonteCarloSimulator
+from quote_stream import QuotePoller, FakeQuoteFeed
+from request_coalescer import RequestCoalescer
+from shared_cache import shared_cache, cache_key
+from upstream_scheduler import scheduler, with_priority
+from upstream_http import request_timings
+from ticker_status import negative_cache, summarize_errors, CircuitOpenError, TickerError
+from symbol_index import SymbolIndex
+from result_export import ResultExporter, results_table, price_panel_table, to_bytes, FORMATS
+from score_store import ScoreStore
+from picks_history import PicksHistory
+from alert_engine import AlertEngine
+from timeframes import TimeframeCache, parse_timeframes
+from similarity_index import SimilarityIndex
+from market_data import data_version, data_version_started, PERIOD_ORDER
+from market_source import market_source
+from config import (
+    QUOTE_POLL_SECONDS, QUOTE_FEED, ANALYSIS_CACHE_TTL, ANALYSIS_STALE_SECONDS, SCREEN_CACHE_TTL, DAILY_PICKS_CACHE_TTL,
+    GZIP_MIN_BYTES
+)
 from models import StockAnalysisResponse
 
 app = FastAPI(
@@ -30,10 +59,83 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class SelectiveGZipMiddleware:
+    """
+    GZip for every response except event streams and Parquet files
+    
+    Event streams must reach clients unbuffered and Parquet is already zstd-compressed.
+    Older Starlette releases gzip both, so those responses are sent around the GZip
+    middleware, based on the Content-Type they start with.
+    """
+    
+    UNCOMPRESSED_TYPES = {'text/event-stream', FORMATS['parquet']}
+    
+    def __init__(self, app, minimum_size: int = 500):
+        self.app = app
+        self.gzip = GZipMiddleware(self._route, minimum_size=minimum_size)
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        await self.gzip({**scope, "uncompressed_send": send}, receive, send)
+    
+    async def _route(self, scope, receive, gzip_send):
+        target = gzip_send
+        
+        async def send(message):
+            nonlocal target
+            if message["type"] == "http.response.start":
+                headers = dict(message.get("headers", []))
+                media_type = headers.get(b"content-type", b"").decode("latin-1").split(";")[0].strip().lower()
+                if media_type in self.UNCOMPRESSED_TYPES:
+                    target = scope["uncompressed_send"]
+            await target(message)
+        
+        await self.app(scope, receive, send)
+
+
+# Compress larger JSON and export responses for clients that accept gzip
+app.add_middleware(SelectiveGZipMiddleware, minimum_size=GZIP_MIN_BYTES)
+
 # Initialize stock analyzer, screener, and daily picker
-analyzer = StockAnalyzer()
-screener = StockScreener()
-daily_picker = DailyStockPicker()
+price_cache = PriceHistoryCache()
+covariance_service = CovarianceService(price_cache=price_cache)
+risk_engine = RiskEngine(price_cache=price_cache)
+analyzer = StockAnalyzer(risk_engine=risk_engine)
+screener = StockScreener(risk_engine=risk_engine)
+daily_picker = DailyStockPicker(covariance_service=covariance_service, risk_engine=risk_engine)
+backtester = ScreenerBacktester(screener=screener, price_cache=price_cache)
+portfolio_builder = PortfolioBuilder(price_cache=price_cache)
+monte_carlo = MonteCarloSimulator(price_cache=price_cache)
+quote_poller = QuotePoller(
+    fetch_quotes=FakeQuoteFeed() if QUOTE_FEED == "fake" else None,
+    interval=QUOTE_POLL_SECONDS
+)
+
+# Shares one computation between identical concurrent requests, across all workers on the host
+coalescer = RequestCoalescer(shared=shared_cache)
+exporter = ResultExporter()
+score_store = ScoreStore()
+picks_history = PicksHistory()
+
+# Watchlist alerts, evaluated on new daily bars, live quotes and recorded scores
+alert_engine = AlertEngine()
+price_cache.listeners.append(alert_engine.on_series)
+quote_poller.listeners.append(alert_engine.on_quotes)
+
+# Weekly/monthly technicals resampled from cached daily bars, updated as new bars load
+timeframe_cache = TimeframeCache()
+price_cache.listeners.append(timeframe_cache.on_series)
+
+# "Similar stocks": feature vectors kept current as price history loads and screens fetch company info
+similarity_index = SimilarityIndex()
+price_cache.listeners.append(similarity_index.on_series)
+# A source with its own universe (synthetic) replaces the symbol master file
+symbol_index = (
+    SymbolIndex(market_source.symbols()) if market_source.symbols()
+    else SymbolIndex.from_file(popular=daily_picker.get_top_stocks_list())
+)
 
 
 @app.get("/")
@@ -42,23 +144,97 @@ async def root():
     return {"message": "Stock Analysis API is running"}
 
 
+# Fields returned with every analysis, whatever ?fields= selects
+ANALYSIS_ALWAYS = {"ticker", "company_name", "sector", "industry", "last_updated", "as_of", "stale"}
+
+# Row fields of screen results and daily picks that ?fields= may select ("ticker" is always kept)
+SCREEN_FIELDS = [
+    "ticker", "company_name", "sector", "current_price", "fundamental_score", "technical_score", "risk_score",
+    "total_score", "recommendation", "warnings"
+]
+PICK_FIELDS = SCREEN_FIELDS + ["reasoning", "why_choose", "why_avoid", "key_metrics"]
+
+
+def parse_fields(text: Optional[str], allowed: List[str]) -> Optional[List[str]]:
+    """Comma-separated field names, or None for all fields"""
+    if not text:
+        return None
+    names = [f.strip() for f in text.split(',') if f.strip()]
+    unknown = [f for f in names if f not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}. Choose from: {', '.join(allowed)}")
+    return list(dict.fromkeys(names))
+
+
+def select_fields(rows: List[Dict], fields: Optional[List[str]]) -> List[Dict]:
+    """Rows reduced to the selected fields (and their ticker)"""
+    if fields is None:
+        return rows
+    keep = ["ticker"] + [f for f in fields if f != "ticker"]
+    return [{k: row[k] for k in keep if k in row} for row in rows]
+
+
 @app.get("/api/analyze/{ticker}")
-async def analyze_stock(ticker: str):
+async def analyze_stock(ticker: str, timeframe: Optional[str] = None, fields: Optional[str] = None):
     """
     Analyze a stock by ticker symbol
     
     Args:
         ticker: Stock ticker symbol (e.g., AAPL, MSFT)
+        timeframe: Optional comma-separated timeframes ("daily", "weekly", "monthly" or "all")
+            to add technicals for under "timeframes"; they are resampled from the cached
+            daily history, so they need no extra upstream requests
+        fields: Optional comma-separated sections to return (fundamentals, valuation, technicals,
+            risk, scoring, recommendation, insights); sections left out are not computed, e.g.
+            without fundamentals only the income statement (for risk) or no statement is fetched
     
     Returns:
-        Comprehensive stock analysis including fundamentals, valuation, technicals, and recommendation
+        Comprehensive stock analysis including fundamentals, valuation, technicals, and recommendation.
+        "as_of" is when the analysis was computed; a "stale" result (past ANALYSIS_CACHE_TTL or
+        from an earlier trading day) is served immediately while it is refreshed in the background.
     """
     try:
         ticker = ticker.upper().strip()
-        analysis = analyzer.analyze(ticker)
-        return analysis
+        timeframes = parse_timeframes(timeframe)
+        sections = parse_fields(fields, ANALYSIS_SECTIONS)
+        needed = required_sections(sections)
+        fresh_after = data_version_started()
+        result = None
+        if len(needed) < len(ANALYSIS_SECTIONS):
+            # A full analysis this worker already holds answers any subset; otherwise compute only the subset
+            result = coalescer.peek(("analyze", ticker), fresh_after=fresh_after)
+            if result is None:
+                result = await coalescer.get_result(
+                    ("analyze", ticker, tuple(sorted(needed))),
+                    lambda: with_priority('interactive', analyzer.analyze, ticker, needed),
+                    ttl=ANALYSIS_CACHE_TTL,
+                    stale_ttl=ANALYSIS_STALE_SECONDS,
+                    fresh_after=fresh_after
+                )
+        if result is None:
+            result = await coalescer.get_result(
+                ("analyze", ticker),
+                lambda: with_priority('interactive', analyzer.analyze, ticker),
+                ttl=ANALYSIS_CACHE_TTL,
+                stale_ttl=ANALYSIS_STALE_SECONDS,
+                fresh_after=fresh_after
+            )
+        update = {"as_of": datetime.fromtimestamp(result.computed_at).isoformat(), "stale": result.stale}
+        if timeframes:
+            # Prefer the bars already in memory so a stale answer never waits on a download
+            series = price_cache.memory.get(ticker)
+            if series is None:
+                series = await asyncio.to_thread(price_cache.get_series, ticker, "2y")
+            if series is not None:
+                update["timeframes"] = {tf: timeframe_cache.get(series, tf) for tf in timeframes}
+        response = result.value.model_copy(update=update)
+        if sections is None:
+            return response
+        return response.model_dump(include=ANALYSIS_ALWAYS | set(sections) | ({"timeframes"} if timeframes else set()))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         import traceback
         error_detail = f"Error analyzing {ticker}: {str(e)}"
@@ -68,17 +244,22 @@ async def analyze_stock(ticker: str):
 
 
 @app.get("/api/search/{query}")
-async def search_stocks(query: str):
+async def search_stocks(query: str, limit: int = 10):
     """
     Search for stocks by ticker or company name
-    Note: This is a simplified version. In production, use a proper stock search API.
+    
+    Args:
+        query: Partial ticker (e.g. "AA") or company name words (e.g. "goldman sa")
+        limit: Maximum number of results (up to 50)
+    
+    Returns:
+        Matching symbols from the local symbol master, best matches first
     """
-    # This would typically connect to a stock search service
-    # For now, return a simple response
+    results = symbol_index.search(query, limit)
     return {
         "query": query,
-        "results": [],
-        "message": "Stock search feature - implement with proper API in production"
+        "results": results,
+        "count": len(results)
     }
 
 
@@ -88,51 +269,185 @@ class ScreenRequest(BaseModel):
 
 
 @app.post("/api/screen")
-async def screen_stocks(request: ScreenRequest):
+async def screen_stocks(request: ScreenRequest, fields: Optional[str] = None):
     """
     Screen and rank multiple stocks
     
     Args:
         request: ScreenRequest with tickers list and top_n
+        fields: Optional comma-separated result fields to return (see SCREEN_FIELDS)
     
     Returns:
         Ranked list of stocks with scores and recommendations
     """
     try:
+        selected = parse_fields(fields, SCREEN_FIELDS)
         if not request.tickers:
             raise HTTPException(status_code=400, detail="No tickers provided")
         
         if len(request.tickers) > 50:
             raise HTTPException(status_code=400, detail="Maximum 50 tickers allowed per request")
         
-        results = screener.screen_stocks(request.tickers, request.top_n)
+        results, errors = await run_screen(request)
         
         return {
             "date": datetime.now().isoformat(),
             "total_analyzed": len(request.tickers),
-            "results": results
+            "results": select_fields(results, selected),
+            "errors": errors,
+            "error_summary": summarize_errors(errors)
         }
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error screening stocks: {str(e)}")
 
 
+async def run_screen(request: ScreenRequest):
+    """Screen results and per-ticker errors, shared between identical concurrent requests"""
+    tickers = tuple(sorted({t.upper().strip() for t in request.tickers}))
+    
+    def compute():
+        errors, scored = [], []
+        results = screener.screen_stocks(list(tickers), request.top_n, errors=errors, scored=scored)
+        score_store.record(scored, source='screen')
+        index_company_info(r['ticker'] for r in scored)
+        alert_engine.on_scores(scored)
+        return results, errors
+    
+    return await coalescer.get(
+        ("screen", tickers, request.top_n, data_version()),
+        compute,
+        ttl=SCREEN_CACHE_TTL
+    )
+
+
+@app.get("/api/screen/results")
+async def query_screen_results(
+    sector: Optional[str] = None,
+    recommendation: Optional[str] = None,
+    min_total_score: Optional[float] = None,
+    max_total_score: Optional[float] = None,
+    min_fundamental_score: Optional[float] = None,
+    max_fundamental_score: Optional[float] = None,
+    min_technical_score: Optional[float] = None,
+    max_technical_score: Optional[float] = None,
+    min_risk_score: Optional[float] = None,
+    max_risk_score: Optional[float] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    source: Optional[str] = None,
+    max_age_days: Optional[float] = None,
+    sort: str = "total_score",
+    order: str = "desc",
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """
+    Query every stored screen and daily-picks row, without re-running a screen
+    
+    The latest scored row per ticker is kept from every run, so e.g. all Buy-rated technology
+    stocks with a risk score of at least 7, by technical score, is
+    ?sector=Technology&recommendation=Buy&min_risk_score=7&sort=technical_score
+    
+    Args:
+        sector: Comma-separated sectors (case-insensitive)
+        recommendation: Comma-separated recommendations (Buy, Hold, Avoid)
+        min_*/max_*: Inclusive score and price bounds
+        source: Only rows from 'screen' or 'daily_picks' runs
+        max_age_days: Ignore rows screened longer ago than this
+        sort: Column to sort by (see score_store.SORT_KEYS); ties are broken by ticker
+        order: "asc" or "desc"
+        limit: Page size (up to 500)
+        cursor: "next_cursor" from the previous page, with the same filters and sort
+        fields: Optional comma-separated row fields to return (SCREEN_FIELDS, source, screened_at)
+    
+    Returns:
+        Number of matching rows, one page of them and the cursor for the next page
+    """
+    try:
+        selected = parse_fields(fields, SCREEN_FIELDS + ["source", "screened_at"])
+        page = await asyncio.to_thread(
+            score_store.query,
+            sectors=[s.strip() for s in sector.split(',') if s.strip()] if sector else None,
+            recommendations=[r for r in recommendation.split(',') if r.strip()] if recommendation else None,
+            ranges={
+                'total_score': (min_total_score, max_total_score),
+                'fundamental_score': (min_fundamental_score, max_fundamental_score),
+                'technical_score': (min_technical_score, max_technical_score),
+                'risk_score': (min_risk_score, max_risk_score),
+                'current_price': (min_price, max_price),
+            },
+            source=source,
+            max_age_days=max_age_days,
+            sort=sort,
+            order=order,
+            limit=limit,
+            cursor=cursor
+        )
+        page["results"] = select_fields(page["results"], selected)
+        return page
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error querying screen results: {str(e)}")
+
+
+@app.get("/api/screen/results/stats")
+async def screen_results_stats():
+    """Stored screen rows per source and recommendation"""
+    return score_store.stats()
+
+
+def index_company_info(tickers):
+    """Hand the cached company info (and cached prices) of scored tickers to the similarity index"""
+    for ticker in tickers:
+        entry = shared_cache.get(cache_key('info', ticker))
+        if entry is not None:
+            similarity_index.on_info(ticker, entry.value)
+        if not similarity_index.contains(ticker, with_info=False):
+            # Loading from memory or disk notifies the index through its price cache listener
+            price_cache.get_cached_series(ticker)
+
+
+def sync_similarity_index():
+    """Index tickers any worker has scored since the last sync, from the shared info and price caches"""
+    tickers, synced_at = score_store.scored_since(similarity_index.synced_at)
+    index_company_info(tickers)
+    similarity_index.synced_at = synced_at
+
+
 @app.get("/api/daily-picks")
-async def get_daily_picks():
+async def get_daily_picks(max_correlation: Optional[float] = None, fields: Optional[str] = None):
     """
     Get daily top 10 stock picks with detailed reasoning
     
+    Args:
+        max_correlation: Optional cap on return correlation between picks (e.g. 0.85)
+            to avoid near-duplicate stocks
+        fields: Optional comma-separated pick fields to return (see PICK_FIELDS),
+            e.g. "total_score,recommendation" to leave out the reasoning text
+    
     Returns:
         Top 10 stocks with comprehensive analysis and buy/avoid reasoning
     """
     try:
-        results = daily_picker.analyze_and_rank(top_n=10)
+        selected = parse_fields(fields, PICK_FIELDS)
+        results, errors = await run_daily_picks(max_correlation)
         
         return {
             "date": datetime.now().strftime("%Y-%m-%d"),
             "generated_at": datetime.now().isoformat(),
             "total_analyzed": len(daily_picker.get_top_stocks_list()),
-            "results": results
+            "results": select_fields(results, selected),
+            "errors": errors,
+            "error_summary": summarize_errors(errors)
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         import traceback
         error_detail = f"Error generating daily picks: {str(e)}"
@@ -141,6 +456,764 @@ async def get_daily_picks():
         raise HTTPException(status_code=500, detail=error_detail)
 
 
+async def run_daily_picks(max_correlation: Optional[float] = None, top_n: int = 10):
+    """Daily picks and per-ticker errors, shared between identical concurrent requests"""
+    def compute():
+        errors, scored = [], []
+        picks = daily_picker.analyze_and_rank(
+            top_n=top_n, max_correlation=max_correlation, errors=errors, scored=scored
+        )
+        score_store.record(scored, source='daily_picks')
+        index_company_info(r['ticker'] for r in scored)
+        alert_engine.on_scores(scored)
+        # Only the published top 10 goes into the history and the export
+        if max_correlation is None and top_n == 10:
+            picks_history.record(picks, scored)
+            export_daily_picks(picks)
+        return picks, errors
+    
+    return await coalescer.get(
+        ("daily-picks", max_correlation, top_n, data_version()),
+        compute,
+        ttl=DAILY_PICKS_CACHE_TTL
+    )
+
+
+def export_daily_picks(picks: List[Dict]):
+    """Write today's picks and a year of prices for the picks universe as dated Parquet files"""
+    try:
+        exporter.write(results_table(picks, kind='daily_picks'), 'daily_picks')
+        panel = price_cache.get_panel(daily_picker.get_top_stocks_list(), period='1y')
+        exporter.write(price_panel_table(panel, kind='daily_picks_prices'), 'daily_picks_prices')
+    except Exception as e:
+        print(f"Daily picks export failed: {str(e)}")  # Exports must never fail the request
+
+
+def export_response(table, fmt: str, filename: str) -> Response:
+    """Binary response for an exported table"""
+    return Response(
+        content=to_bytes(table, fmt),
+        media_type=FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'}
+    )
+
+
+def check_export_format(fmt: str):
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format '{fmt}'. Choose from: {', '.join(FORMATS)}")
+
+
+@app.post("/api/export/screen")
+async def export_screen(request: ScreenRequest, format: str = "arrow"):
+    """
+    Screen results as an Arrow IPC stream or a Parquet file
+    
+    Args:
+        request: ScreenRequest with tickers list and top_n
+        format: 'arrow' (application/vnd.apache.arrow.stream) or 'parquet'
+    """
+    check_export_format(format)
+    if not request.tickers:
+        raise HTTPException(status_code=400, detail="No tickers provided")
+    if len(request.tickers) > 50:
+        raise HTTPException(status_code=400, detail="Maximum 50 tickers allowed per request")
+    try:
+        results, _ = await run_screen(request)
+        return export_response(results_table(results, kind='screen'), format, f"screen-{datetime.now():%Y-%m-%d}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error exporting screen: {str(e)}")
+
+
+@app.get("/api/export/daily-picks")
+async def export_daily_picks_endpoint(format: str = "arrow", max_correlation: Optional[float] = None):
+    """Daily picks, component scores and key metrics as an Arrow IPC stream or a Parquet file"""
+    check_export_format(format)
+    try:
+        results, _ = await run_daily_picks(max_correlation)
+        return export_response(results_table(results, kind='daily_picks'), format, f"daily-picks-{datetime.now():%Y-%m-%d}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error exporting daily picks: {str(e)}")
+
+
+class RerankRequest(BaseModel):
+    profile: Optional[str] = None
+    weights: Optional[Dict[str, float]] = None
+    buy_cutoff: Optional[float] = None
+    hold_cutoff: Optional[float] = None
+    tickers: Optional[List[str]] = None
+    source: Optional[str] = None
+    max_age_days: Optional[float] = None
+    top_n: int = 50
+
+
+@app.post("/api/rerank")
+async def rerank(request: RerankRequest):
+    """
+    Re-rank previously scored stocks with a different weighting, without refetching anything
+    
+    Every screen and daily-picks run stores its fundamental/technical/risk scores; this
+    recombines them with a named profile or custom weights.
+    
+    Args:
+        request: RerankRequest with a profile name or weights
+            ({'fundamental', 'technical', 'risk'}, normalized to sum to 1), optional
+            Buy/Hold cutoffs and ticker/source/age filters
+    
+    Returns:
+        Weighting and cutoffs used, recommendation counts and the ranked stocks
+    """
+    try:
+        weights = None
+        if request.weights is not None:
+            unknown = set(request.weights) - {'fundamental', 'technical', 'risk'}
+            if unknown:
+                raise ValueError(f"Unknown weight(s): {', '.join(sorted(unknown))}")
+            weights = [request.weights.get(k, 0.0) for k in ('fundamental', 'technical', 'risk')]
+        return score_store.rerank(
+            weights=weights,
+            profile=request.profile,
+            buy_cutoff=request.buy_cutoff,
+            hold_cutoff=request.hold_cutoff,
+            tickers=request.tickers,
+            source=request.source,
+            max_age_days=request.max_age_days,
+            top_n=request.top_n
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error re-ranking stocks: {str(e)}")
+
+
+@app.get("/api/rerank/profiles")
+async def get_rerank_profiles():
+    """Named weightings and how many stored scores are available to re-rank"""
+    return score_store.stats()
+
+
+@app.get("/api/history/picks")
+async def get_picks_history_dates(start: Optional[str] = None, end: Optional[str] = None):
+    """Recorded daily-picks runs between start and end (YYYY-MM-DD), newest first"""
+    try:
+        return {"runs": picks_history.dates(start, end)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/history/picks/{date}")
+async def get_picks_snapshot(date: str, picks_only: bool = True):
+    """
+    A recorded daily-picks run
+    
+    Args:
+        date: Run date (YYYY-MM-DD)
+        picks_only: Only the returned picks, not every scored candidate
+    """
+    try:
+        results = picks_history.snapshot(date, picks_only=picks_only)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not results:
+        raise HTTPException(status_code=404, detail=f"No daily picks recorded for {date}")
+    return {"date": date, "results": results}
+
+
+@app.get("/api/history/ticker/{ticker}")
+async def get_ticker_history(ticker: str, start: Optional[str] = None, end: Optional[str] = None):
+    """
+    A stock's daily-picks scores, rank and recommendation over time
+    
+    Args:
+        ticker: Stock ticker symbol
+        start: First date (YYYY-MM-DD, default: all history)
+        end: Last date (YYYY-MM-DD, default: latest run)
+    
+    Returns:
+        History rows plus how long the stock has held its current recommendation
+        and its place in the picks
+    """
+    try:
+        return picks_history.ticker_history(ticker, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error loading ticker history: {str(e)}")
+
+
+@app.get("/api/history/changes")
+async def get_picks_changes(date: Optional[str] = None, since: Optional[str] = None):
+    """
+    Stocks that entered or left the daily picks, and rank changes
+    
+    Args:
+        date: Later run (YYYY-MM-DD, default: latest)
+        since: Earlier run (default: the previous run); e.g. a week ago for weekly changes
+    """
+    try:
+        return picks_history.changes(date, since)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error comparing daily picks: {str(e)}")
+
+
+class PriceExportRequest(BaseModel):
+    tickers: List[str]
+    period: str = "1y"
+    format: str = "arrow"
+
+
+@app.post("/api/export/prices")
+async def export_prices(request: PriceExportRequest):
+    """Daily OHLCV panel in long format (date, ticker, open, high, low, close, volume)"""
+    check_export_format(request.format)
+    if not request.tickers:
+        raise HTTPException(status_code=400, detail="No tickers provided")
+    if len(request.tickers) > 50:
+        raise HTTPException(status_code=400, detail="Maximum 50 tickers allowed per request")
+    if request.period not in PERIOD_ORDER:
+        raise HTTPException(status_code=400, detail=f"Invalid period '{request.period}'. Choose from: {', '.join(PERIOD_ORDER)}")
+    try:
+        panel = await asyncio.to_thread(price_cache.get_panel, request.tickers, request.period)
+        if all(frame.empty for frame in panel.values()):
+            raise HTTPException(status_code=404, detail="No price history for the requested tickers")
+        table = price_panel_table(panel)
+        return export_response(table, request.format, f"prices-{request.period}-{datetime.now():%Y-%m-%d}")
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error exporting prices: {str(e)}")
+
+
+@app.get("/api/export/files/{name}")
+async def list_export_files(name: str):
+    """Dates with a written Parquet export (e.g. daily_picks, daily_picks_prices), newest first"""
+    return {"name": name, "dates": exporter.list_files(name)}
+
+
+@app.get("/api/export/files/{name}/{date}")
+async def get_export_file(name: str, date: str):
+    """Download a dated Parquet export"""
+    if date not in exporter.list_files(name):
+        raise HTTPException(status_code=404, detail=f"No {name} export for {date}")
+    return FileResponse(exporter.path(name, date), media_type=FORMATS['parquet'], filename=f"{name}-{date}.parquet")
+
+
+class BacktestRequest(BaseModel):
+    tickers: Optional[List[str]] = None  # Defaults to the daily picks universe
+    period: str = "10y"
+    top_n: int = 10
+    rebalance_days: int = 21
+    weights: Optional[List[List[float]]] = None  # [fundamental, technical, risk] weightings to compare
+
+
+@app.post("/api/backtest")
+async def backtest_screener(request: BacktestRequest):
+    """
+    Walk-forward backtest of the screener scoring model
+    
+    Args:
+        request: BacktestRequest with universe, history length, portfolio size and weightings
+    
+    Returns:
+        Forward returns, hit rate and turnover per weighting, best annualized return first
+    """
+    try:
+        tickers = request.tickers or daily_picker.get_top_stocks_list()
+        weights = request.weights or [[screener.fundamental_weight, screener.technical_weight, screener.risk_weight]]
+        
+        if any(len(w) != 3 for w in weights):
+            raise HTTPException(status_code=400, detail="Each weighting must be [fundamental, technical, risk]")
+        
+        results = await asyncio.to_thread(
+            with_priority, 'prefetch', backtester.sweep,
+            tickers, [tuple(w) for w in weights],
+            period=request.period, top_n=request.top_n, rebalance_days=request.rebalance_days
+        )
+        
+        return {
+            "date": datetime.now().isoformat(),
+            "total_analyzed": len(tickers),
+            "results": results
+        }
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error running backtest: {str(e)}")
+
+
+class PortfolioRequest(BaseModel):
+    tickers: Optional[List[str]] = None  # Defaults to today's top picks
+    top_n: int = 10
+    method: str = "risk_parity"
+    max_weight: Optional[float] = None
+    risk_aversion: float = 3.0
+
+
+@app.post("/api/portfolio")
+async def build_portfolio(request: PortfolioRequest):
+    """
+    Build portfolio weights from a ticker list or the daily top picks
+    
+    Args:
+        request: PortfolioRequest with tickers (or top_n picks), allocation method and constraints
+    
+    Returns:
+        Holdings with weights and risk contributions, plus expected return and volatility
+    """
+    try:
+        tickers = request.tickers
+        if not tickers:
+            picks, _ = await run_daily_picks(top_n=request.top_n)
+            tickers = [pick['ticker'] for pick in picks]
+        
+        if len(tickers) > 500:
+            raise HTTPException(status_code=400, detail="Maximum 500 tickers allowed per portfolio")
+        
+        portfolio = await asyncio.to_thread(
+            with_priority, 'interactive', portfolio_builder.build,
+            tickers, method=request.method,
+            max_weight=request.max_weight, risk_aversion=request.risk_aversion
+        )
+        
+        return {
+            "date": datetime.now().isoformat(),
+            **portfolio
+        }
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error building portfolio: {str(e)}")
+
+
+class CorrelationRequest(BaseModel):
+    tickers: List[str]
+    picks: Optional[List[str]] = None  # Also report each ticker's highest correlation with these
+
+
+@app.post("/api/correlation")
+async def get_correlation(request: CorrelationRequest):
+    """
+    Rolling 2-year return correlation and covariance for a set of tickers
+    
+    Args:
+        request: CorrelationRequest with tickers and optional picks to check against
+    
+    Returns:
+        Correlation matrix, annualized covariance matrix and optional correlation-to-picks check
+    """
+    try:
+        if not request.tickers:
+            raise HTTPException(status_code=400, detail="No tickers provided")
+        
+        if len(request.tickers) > 500:
+            raise HTTPException(status_code=400, detail="Maximum 500 tickers allowed per request")
+        
+        def compute():
+            correlation = covariance_service.correlation(request.tickers)
+            covariance = covariance_service.covariance(list(correlation.index))
+            to_picks = covariance_service.correlation_to_picks(request.tickers, request.picks) if request.picks else None
+            return correlation, covariance, to_picks
+        
+        correlation, covariance, to_picks = await asyncio.to_thread(with_priority, 'interactive', compute)
+        
+        response = {
+            "date": datetime.now().isoformat(),
+            "tickers": list(correlation.index),
+            "correlation": correlation.round(4).values.tolist(),
+            "covariance": covariance.round(6).values.tolist()
+        }
+        if request.picks:
+            response["correlation_to_picks"] = to_picks
+        return response
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error computing correlation: {str(e)}")
+
+
+class MonteCarloRequest(BaseModel):
+    tickers: Optional[List[str]] = None  # Defaults to today's top picks
+    weights: Optional[List[float]] = None  # Defaults to equal weight
+    top_n: int = 10
+    method: str = "bootstrap"
+    n_paths: int = 10000
+    horizon_days: int = 252
+    seed: Optional[int] = None
+    rebalance: bool = True
+    initial_value: float = 10000.0
+
+
+@app.post("/api/monte-carlo")
+async def simulate_portfolio(request: MonteCarloRequest):
+    """
+    Monte Carlo simulation of a basket of stocks
+    
+    Args:
+        request: MonteCarloRequest with tickers/weights (or top_n picks) and simulation settings
+    
+    Returns:
+        Percentile outcomes, probability of loss and drawdown distribution
+    """
+    try:
+        tickers = request.tickers
+        if not tickers:
+            if request.weights:
+                raise HTTPException(status_code=400, detail="weights require an explicit tickers list")
+            picks, _ = await run_daily_picks(top_n=request.top_n)
+            tickers = [pick['ticker'] for pick in picks]
+        
+        if len(tickers) > 100:
+            raise HTTPException(status_code=400, detail="Maximum 100 tickers allowed per simulation")
+        
+        if request.n_paths > 100000 or request.horizon_days > 2520:
+            raise HTTPException(status_code=400, detail="Maximum 100000 paths and 2520 days per simulation")
+        
+        result = await asyncio.to_thread(
+            with_priority, 'interactive', monte_carlo.simulate,
+            tickers, weights=request.weights, method=request.method,
+            n_paths=request.n_paths, horizon_days=request.horizon_days, seed=request.seed,
+            rebalance=request.rebalance, initial_value=request.initial_value
+        )
+        
+        return {
+            "date": datetime.now().isoformat(),
+            **result
+        }
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error running simulation: {str(e)}")
+
+
+@app.websocket("/ws/quotes")
+async def quote_websocket(websocket: WebSocket, tickers: Optional[str] = None):
+    """
+    Live quotes over WebSocket
+    
+    Clients send {"action": "subscribe" | "unsubscribe", "tickers": [...]} and receive
+    {"type": "quotes", "quotes": {ticker: {price, volume, timestamp}}} whenever a subscribed price changes.
+    Malformed messages and tickers past the subscription limit get {"type": "error", "message": ...}.
+    """
+    await websocket.accept()
+    subscription = quote_poller.subscribe(tickers.split(",") if tickers else [])
+    
+    async def send_updates():
+        while True:
+            await websocket.send_json(await subscription.queue.get())
+    
+    sender = asyncio.create_task(send_updates())
+    try:
+        while True:
+            message = await websocket.receive_json()
+            if not isinstance(message, dict):
+                message = {}
+            action, requested = message.get("action"), message.get("tickers", [])
+            valid = isinstance(requested, list) and all(isinstance(t, str) for t in requested)
+            if action == "subscribe" and valid:
+                quote_poller.update(subscription, add=requested)
+            elif action == "unsubscribe" and valid:
+                quote_poller.update(subscription, remove=requested)
+            else:
+                subscription.push({
+                    "type": "error",
+                    "message": 'Expected {"action": "subscribe" | "unsubscribe", "tickers": [...]}'
+                })
+    except (WebSocketDisconnect, ValueError):
+        pass
+    finally:
+        sender.cancel()
+        quote_poller.unsubscribe(subscription)
+
+
+@app.get("/api/quotes/stream")
+async def quote_events(tickers: str):
+    """
+    Live quotes as Server-Sent Events
+    
+    Args:
+        tickers: Comma-separated ticker symbols
+    
+    Returns:
+        text/event-stream of quote updates for the tickers
+    """
+    ticker_list = [t for t in tickers.split(",") if t.strip()]
+    if not ticker_list:
+        raise HTTPException(status_code=400, detail="No tickers provided")
+    
+    subscription = quote_poller.subscribe(ticker_list)
+    
+    async def events():
+        try:
+            while True:
+                update = await subscription.queue.get()
+                yield f"data: {json.dumps(update)}\n\n"
+        finally:
+            quote_poller.unsubscribe(subscription)
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/api/quotes/stats")
+async def quote_stats():
+    """Shared quote poller status: subscribers, unique tickers and poll counts"""
+    return quote_poller.stats()
+
+
+class AlertRuleRequest(BaseModel):
+    user: str
+    ticker: str
+    condition: str
+    threshold: Optional[float] = None
+    window: Optional[int] = None
+    value: Optional[str] = None
+    webhook: Optional[str] = None
+
+
+@app.post("/api/alerts")
+async def create_alert(request: AlertRuleRequest):
+    """
+    Create a watchlist alert rule
+    
+    Conditions: cross_above_ma / cross_below_ma (window 20, 50, 100 or 200, default 200),
+    rsi_below / rsi_above (threshold, default 30 / 70), price_above / price_below (threshold),
+    and recommendation (value Buy, Hold or Avoid, default Buy). A rule fires when its
+    condition turns true, and fires again only after it has been false in between.
+    
+    Args:
+        request: AlertRuleRequest with user, ticker, condition, its parameters and an optional webhook URL
+    
+    Returns:
+        The stored rule
+    """
+    try:
+        # add_rule resolves the webhook host, so keep it off the event loop
+        rule = await asyncio.to_thread(
+            alert_engine.add_rule, request.user, request.ticker, request.condition, threshold=request.threshold,
+            window=request.window, value=request.value, webhook=request.webhook
+        )
+        if rule['condition'] != 'recommendation':
+            # Load the ticker's daily bars so the rule is armed against the current price
+            await asyncio.to_thread(price_cache.get_history, rule['ticker'], '1y')
+            series = price_cache.memory.get(rule['ticker'])
+            if series is not None:
+                await asyncio.to_thread(alert_engine.on_series, series)
+        return next((r for r in alert_engine.rules(ticker=rule['ticker']) if r['id'] == rule['id']), rule)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating alert: {str(e)}")
+
+
+@app.get("/api/alerts")
+async def list_alerts(user: Optional[str] = None, ticker: Optional[str] = None):
+    """Alert rules, optionally for one user and/or ticker"""
+    rules = alert_engine.rules(user=user, ticker=ticker)
+    return {"rules": rules, "count": len(rules)}
+
+
+@app.delete("/api/alerts/{rule_id}")
+async def delete_alert(rule_id: int, user: str):
+    """Delete one of user's alert rules"""
+    if not await asyncio.to_thread(alert_engine.remove_rule, rule_id, user):
+        raise HTTPException(status_code=404, detail=f"Alert rule {rule_id} not found")
+    return {"id": rule_id, "deleted": True}
+
+
+@app.get("/api/alerts/events")
+async def list_alert_events(user: Optional[str] = None, since_id: int = 0, limit: int = 100):
+    """Fired alerts after since_id (oldest first); poll with the last id seen"""
+    events = alert_engine.events(user=user, since_id=since_id, limit=min(max(limit, 1), 1000))
+    return {"events": events, "count": len(events), "last_id": events[-1]["id"] if events else since_id}
+
+
+@app.get("/api/alerts/stream")
+async def alert_stream(user: Optional[str] = None):
+    """
+    Fired alerts as Server-Sent Events, as this worker evaluates them
+    
+    Args:
+        user: Only this user's alerts (default: all)
+    
+    Returns:
+        text/event-stream of fired alerts
+    """
+    listener = alert_engine.listen(user)
+    
+    async def events():
+        try:
+            while True:
+                event = await listener.queue.get()
+                yield f"data: {json.dumps(event)}\n\n"
+        finally:
+            alert_engine.unlisten(listener)
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/api/alerts/evaluate")
+async def evaluate_alerts():
+    """
+    Refresh daily bars for every ticker with rules and evaluate them
+    
+    Meant for a scheduler after the market close; bars that are already fresh are not
+    downloaded again, and only tickers with new bars are evaluated.
+    """
+    try:
+        tickers = alert_engine.tickers()
+        fired_before = alert_engine.counters['fired']
+        await asyncio.to_thread(with_priority, 'prefetch', price_cache.get_panel, tickers, '1y', ['Close'])
+        return {"tickers": len(tickers), "fired": alert_engine.counters['fired'] - fired_before}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error evaluating alerts: {str(e)}")
+
+
+@app.get("/api/alerts/stats")
+async def alert_stats():
+    """Alert rule counts and evaluation/delivery counters"""
+    return alert_engine.stats()
+
+
+class SimilarBuildRequest(BaseModel):
+    tickers: Optional[List[str]] = None
+
+
+def load_for_similarity(ticker: str):
+    """Fetch a ticker's company info and price history into the similarity index"""
+    try:
+        info = screener.fetch_info(ticker)
+    except TickerError as e:
+        raise ValueError(e.message)
+    similarity_index.on_info(ticker, info)
+    series = price_cache.get_series(ticker, "2y")
+    if series is None:
+        raise ValueError(f"No historical data available for {ticker}")
+    similarity_index.on_series(series)
+
+
+def build_similarity_index(tickers: List[str]):
+    """Index tickers' price history (loading what isn't cached) and company info"""
+    tickers = list(dict.fromkeys(t.upper().strip() for t in tickers))
+    missing = []
+    for ticker in tickers:
+        series = price_cache.memory.get(ticker)
+        if series is None:
+            missing.append(ticker)
+        else:
+            similarity_index.on_series(series)
+    if missing:
+        # Loading notifies the index through its price cache listener
+        price_cache.get_panel(missing, period="2y", fields=["Close"])
+    for ticker in tickers:
+        if similarity_index.contains(ticker, with_info=False):
+            try:
+                similarity_index.on_info(ticker, screener.fetch_info(ticker))
+            except TickerError:
+                continue
+
+
+@app.get("/api/similar/{ticker}")
+async def similar_stocks(ticker: str, k: int = 10, same_sector: bool = False):
+    """
+    Stocks most like a given one, for the analysis page's "stocks like this one" panel
+    
+    Similarity is the cosine between feature vectors of normalized valuation, profitability,
+    growth, leverage and price metrics, six months of daily returns (so correlated stocks
+    rank higher) and sector. A ticker not yet in the index is fetched first.
+    
+    Args:
+        ticker: Stock ticker symbol
+        k: Number of similar stocks (up to 50)
+        same_sector: Only return stocks from the same sector
+    
+    Returns:
+        The most similar stocks with their similarity and return correlation, best first
+    """
+    try:
+        ticker = ticker.upper().strip()
+        if not 1 <= k <= 50:
+            raise ValueError("k must be between 1 and 50")
+        # Screens run on other workers feed this worker's index too
+        await asyncio.to_thread(sync_similarity_index)
+        if not similarity_index.contains(ticker):
+            await asyncio.to_thread(with_priority, 'interactive', load_for_similarity, ticker)
+        results = similarity_index.neighbors([ticker], k=k, same_sector=same_sector).get(ticker, [])
+        return {
+            "ticker": ticker,
+            "universe_size": similarity_index.stats()["tickers"],
+            "results": results
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error finding similar stocks for {ticker}: {str(e)}")
+
+
+@app.post("/api/similar/build")
+async def build_similar_index(request: SimilarBuildRequest, background_tasks: BackgroundTasks):
+    """
+    Add up to 500 tickers (default: the daily-picks universe) to the similarity index in the background
+    
+    Price history and company info are loaded at prefetch priority where they aren't cached
+    (info is shared with screens and analyses), so a large universe takes as long as the
+    upstream rate budget allows; progress shows in /api/cache/stats under "similarity".
+    """
+    if request.tickers and len(request.tickers) > 500:
+        raise HTTPException(status_code=400, detail="Maximum 500 tickers allowed per request")
+    tickers = request.tickers or daily_picker.get_top_stocks_list()
+    background_tasks.add_task(with_priority, 'prefetch', build_similarity_index, tickers)
+    return {"status": "started", "tickers": len(tickers)}
+
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Request coalescing, result cache, in-memory price history, shared (host-wide) cache and timeframe counters"""
+    return {
+        "results": coalescer.stats(),
+        "prices": price_cache.memory.stats(),
+        "shared": shared_cache.stats(),
+        "timeframes": timeframe_cache.stats(),
+        "similarity": similarity_index.stats()
+    }
+
+
+@app.get("/api/cache/prices")
+async def price_memory_stats(limit: int = 50):
+    """In-memory price history: bytes used against the budget, evictions and the largest tickers"""
+    return price_cache.memory.stats(per_ticker=True, limit=limit)
+
+
+@app.get("/api/upstream/stats")
+async def upstream_stats():
+    """Upstream request scheduler queue depth and wait times by priority class, and HTTP connection timings"""
+    return {**scheduler.stats(), 'http': request_timings.stats()}
+
+
+@app.get("/api/upstream/negative-cache")
+async def negative_cache_stats():
+    """Tickers currently skipped because they recently failed validation or had no data"""
+    return negative_cache.stats()
+
+
+@app.delete("/api/upstream/negative-cache/{ticker}")
+async def clear_negative_cache(ticker: str):
+    """Forget a negatively cached ticker so the next request retries it"""
+    negative_cache.clear(ticker)
+    return {"ticker": ticker.upper().strip(), "cleared": True}
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
 
@@ -0,0 +1,286 @@
+"""
+Market Data - Cached daily price history
+Downloads OHLCV history in bulk and keeps it on disk so price panels can be reused across runs
+"""
+
+import contextvars
+import os
+import time
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Optional, Callable
+
+from config import (
+    CACHE_DIR, PRICE_CACHE_MAX_AGE_HOURS, UPSTREAM_BATCH_SIZE, UPSTREAM_MAX_CONCURRENCY, NEGATIVE_CACHE_MISS_SECONDS
+)
+from upstream_scheduler import scheduler
+from ticker_status import negative_cache, NO_DATA
+from price_store import PriceStore, PriceSeries, aligned_panel
+from shared_cache import shared_cache, cache_key
+from market_source import market_source, PRICE_FIELDS
+
+# Periods in increasing length, used to decide whether a cached download covers a request
+PERIOD_ORDER = ['1mo', '3mo', '6mo', '1y', '2y', '5y', '10y', 'max']
+PERIOD_OFFSETS = {
+    '1mo': pd.DateOffset(months=1),
+    '3mo': pd.DateOffset(months=3),
+    '6mo': pd.DateOffset(months=6),
+    '1y': pd.DateOffset(years=1),
+    '2y': pd.DateOffset(years=2),
+    '5y': pd.DateOffset(years=5),
+    '10y': pd.DateOffset(years=10),
+}
+
+
+class PriceHistoryCache:
+    """
+    Daily OHLCV history cached in memory (compact arrays under a byte budget) and on disk,
+    one file per ticker
+    """
+    
+    def __init__(self, cache_dir: str = None, max_age_hours: float = None, memory: PriceStore = None):
+        self.cache_dir = os.path.join(cache_dir or CACHE_DIR, 'prices')
+        self.max_age_seconds = (max_age_hours if max_age_hours is not None else PRICE_CACHE_MAX_AGE_HOURS) * 3600
+        self.memory = memory or PriceStore()
+        # Called with every series loaded from upstream or disk (e.g. to evaluate alerts on new bars)
+        self.listeners: List[Callable[[PriceSeries], None]] = []
+        os.makedirs(self.cache_dir, exist_ok=True)
+    
+    def get_history(self, ticker: str, period: str = '2y') -> pd.DataFrame:
+        """
+        Get daily OHLCV history for a single ticker
+        
+        Args:
+            ticker: Stock ticker symbol
+            period: History length (e.g. '1y', '10y')
+        
+        Returns:
+            DataFrame indexed by date with Open/High/Low/Close/Volume columns
+        """
+        ticker = ticker.upper().strip()
+        series = self._load_many([ticker], period).get(ticker)
+        if series is None:
+            return pd.DataFrame(columns=PRICE_FIELDS)
+        return series.frame(self._period_start(period))
+    
+    def get_series(self, ticker: str, period: str = '2y') -> Optional[PriceSeries]:
+        """Compact daily series for a ticker (covering at least period), or None without data"""
+        ticker = ticker.upper().strip()
+        return self._load_many([ticker], period).get(ticker)
+    
+    def get_cached_series(self, ticker: str, period: str = '2y') -> Optional[PriceSeries]:
+        """Like get_series, but only from memory or the disk cache; never downloads"""
+        ticker = ticker.upper().strip()
+        series = self.memory.get(ticker)
+        if series is not None and self._is_fresh(series.loaded_at) and period_covers(series.period, period):
+            return series
+        return self._read_series(ticker, period)
+    
+    def get_panel(self, tickers: List[str], period: str = '2y',
+                  fields: Optional[List[str]] = None) -> Dict[str, pd.DataFrame]:
+        """
+        Get aligned price panels (dates x tickers) for many tickers
+        
+        Args:
+            tickers: List of ticker symbols
+            period: History length (e.g. '1y', '10y')
+            fields: OHLCV fields to return (default: all)
+        
+        Returns:
+            Dict mapping field name to a DataFrame with one column per ticker.
+            Tickers without any data are left out of the panels.
+        """
+        tickers = list(dict.fromkeys(t.upper().strip() for t in tickers))
+        fields = fields or PRICE_FIELDS
+        histories = self._load_many(tickers, period)
+        start = self._period_start(period)
+        
+        # Columns are filled straight from the stored arrays; tickers with no bars in range are left out
+        series = [
+            histories[t] for t in tickers
+            if t in histories and histories[t].start_position(start) < len(histories[t])
+        ]
+        return {field: aligned_panel(series, field, start) for field in fields}
+    
+    def _load_many(self, tickers: List[str], period: str) -> Dict[str, PriceSeries]:
+        """Load tickers from memory or disk, downloading any that are missing, stale or too short"""
+        histories = {}
+        missing = []
+        
+        for ticker in tickers:
+            if negative_cache.is_cached(ticker):
+                continue
+            series = self.memory.get(ticker)
+            if series is not None and self._is_fresh(series.loaded_at) and period_covers(series.period, period):
+                histories[ticker] = series
+                continue
+            series = self._read_series(ticker, period)
+            if series is None:
+                missing.append(ticker)
+            else:
+                histories[ticker] = series
+        
+        if not missing:
+            return histories
+        
+        # Only one worker on the host downloads a ticker at a time; the others wait for its file
+        while missing:
+            leases = {t: shared_cache.acquire(cache_key('prices', t)) for t in missing}
+            owned = [t for t in missing if leases[t] is not None]
+            waiting = [t for t in missing if leases[t] is None]
+            try:
+                self._fetch(owned, period, histories)
+            finally:
+                for ticker in owned:
+                    shared_cache.release(cache_key('prices', ticker), leases[ticker])
+            if not waiting:
+                break
+            
+            shared_cache.wait_for_leases(cache_key('prices', t) for t in waiting)
+            missing = []
+            for ticker in waiting:
+                if negative_cache.is_cached(ticker, shared=True):
+                    continue  # The other worker found no data
+                series = self._read_series(ticker, period)
+                if series is None:
+                    missing.append(ticker)  # It failed or fetched a shorter period; take the lease and fetch
+                else:
+                    histories[ticker] = series
+        return histories
+    
+    def _fetch(self, tickers: List[str], period: str, histories: Dict[str, PriceSeries]):
+        """Download tickers into histories, memory and disk"""
+        if not tickers:
+            return
+        downloaded, fetched = self._download(tickers, period)
+        # A bulk download leaves out tickers whose own request failed as well as ones without
+        # data, so each one it skipped is checked on its own before being cached as empty
+        for ticker in fetched:
+            if ticker in downloaded:
+                continue
+            try:
+                hist = scheduler.call(market_source.download_one, ticker, period)
+            except Exception:
+                negative_cache.mark(ticker, NO_DATA, f"No price history returned for {ticker}; retrying shortly",
+                                    ttl_seconds=NEGATIVE_CACHE_MISS_SECONDS)
+                continue
+            if hist is None:
+                negative_cache.mark(ticker, NO_DATA, f"No price history available for {ticker}")
+            else:
+                downloaded[ticker] = hist
+        
+        for ticker, hist in downloaded.items():
+            self._write(ticker, hist, period)
+            histories[ticker] = self._notify(self.memory.put(PriceSeries.from_frame(ticker, hist, period)))
+    
+    def _read_series(self, ticker: str, period: str) -> Optional[PriceSeries]:
+        """Load a ticker's disk cache (possibly written by another worker) into memory"""
+        cached = self._read(ticker, period)
+        if cached is None:
+            return None
+        return self._notify(self.memory.put(PriceSeries.from_frame(
+            ticker, cached, cached.attrs.get('period'), loaded_at=os.path.getmtime(self._path(ticker))
+        )))
+    
+    def _notify(self, series: PriceSeries) -> PriceSeries:
+        """Hand a freshly loaded series to the listeners; a failing listener never fails the load"""
+        for listener in self.listeners:
+            try:
+                listener(series)
+            except Exception as e:
+                print(f"Price listener failed for {series.ticker}: {e}")
+        return series
+    
+    def _path(self, ticker: str) -> str:
+        return os.path.join(self.cache_dir, f"{ticker.replace('/', '_')}.pkl")
+    
+    def _read(self, ticker: str, period: str) -> Optional[pd.DataFrame]:
+        path = self._path(ticker)
+        if not os.path.exists(path):
+            return None
+        if not self._is_fresh(os.path.getmtime(path)):
+            return None
+        try:
+            hist = pd.read_pickle(path)
+        except Exception:
+            return None
+        
+        # A cached '1y' download can't serve a '10y' request
+        if not period_covers(hist.attrs.get('period'), period):
+            return None
+        return hist
+    
+    def _write(self, ticker: str, hist: pd.DataFrame, period: str):
+        hist.attrs['period'] = period
+        path = self._path(ticker)
+        try:
+            # Write then rename so other workers never read a half-written file
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            hist.to_pickle(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass  # Caching is best-effort
+    
+    def _download(self, tickers: List[str], period: str):
+        """
+        Bulk-download daily bars in batches, each admitted separately by the upstream scheduler
+        
+        Batches run in parallel, each holding its own scheduler slot under the caller's
+        priority class, so the class concurrency caps bound how many are in flight.
+        
+        Returns:
+            Tuple of (histories by ticker, tickers whose batch returned data for at least one ticker)
+        """
+        def fetch(batch: List[str]) -> Dict[str, pd.DataFrame]:
+            try:
+                return scheduler.call(market_source.download, batch, period, interval='1d',
+                                      cost=market_source.download_cost(batch))
+            except Exception:
+                return {}
+        
+        batches = [tickers[start:start + UPSTREAM_BATCH_SIZE] for start in range(0, len(tickers), UPSTREAM_BATCH_SIZE)]
+        if len(batches) == 1:
+            results = [fetch(batches[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(len(batches), UPSTREAM_MAX_CONCURRENCY)) as executor:
+                # Each batch runs in a copy of the caller's context, which carries its priority class
+                futures = [executor.submit(contextvars.copy_context().run, fetch, batch) for batch in batches]
+                results = [future.result() for future in futures]
+        
+        histories = {}
+        fetched = []
+        for batch, downloaded in zip(batches, results):
+            # An entirely empty batch looks like an outage rather than bad symbols, so only
+            # batches that returned some data vouch for their missing tickers
+            if downloaded:
+                fetched.extend(batch)
+                histories.update({t: h for t, h in downloaded.items() if not h.empty})
+        return histories, fetched
+    
+    def _is_fresh(self, loaded_at: float) -> bool:
+        return time.time() - loaded_at <= self.max_age_seconds
+    
+    @staticmethod
+    def _period_start(period: str) -> Optional[pd.Timestamp]:
+        offset = PERIOD_OFFSETS.get(period)
+        if offset is None:
+            return None
+        return pd.Timestamp.now().normalize() - offset
+
+
+def data_version() -> str:
+    """Identifier of the current market data snapshot; changes with each trading day"""
+    return datetime.now().strftime('%Y-%m-%d')
+
+
+def data_version_started() -> float:
+    """Unix time the current market data snapshot (trading day) began"""
+    return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+
+
+def period_covers(cached_period: Optional[str], period: str) -> bool:
+    """Whether history downloaded for cached_period also covers period"""
+    if cached_period not in PERIOD_ORDER or period not in PERIOD_ORDER:
+        return cached_period == period
+    return PERIOD_ORDER.index(cached_period) >= PERIOD_ORDER.index(period)
@@ -0,0 +1,253 @@
+"""
+Market Source - Pluggable upstream for company info, financial statements and price bars
+Yahoo Finance (through yfinance) in production; an HTTP source talks to the local fake upstream used for load tests,
+and a synthetic source serves a generated universe in-process for reproducible scale tests
+"""
+
+from abc import ABC, abstractmethod
+from typing import List, Dict, Optional
+
+import httpx
+import pandas as pd
+import yfinance as yf
+
+from config import (
+    MARKET_DATA_SOURCE, MARKET_DATA_URL, SYNTHETIC_UNIVERSE_SIZE, SYNTHETIC_UNIVERSE_SEED, UPSTREAM_READ_TIMEOUT
+)
+from synthetic_universe import SyntheticUniverse
+from upstream_http import TimedSession, UpstreamPool, make_http_client, request_timings
+
+
+PRICE_FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Annual statements the analyzer reads, by yfinance attribute name
+STATEMENTS = ['financials', 'balance_sheet', 'cashflow']
+
+
+class MarketDataSource(ABC):
+    """
+    Upstream interface; every method is a blocking call that the caller routes through
+    the upstream scheduler
+    """
+    
+    name = 'base'
+    
+    @abstractmethod
+    def info(self, ticker: str) -> Dict:
+        """Company profile and key statistics (yfinance Ticker.info keys); empty if unknown"""
+    
+    @abstractmethod
+    def statement(self, ticker: str, name: str) -> pd.DataFrame:
+        """Annual statement (line items x period-end dates), newest period first"""
+    
+    @abstractmethod
+    def download(self, tickers: List[str], period: str, interval: str = '1d') -> Dict[str, pd.DataFrame]:
+        """
+        Adjusted OHLCV bars for several tickers in one request
+        
+        Returns:
+            Dict mapping ticker to a DataFrame with PRICE_FIELDS columns; tickers without
+            data are left out, and an empty dict means the whole request returned nothing
+        """
+    
+    def download_one(self, ticker: str, period: str) -> Optional[pd.DataFrame]:
+        """
+        Adjusted daily OHLCV bars for one ticker, checked individually
+        
+        Returns:
+            The bars, or None when the upstream confirms the ticker has no price history;
+            a failed request raises instead, so it is never mistaken for a missing ticker
+        """
+        return self.download([ticker], period).get(ticker)
+    
+    def download_cost(self, tickers: List[str]) -> int:
+        """Upstream requests one download() of these tickers makes, charged against the rate budget"""
+        return 1
+    
+    def symbols(self) -> List[Dict]:
+        """Symbol-master rows when the source defines its own universe, else empty"""
+        return []
+    
+    def tickers(self) -> List[str]:
+        """Tradable tickers when the source defines its own universe, else empty"""
+        return []
+
+
+class YahooSource(MarketDataSource):
+    """
+    Yahoo Finance through yfinance
+    
+    Every request goes through one timed, keep-alive curl session and runs on the threads
+    of a fixed upstream pool, so connections (and their TLS sessions) are reused across
+    calls. Each call, bulk downloads included, occupies one pool thread: the pool is as
+    large as the scheduler's concurrency limit, so an admitted call never queues behind
+    another one's work, and parallel downloads are separate scheduler calls.
+    """
+    
+    name = 'yahoo'
+    
+    def __init__(self, pool: UpstreamPool = None):
+        self.pool = pool or UpstreamPool()
+        self.session = TimedSession('yahoo', impersonate='chrome')
+    
+    def info(self, ticker: str) -> Dict:
+        return self.pool.run(lambda: yf.Ticker(ticker, session=self.session).info)
+    
+    def statement(self, ticker: str, name: str) -> pd.DataFrame:
+        if name not in STATEMENTS:
+            raise ValueError(f"Unknown statement '{name}'")
+        return self.pool.run(lambda: getattr(yf.Ticker(ticker, session=self.session), name))
+    
+    def download(self, tickers: List[str], period: str, interval: str = '1d') -> Dict[str, pd.DataFrame]:
+        def fetch() -> Dict[str, pd.DataFrame]:
+            df = yf.download(tickers, period=period, interval=interval, auto_adjust=True, progress=False,
+                             threads=False, session=self.session, timeout=UPSTREAM_READ_TIMEOUT)
+            if df is None or df.empty:
+                return {}
+            return split_download(df, tickers)
+        
+        if not tickers:
+            return {}
+        return self.pool.run(fetch)
+    
+    def download_one(self, ticker: str, period: str) -> Optional[pd.DataFrame]:
+        # yf.download turns every per-ticker failure (timeouts, throttling) into an empty
+        # result; Ticker.history with raise_errors tells a missing symbol from a failed request
+        def fetch() -> Optional[pd.DataFrame]:
+            try:
+                hist = yf.Ticker(ticker, session=self.session).history(
+                    period=period, auto_adjust=True, raise_errors=True, timeout=UPSTREAM_READ_TIMEOUT
+                )
+            except (yf.exceptions.YFTickerMissingError, yf.exceptions.YFPricesMissingError):
+                return None
+            if hist.index.tz is not None:
+                hist = hist.tz_localize(None)
+            hist = hist[[f for f in PRICE_FIELDS if f in hist.columns]].dropna(how='all')
+            return hist if not hist.empty else None
+        
+        return self.pool.run(fetch)
+    
+    def download_cost(self, tickers: List[str]) -> int:
+        # yf.download requests each ticker's chart separately
+        return max(len(tickers), 1)
+
+
+class HttpSource(MarketDataSource):
+    """
+    JSON-over-HTTP upstream (see fake_upstream.py for the routes)
+    
+    Non-2xx responses other than 404 raise httpx.HTTPStatusError, so throttling and server
+    errors count as upstream failures for the circuit breaker just like Yahoo errors.
+    """
+    
+    name = 'http'
+    
+    def __init__(self, base_url: str = MARKET_DATA_URL):
+        self.base_url = base_url.rstrip('/')
+        self._client = make_http_client(self.base_url, upstream='http')
+    
+    def _get(self, path: str, params: Dict = None) -> httpx.Response:
+        try:
+            return self._client.get(path, params=params)
+        except httpx.TransportError:
+            request_timings.record_error('http')
+            raise
+    
+    def info(self, ticker: str) -> Dict:
+        response = self._get(f"/info/{ticker}")
+        if response.status_code == 404:
+            return {}
+        response.raise_for_status()
+        return response.json()
+    
+    def statement(self, ticker: str, name: str) -> pd.DataFrame:
+        response = self._get(f"/statements/{ticker}/{name}")
+        if response.status_code == 404:
+            return pd.DataFrame()
+        response.raise_for_status()
+        payload = response.json()
+        return pd.DataFrame(payload['data'], index=payload['index'], columns=pd.to_datetime(payload['columns']))
+    
+    def download(self, tickers: List[str], period: str, interval: str = '1d') -> Dict[str, pd.DataFrame]:
+        response = self._get(
+            "/history", params={'tickers': ','.join(tickers), 'period': period, 'interval': interval}
+        )
+        response.raise_for_status()
+        histories = {}
+        for ticker, bars in response.json().items():
+            index = pd.to_datetime(bars.pop('index'))
+            hist = pd.DataFrame(bars, index=index)[[f for f in PRICE_FIELDS if f in bars]]
+            if not hist.empty:
+                histories[ticker] = hist
+        return histories
+
+
+class SyntheticSource(MarketDataSource):
+    """Generated universe served in-process (no network), for reproducible scale tests"""
+    
+    name = 'synthetic'
+    
+    def __init__(self, universe: SyntheticUniverse = None):
+        self.universe = universe or SyntheticUniverse(SYNTHETIC_UNIVERSE_SIZE, SYNTHETIC_UNIVERSE_SEED)
+    
+    def info(self, ticker: str) -> Dict:
+        return self.universe.info(ticker)
+    
+    def statement(self, ticker: str, name: str) -> pd.DataFrame:
+        if name not in STATEMENTS:
+            raise ValueError(f"Unknown statement '{name}'")
+        return self.universe.statement(ticker, name)
+    
+    def download(self, tickers: List[str], period: str, interval: str = '1d') -> Dict[str, pd.DataFrame]:
+        return self.universe.download(tickers, period, interval)
+    
+    def symbols(self) -> List[Dict]:
+        return self.universe.symbols()
+    
+    def tickers(self) -> List[str]:
+        return list(self.universe.tickers)
+
+
+def make_source(name: str = MARKET_DATA_SOURCE, url: str = MARKET_DATA_URL) -> MarketDataSource:
+    """Market data source by name ('yahoo', 'http' or 'synthetic')"""
+    if name == 'yahoo':
+        return YahooSource()
+    if name == 'http':
+        return HttpSource(url)
+    if name == 'synthetic':
+        return SyntheticSource()
+    raise ValueError(f"Unknown market data source '{name}'")
+
+
+def split_download(df: pd.DataFrame, tickers: List[str]) -> Dict[str, pd.DataFrame]:
+    """
+    Split a yf.download result into one OHLCV frame per ticker
+    
+    Handles both the flat single-ticker layout and the (field, ticker) MultiIndex layout.
+    """
+    result = {}
+    if df.index.tz is not None:
+        df = df.tz_localize(None)
+    
+    if not isinstance(df.columns, pd.MultiIndex):
+        if len(tickers) == 1:
+            result[tickers[0]] = df[[f for f in PRICE_FIELDS if f in df.columns]].dropna(how='all')
+        return result
+    
+    # Find which column level holds the field names
+    field_level = 0 if 'Close' in df.columns.get_level_values(0) else 1
+    ticker_level = 1 - field_level
+    available = set(df.columns.get_level_values(ticker_level))
+    
+    for ticker in tickers:
+        if ticker not in available:
+            continue
+        hist = df.xs(ticker, axis=1, level=ticker_level)
+        hist = hist[[f for f in PRICE_FIELDS if f in hist.columns]].dropna(how='all')
+        if not hist.empty:
+            result[ticker] = hist
+    return result
+
+
+# Process-wide upstream, chosen by MARKET_DATA_SOURCE
+market_source = make_source()
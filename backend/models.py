@@ -50,11 +50,35 @@ class TechnicalMetrics(BaseModel):
     trend_direction: Optional[str] = None  # "Bullish", "Neutral", "Bearish"
 
 
+class TimeframeTechnicals(BaseModel):
+    """Technical indicators on daily, weekly or monthly bars resampled from the cached daily history"""
+    timeframe: str  # "daily", "weekly", "monthly"
+    bars: int = 0
+    last_bar_date: Optional[str] = None
+    ma_short_window: Optional[int] = None
+    ma_long_window: Optional[int] = None
+    ma_short: Optional[float] = None
+    ma_long: Optional[float] = None
+    price_vs_ma_short: Optional[float] = None  # Percentage
+    price_vs_ma_long: Optional[float] = None
+    rsi_14: Optional[float] = None
+    macd_spans: Optional[List[int]] = None  # [fast, slow, signal]; shorter on monthly bars
+    macd: Optional[float] = None
+    macd_signal: Optional[float] = None
+    macd_histogram: Optional[float] = None
+    support_level: Optional[float] = None
+    resistance_level: Optional[float] = None
+    trend_direction: Optional[str] = None  # "Bullish", "Neutral", "Bearish"
+
+
 class RiskMetrics(BaseModel):
     """Risk analysis metrics"""
     beta: Optional[float] = None
     max_drawdown_1y: Optional[float] = None
     volatility_1y: Optional[float] = None
+    downside_deviation_1y: Optional[float] = None
+    var_95: Optional[float] = None  # One-day historical VaR, percentage loss
+    cvar_95: Optional[float] = None  # Average one-day loss beyond VaR
     earnings_variability: Optional[float] = None
     debt_risk_score: Optional[float] = None  # 0-100, higher = riskier
     overall_risk_level: Optional[str] = None  # "Low", "Medium", "High"
@@ -84,12 +108,16 @@ class StockAnalysisResponse(BaseModel):
     company_name: Optional[str] = None
     sector: Optional[str] = None
     industry: Optional[str] = None
-    fundamentals: FundamentalMetrics
-    valuation: ValuationMetrics
-    technicals: TechnicalMetrics
-    risk: RiskMetrics
-    scoring: ScoringBreakdown
-    recommendation: Recommendation
-    insights: List[str]  # Plain English insights
+    # Sections left out with ?fields= are not computed and stay None
+    fundamentals: Optional[FundamentalMetrics] = None
+    valuation: Optional[ValuationMetrics] = None
+    technicals: Optional[TechnicalMetrics] = None
+    risk: Optional[RiskMetrics] = None
+    scoring: Optional[ScoringBreakdown] = None
+    recommendation: Optional[Recommendation] = None
+    insights: Optional[List[str]] = None  # Plain English insights
+    timeframes: Optional[Dict[str, TimeframeTechnicals]] = None  # Requested with ?timeframe=weekly,monthly
     last_updated: Optional[str] = None
+    as_of: Optional[str] = None  # When the served analysis was computed
+    stale: Optional[bool] = None  # True while a background refresh replaces an outdated analysis
 
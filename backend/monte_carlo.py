@@ -0,0 +1,164 @@
+"""
+Monte Carlo Simulator - Forward scenarios for a basket of stocks
+Simulates correlated return paths (bootstrapped or multivariate normal) from the cached returns panel
+"""
+
+import numpy as np
+from typing import List, Dict, Optional
+
+from market_data import PriceHistoryCache
+from portfolio_builder import ledoit_wolf_covariance
+
+
+class MonteCarloSimulator:
+    """Vectorized, chunked Monte Carlo simulation of portfolio value paths"""
+    
+    METHODS = ['bootstrap', 'normal']
+    
+    def __init__(self, price_cache: PriceHistoryCache = None):
+        self.price_cache = price_cache or PriceHistoryCache()
+        self.lookback_period = '5y'
+        self.min_observations = 252
+        self.chunk_bytes = 64 * 1024 * 1024  # Memory bound for one chunk of simulated returns
+        self.percentiles = [5, 25, 50, 75, 95]
+    
+    def simulate(self, tickers: List[str], weights: Optional[List[float]] = None,
+                 method: str = 'bootstrap', n_paths: int = 10000, horizon_days: int = 252,
+                 seed: Optional[int] = None, rebalance: bool = True,
+                 initial_value: float = 10000.0) -> Dict:
+        """
+        Simulate portfolio outcomes over a horizon
+        
+        Args:
+            tickers: Ticker symbols in the basket
+            weights: Portfolio weights in ticker order (default: equal weight); normalized to sum to 1
+            method: 'bootstrap' resamples whole historical days (keeps cross-sectional correlation
+                and fat tails); 'normal' draws from a multivariate normal with shrunk covariance
+            n_paths: Number of simulated paths
+            horizon_days: Trading days to simulate
+            seed: Random seed for reproducible results
+            rebalance: Rebalance to the target weights daily; otherwise buy and hold
+            initial_value: Starting portfolio value
+        
+        Returns:
+            Percentile outcomes, probability of loss and drawdown distribution
+        """
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown method '{method}'. Choose from: {', '.join(self.METHODS)}")
+        if n_paths <= 0 or horizon_days <= 0:
+            raise ValueError("n_paths and horizon_days must be positive")
+        
+        returns, weights, excluded = self._load_inputs(tickers, weights)
+        history = returns.values
+        moments = self._moments(history) if method == 'normal' else None
+        rng = np.random.default_rng(seed)
+        
+        terminal = np.empty(n_paths)
+        max_drawdown = np.empty(n_paths)
+        chunk_size = self._chunk_size(horizon_days, 1 if rebalance else returns.shape[1])
+        
+        for start in range(0, n_paths, chunk_size):
+            size = min(chunk_size, n_paths - start)
+            values = self._simulate_chunk(history, weights, moments, size, horizon_days, rebalance, rng)
+            running_max = np.maximum.accumulate(np.maximum(values, 1.0), axis=1)
+            terminal[start:start + size] = values[:, -1]
+            max_drawdown[start:start + size] = (values / running_max - 1).min(axis=1)
+        
+        terminal_return = terminal - 1
+        tail = np.percentile(terminal_return, 5)
+        
+        return {
+            'tickers': list(returns.columns),
+            'weights': {t: round(float(w) * 100, 2) for t, w in zip(returns.columns, weights)},
+            'method': method,
+            'rebalance': rebalance,
+            'n_paths': n_paths,
+            'horizon_days': horizon_days,
+            'seed': seed,
+            'initial_value': initial_value,
+            'expected_return': round(float(terminal_return.mean()) * 100, 2),
+            'probability_of_loss': round(float((terminal_return < 0).mean()) * 100, 2),
+            'var_95': round(float(-tail) * 100, 2),
+            'cvar_95': round(float(-terminal_return[terminal_return <= tail].mean()) * 100, 2),
+            'percentiles': {
+                f"p{p}": {
+                    'return': round(float(np.percentile(terminal_return, p)) * 100, 2),
+                    'value': round(float(np.percentile(terminal, p)) * initial_value, 2),
+                }
+                for p in self.percentiles
+            },
+            # Drawdown percentiles by severity: p95 is the drawdown 95% of paths stay within
+            'max_drawdown': {
+                'mean': round(float(max_drawdown.mean()) * 100, 2),
+                **{f"p{p}": round(float(np.percentile(max_drawdown, 100 - p)) * 100, 2) for p in self.percentiles}
+            },
+            'observations': len(returns),
+            'excluded': excluded,
+        }
+    
+    def _simulate_chunk(self, history: np.ndarray, weights: np.ndarray, moments: Optional[tuple],
+                        size: int, horizon: int, rebalance: bool,
+                        rng: np.random.Generator) -> np.ndarray:
+        """Portfolio value paths (size x horizon), starting from 1.0; moments is None for bootstrap"""
+        if rebalance:
+            # With constant weights the portfolio's daily return is a fixed linear combination,
+            # so correlated asset paths collapse to one series per path
+            if moments is None:
+                daily = (history @ weights)[rng.integers(0, len(history), size=(size, horizon))]
+            else:
+                mean, covariance, _ = moments
+                daily = rng.normal(weights @ mean, np.sqrt(weights @ covariance @ weights), size=(size, horizon))
+            return np.cumprod(1 + np.maximum(daily, -1.0), axis=1)
+        
+        # Buy and hold: each asset compounds on its own, so simulate asset-level paths
+        # (float32 halves memory traffic, which dominates at this size)
+        if moments is None:
+            asset_returns = history.astype(np.float32)[rng.integers(0, len(history), size=(size, horizon))]
+        else:
+            mean, _, cholesky = moments
+            shocks = rng.standard_normal((size, horizon, len(mean)), dtype=np.float32)
+            asset_returns = shocks @ cholesky.T.astype(np.float32) + mean.astype(np.float32)
+        np.maximum(asset_returns, -1.0, out=asset_returns)
+        asset_returns += 1
+        growth = np.cumprod(asset_returns, axis=1, out=asset_returns)
+        return growth @ weights
+    
+    @staticmethod
+    def _moments(history: np.ndarray) -> tuple:
+        covariance, _ = ledoit_wolf_covariance(history)
+        return history.mean(axis=0), covariance, np.linalg.cholesky(covariance)
+    
+    def _chunk_size(self, horizon: int, n_assets: int) -> int:
+        # Simulated returns plus the value and drawdown arrays derived from them
+        bytes_per_path = horizon * max(n_assets, 1) * 8 * 3
+        return max(1, int(self.chunk_bytes // bytes_per_path))
+    
+    def _load_inputs(self, tickers: List[str], weights: Optional[List[float]]):
+        tickers = [t.upper().strip() for t in tickers]
+        if weights is not None and len(weights) != len(tickers):
+            raise ValueError("weights must have one entry per ticker")
+        duplicates = sorted({t for t in tickers if tickers.count(t) > 1})
+        if duplicates:
+            raise ValueError(f"Duplicate tickers: {', '.join(duplicates)}")
+        target = dict(zip(tickers, weights if weights is not None else [1.0] * len(tickers)))
+        
+        close = self.price_cache.get_panel(list(target), period=self.lookback_period, fields=['Close'])['Close']
+        returns = close.pct_change(fill_method=None).iloc[1:]
+        counts = returns.notna().sum()
+        keep = [t for t in target if t in returns.columns and counts[t] >= self.min_observations]
+        if not keep:
+            raise ValueError("Not enough price history for the requested tickers")
+        
+        w = np.array([target[t] for t in keep], dtype=float)
+        if np.any(w < 0) or w.sum() <= 0:
+            raise ValueError("weights must be non-negative and not all zero")
+        excluded = [t for t in target if t not in keep]
+        
+        # Days on which every kept ticker traded; the histories may overlap far less than each is long
+        returns = returns[keep].dropna()
+        if len(returns) < self.min_observations:
+            raise ValueError(
+                f"Only {len(returns)} days of overlapping price history for the requested tickers "
+                f"(at least {self.min_observations} needed)"
+            )
+        return returns, w / w.sum(), excluded
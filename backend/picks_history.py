@@ -0,0 +1,238 @@
+"""
+Picks History - Dated snapshots of daily-picks runs
+Stores every run's scored candidates in SQLite, indexed by date and by ticker, for score histories and day-over-day changes
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple
+
+from config import CACHE_DIR
+
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS pick_runs (
+        date TEXT PRIMARY KEY,
+        generated_at TEXT NOT NULL,
+        candidates INTEGER NOT NULL,
+        picks INTEGER NOT NULL
+    )
+    """,
+    # Clustered on (date, ticker) for whole-day snapshots and day-over-day diffs
+    """
+    CREATE TABLE IF NOT EXISTS pick_snapshots (
+        date TEXT NOT NULL,
+        ticker TEXT NOT NULL,
+        rank INTEGER NOT NULL,
+        picked INTEGER NOT NULL,
+        company_name TEXT,
+        current_price REAL,
+        fundamental_score REAL,
+        technical_score REAL,
+        risk_score REAL,
+        total_score REAL,
+        recommendation TEXT,
+        PRIMARY KEY (date, ticker)
+    ) WITHOUT ROWID
+    """,
+    # Covering index for per-ticker time ranges
+    """
+    CREATE INDEX IF NOT EXISTS idx_pick_snapshots_ticker
+    ON pick_snapshots (ticker, date, rank, picked, total_score, recommendation)
+    """,
+]
+
+SNAPSHOT_COLUMNS = [
+    'date', 'ticker', 'rank', 'picked', 'company_name', 'current_price',
+    'fundamental_score', 'technical_score', 'risk_score', 'total_score', 'recommendation',
+]
+
+
+def parse_date(value: Optional[str]) -> Optional[str]:
+    """Validate a YYYY-MM-DD date string"""
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f"Invalid date '{value}', expected YYYY-MM-DD")
+
+
+class PicksHistory:
+    """Daily-picks snapshots with per-ticker history and entry/exit queries"""
+    
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or os.path.join(CACHE_DIR, 'picks_history.sqlite')
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            for statement in SCHEMA:
+                self._conn.execute(statement)
+            self._conn.commit()
+    
+    def record(self, picks: List[Dict], candidates: Optional[List[Dict]] = None, date: Optional[str] = None):
+        """
+        Store a run, replacing any earlier run for the same date
+        
+        Args:
+            picks: The returned picks, best first
+            candidates: Every scored candidate, best first (picks are added if missing)
+            date: Run date (default: today)
+        """
+        date = parse_date(date) or datetime.now().strftime('%Y-%m-%d')
+        picked = {p['ticker'] for p in picks}
+        rows = list(picks) + [c for c in (candidates or []) if c['ticker'] not in picked]
+        
+        # Picks rank first (they may skip correlated candidates); the rest follow by score
+        records = [
+            (date, r['ticker'], rank, int(r['ticker'] in picked), r.get('company_name'), r.get('current_price'),
+             r.get('fundamental_score'), r.get('technical_score'), r.get('risk_score'),
+             r.get('total_score'), r.get('recommendation'))
+            for rank, r in enumerate(rows, start=1)
+        ]
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM pick_snapshots WHERE date = ?", (date,))
+            self._conn.executemany(
+                f"INSERT INTO pick_snapshots VALUES ({', '.join('?' * len(SNAPSHOT_COLUMNS))})", records
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pick_runs VALUES (?, ?, ?, ?)",
+                (date, datetime.now().isoformat(), len(records), len(picked))
+            )
+    
+    def dates(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict]:
+        """Stored runs in a date range, newest first"""
+        start, end = self._range(start, end)
+        rows = self._query(
+            "SELECT * FROM pick_runs WHERE date BETWEEN ? AND ? ORDER BY date DESC", (start, end)
+        )
+        return [dict(r) for r in rows]
+    
+    def snapshot(self, date: str, picks_only: bool = False) -> List[Dict]:
+        """A run's candidates (or just its picks), by rank"""
+        sql = "SELECT * FROM pick_snapshots WHERE date = ?" + (" AND picked = 1" if picks_only else "")
+        return [_snapshot_row(r) for r in self._query(sql + " ORDER BY rank", (parse_date(date),))]
+    
+    def ticker_history(self, ticker: str, start: Optional[str] = None, end: Optional[str] = None) -> Dict:
+        """
+        A ticker's scores, rank and recommendation across runs
+        
+        Args:
+            ticker: Stock symbol
+            start: First date (inclusive, default: all history)
+            end: Last date (inclusive, default: latest run)
+        
+        Returns:
+            History rows (oldest first) and current streaks counted back from the latest
+            run in range: consecutive runs as a pick and with the same recommendation
+        """
+        ticker = ticker.upper().strip()
+        start, end = self._range(start, end)
+        rows = [_snapshot_row(r) for r in self._query(
+            "SELECT * FROM pick_snapshots WHERE ticker = ? AND date BETWEEN ? AND ? ORDER BY date",
+            (ticker, start, end)
+        )]
+        run_dates = [r['date'] for r in self._query(
+            "SELECT date FROM pick_runs WHERE date BETWEEN ? AND ? ORDER BY date DESC", (start, end)
+        )]
+        by_date = {r['date']: r for r in rows}
+        
+        # Walk back from the latest run until the ticker drops out or its recommendation changes
+        latest = by_date.get(run_dates[0]) if run_dates else None
+        pick_streak = recommendation_streak = 0
+        since = None
+        for date in run_dates:
+            row = by_date.get(date)
+            if row is None or not row['picked']:
+                break
+            pick_streak += 1
+        for date in run_dates:
+            row = by_date.get(date)
+            if latest is None or row is None or row['recommendation'] != latest['recommendation']:
+                break
+            recommendation_streak += 1
+            since = date
+        
+        return {
+            'ticker': ticker,
+            'runs': len(run_dates),
+            'runs_scored': len(rows),
+            'runs_picked': sum(1 for r in rows if r['picked']),
+            'current': {
+                'recommendation': latest['recommendation'] if latest else None,
+                'recommendation_since': since,
+                'recommendation_streak': recommendation_streak,
+                'pick_streak': pick_streak,
+            },
+            'history': rows,
+        }
+    
+    def changes(self, date: Optional[str] = None, since: Optional[str] = None) -> Dict:
+        """
+        Picks that entered or left, and rank changes, between two runs
+        
+        Args:
+            date: Later run (default: latest)
+            since: Earlier run (default: the run before date); any date picks the
+                latest run on or before it
+        
+        Returns:
+            Entries, exits and rank changes of tickers picked in both runs
+        """
+        date = self._run_on_or_before(parse_date(date))
+        if date is None:
+            raise ValueError("No daily-picks runs recorded yet")
+        if since is None:
+            previous = self._query("SELECT MAX(date) AS date FROM pick_runs WHERE date < ?", (date,))[0]['date']
+        else:
+            previous = self._run_on_or_before(parse_date(since))
+        
+        current = {r['ticker']: r for r in self.snapshot(date, picks_only=True)}
+        before = {r['ticker']: r for r in self.snapshot(previous, picks_only=True)} if previous else {}
+        
+        rank_changes = []
+        for ticker in current.keys() & before.keys():
+            rank_changes.append({
+                'ticker': ticker,
+                'rank': current[ticker]['rank'],
+                'previous_rank': before[ticker]['rank'],
+                'change': before[ticker]['rank'] - current[ticker]['rank'],
+                'total_score': current[ticker]['total_score'],
+                'previous_total_score': before[ticker]['total_score'],
+            })
+        rank_changes.sort(key=lambda x: x['rank'])
+        
+        return {
+            'date': date,
+            'since': previous,
+            'entered': sorted((current[t] for t in current.keys() - before.keys()), key=lambda x: x['rank']),
+            'exited': sorted((before[t] for t in before.keys() - current.keys()), key=lambda x: x['rank']),
+            'rank_changes': rank_changes,
+        }
+    
+    def _run_on_or_before(self, date: Optional[str]) -> Optional[str]:
+        if date is None:
+            return self._query("SELECT MAX(date) AS date FROM pick_runs")[0]['date']
+        return self._query("SELECT MAX(date) AS date FROM pick_runs WHERE date <= ?", (date,))[0]['date']
+    
+    def _range(self, start: Optional[str], end: Optional[str]) -> Tuple[str, str]:
+        start, end = parse_date(start) or '0000-00-00', parse_date(end) or '9999-99-99'
+        if start > end:
+            raise ValueError("start must not be after end")
+        return start, end
+    
+    def _query(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+
+def _snapshot_row(row: sqlite3.Row) -> Dict:
+    result = dict(row)
+    result['picked'] = bool(result['picked'])
+    return result
@@ -0,0 +1,218 @@
+"""
+Portfolio Builder - Turn ranked picks into portfolio weights
+Equal-weight, inverse-volatility, risk-parity and constrained mean-variance allocation
+"""
+
+import numpy as np
+import pandas as pd
+from typing import List, Dict, Optional, Tuple
+from scipy.optimize import minimize
+
+from market_data import PriceHistoryCache
+
+
+class PortfolioBuilder:
+    """Builds long-only portfolio weights from the cached returns panel"""
+    
+    METHODS = ['equal_weight', 'inverse_volatility', 'risk_parity', 'mean_variance']
+    
+    def __init__(self, price_cache: PriceHistoryCache = None):
+        self.price_cache = price_cache or PriceHistoryCache()
+        self.lookback_period = '2y'
+        self.min_observations = 60  # Trading days required to include a ticker
+        self.return_shrinkage = 0.5  # Pull of expected returns toward the cross-sectional mean
+    
+    def build(self, tickers: List[str], method: str = 'risk_parity',
+              max_weight: Optional[float] = None, risk_aversion: float = 3.0) -> Dict:
+        """
+        Compute portfolio weights for a list of tickers
+        
+        Args:
+            tickers: Ticker symbols to allocate across
+            method: One of METHODS
+            max_weight: Optional per-position cap (fraction, e.g. 0.2); enforced by mean_variance
+                and used to clip the other methods
+            risk_aversion: Risk aversion for mean_variance (higher = closer to minimum variance)
+        
+        Returns:
+            Weights, expected return/volatility and per-holding risk contributions
+        """
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown method '{method}'. Choose from: {', '.join(self.METHODS)}")
+        
+        returns, excluded = self._load_returns(tickers)
+        n = returns.shape[1]
+        if n == 0:
+            raise ValueError("No price history available for the requested tickers")
+        if max_weight is not None and max_weight * n < 1:
+            raise ValueError(f"max_weight {max_weight} is infeasible for {n} holdings")
+        
+        covariance, shrinkage = ledoit_wolf_covariance(returns.values)
+        covariance *= 252
+        mean_returns = returns.values.mean(axis=0) * 252
+        expected_returns = (1 - self.return_shrinkage) * mean_returns + self.return_shrinkage * mean_returns.mean()
+        volatility = np.sqrt(np.diag(covariance))
+        
+        converged = True
+        if method == 'equal_weight':
+            weights = np.full(n, 1.0 / n)
+        elif method == 'inverse_volatility':
+            weights = inverse_volatility_weights(covariance)
+        elif method == 'risk_parity':
+            weights, converged = risk_parity_weights(covariance)
+        else:
+            weights, converged = mean_variance_weights(expected_returns, covariance, risk_aversion, max_weight)
+        
+        if max_weight is not None and (method != 'mean_variance' or not converged):
+            weights = cap_weights(weights, max_weight)
+        
+        portfolio_variance = float(weights @ covariance @ weights)
+        portfolio_volatility = np.sqrt(portfolio_variance)
+        risk_contributions = weights * (covariance @ weights) / portfolio_variance if portfolio_variance > 0 else weights
+        
+        holdings = [
+            {
+                'ticker': ticker,
+                'weight': round(float(weights[i]) * 100, 2),
+                'expected_return': round(float(expected_returns[i]) * 100, 2),
+                'volatility': round(float(volatility[i]) * 100, 2),
+                'risk_contribution': round(float(risk_contributions[i]) * 100, 2),
+            }
+            for i, ticker in enumerate(returns.columns)
+        ]
+        holdings.sort(key=lambda x: x['weight'], reverse=True)
+        
+        return {
+            'method': method,
+            'converged': converged,  # False when the optimizer failed and inverse-volatility weights were used
+            'holdings': holdings,
+            'expected_return': round(float(weights @ expected_returns) * 100, 2),
+            'expected_volatility': round(float(portfolio_volatility) * 100, 2),
+            'diversification_ratio': round(float(weights @ volatility / portfolio_volatility), 3) if portfolio_volatility > 0 else None,
+            'covariance_shrinkage': round(float(shrinkage), 3),
+            'observations': len(returns),
+            'excluded': excluded,
+        }
+    
+    def _load_returns(self, tickers: List[str]) -> Tuple[pd.DataFrame, List[str]]:
+        """
+        Daily returns for tickers with enough overlapping history
+        
+        Only dates where every kept ticker has a return are used, so tickers with the
+        shortest history are dropped (and reported as excluded) until the joint sample
+        has at least min_observations rows.
+        """
+        tickers = list(dict.fromkeys(t.upper().strip() for t in tickers))
+        close = self.price_cache.get_panel(tickers, period=self.lookback_period, fields=['Close'])['Close']
+        returns = close.pct_change(fill_method=None).iloc[1:]
+        
+        counts = returns.notna().sum()
+        keep = [t for t in tickers if t in returns.columns and counts[t] >= self.min_observations]
+        joint = returns[keep].dropna()
+        while len(keep) > 1 and len(joint) < self.min_observations:
+            keep.remove(min(keep, key=lambda t: counts[t]))
+            joint = returns[keep].dropna()
+        excluded = [t for t in tickers if t not in keep]
+        return joint, excluded
+
+
+def ledoit_wolf_covariance(returns: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    Ledoit-Wolf shrinkage of the sample covariance toward a scaled identity
+    
+    Args:
+        returns: Observations x assets array of returns
+    
+    Returns:
+        (shrunk covariance, shrinkage intensity between 0 and 1)
+    """
+    t, n = returns.shape
+    x = returns - returns.mean(axis=0)
+    sample = x.T @ x / t
+    mu = np.trace(sample) / n
+    target = mu * np.eye(n)
+    
+    delta = ((sample - target) ** 2).sum()
+    # sum_t ||x_t x_t' - S||^2 = sum_t ||x_t||^4 - T ||S||^2
+    beta_bar = ((x ** 2).sum(axis=1) ** 2).sum() - t * (sample ** 2).sum()
+    beta = min(beta_bar / t ** 2, delta)
+    shrinkage = beta / delta if delta > 0 else 1.0
+    return shrinkage * target + (1 - shrinkage) * sample, shrinkage
+
+
+def inverse_volatility_weights(covariance: np.ndarray) -> np.ndarray:
+    """Weights proportional to 1 / volatility"""
+    inverse = 1 / np.sqrt(np.diag(covariance))
+    return inverse / inverse.sum()
+
+
+def _solved(result, weights: np.ndarray) -> bool:
+    """Whether an optimizer run converged to usable weights"""
+    return bool(result.success and np.all(np.isfinite(weights)) and weights.sum() > 0)
+
+
+def risk_parity_weights(covariance: np.ndarray) -> Tuple[np.ndarray, bool]:
+    """
+    Equal risk contribution weights
+    
+    Solves the convex formulation min 0.5 y'Cy - (1/n) sum(log y), whose solution
+    rescaled to sum to one has equal risk contributions.
+    
+    Returns:
+        (weights, converged); inverse-volatility weights if the optimizer did not converge
+    """
+    n = covariance.shape[0]
+    budget = np.full(n, 1.0 / n)
+    
+    def objective(y):
+        cy = covariance @ y
+        return 0.5 * y @ cy - budget @ np.log(y), cy - budget / y
+    
+    start = 1 / np.sqrt(np.diag(covariance))
+    result = minimize(objective, start / start.sum(), jac=True, method='L-BFGS-B',
+                      bounds=[(1e-10, None)] * n)
+    if not _solved(result, result.x):
+        return inverse_volatility_weights(covariance), False
+    return result.x / result.x.sum(), True
+
+
+def mean_variance_weights(expected_returns: np.ndarray, covariance: np.ndarray,
+                          risk_aversion: float, max_weight: Optional[float] = None) -> Tuple[np.ndarray, bool]:
+    """
+    Long-only mean-variance weights: max w'mu - (risk_aversion / 2) w'Cw, fully invested
+    
+    Returns:
+        (weights, converged); inverse-volatility weights (left for the caller to cap) if
+        SLSQP did not converge
+    """
+    n = len(expected_returns)
+    upper = max_weight if max_weight is not None else 1.0
+    
+    def objective(w):
+        cw = covariance @ w
+        return -(w @ expected_returns) + 0.5 * risk_aversion * (w @ cw), -expected_returns + risk_aversion * cw
+    
+    result = minimize(
+        objective, np.full(n, 1.0 / n), jac=True, method='SLSQP',
+        bounds=[(0.0, upper)] * n,
+        constraints=[{'type': 'eq', 'fun': lambda w: w.sum() - 1, 'jac': lambda w: np.ones(n)}],
+        options={'maxiter': 500, 'ftol': 1e-10}
+    )
+    weights = np.clip(result.x, 0, upper)
+    if not _solved(result, weights):
+        return inverse_volatility_weights(covariance), False
+    return weights / weights.sum(), True
+
+
+def cap_weights(weights: np.ndarray, max_weight: float) -> np.ndarray:
+    """Clip weights at max_weight and redistribute the excess pro rata to uncapped holdings"""
+    weights = weights.copy()
+    for _ in range(len(weights)):
+        over = weights > max_weight
+        excess = (weights[over] - max_weight).sum()
+        if excess <= 1e-12:
+            break
+        weights[over] = max_weight
+        under = weights < max_weight
+        weights[under] += excess * weights[under] / weights[under].sum()
+    return weights
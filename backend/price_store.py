@@ -0,0 +1,196 @@
+"""
+Price Store - Compact in-memory daily price history
+Holds OHLCV as contiguous float32/int64 arrays per ticker under a byte budget, evicting least recently used tickers
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import PRICE_STORE_MAX_MB
+
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+VOLUME_COLUMN = 'Volume'
+
+_EPOCH_DAY = np.datetime64('1970-01-01', 'D')
+
+
+class PriceSeries:
+    """One ticker's daily bars: int32 day numbers, a (4, n) float32 price block and int64 volume"""
+    
+    __slots__ = ('ticker', 'period', 'days', 'prices', 'volume', 'loaded_at')
+    
+    def __init__(self, ticker: str, period: str, days: np.ndarray, prices: np.ndarray,
+                 volume: np.ndarray, loaded_at: float):
+        self.ticker = ticker
+        self.period = period
+        self.days = days
+        self.prices = prices
+        self.volume = volume
+        self.loaded_at = loaded_at
+        # Callers get views into these arrays, so keep them immutable
+        for array in (days, prices, volume):
+            array.setflags(write=False)
+    
+    @classmethod
+    def from_frame(cls, ticker: str, hist: pd.DataFrame, period: str,
+                   loaded_at: Optional[float] = None) -> 'PriceSeries':
+        """Pack an OHLCV DataFrame (extra columns such as Dividends are dropped)"""
+        hist = hist[~hist.index.duplicated(keep='last')].sort_index()
+        index = pd.DatetimeIndex(hist.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        days = (index.values.astype('datetime64[D]') - _EPOCH_DAY).astype(np.int32)
+        
+        prices = np.full((len(PRICE_COLUMNS), len(hist)), np.nan, dtype=np.float32)
+        for row, column in enumerate(PRICE_COLUMNS):
+            if column in hist.columns:
+                prices[row] = hist[column].to_numpy(dtype=np.float32, na_value=np.nan)
+        if VOLUME_COLUMN in hist.columns:
+            volume = hist[VOLUME_COLUMN].fillna(0).to_numpy(dtype=np.int64)
+        else:
+            volume = np.zeros(len(hist), dtype=np.int64)
+        return cls(ticker, period, days, prices, volume, loaded_at or time.time())
+    
+    @property
+    def nbytes(self) -> int:
+        return self.days.nbytes + self.prices.nbytes + self.volume.nbytes
+    
+    def __len__(self) -> int:
+        return len(self.days)
+    
+    def start_position(self, start: Optional[pd.Timestamp]) -> int:
+        """Index of the first bar on or after start"""
+        if start is None:
+            return 0
+        day = (np.datetime64(start.date(), 'D') - _EPOCH_DAY).astype(np.int32)
+        return int(np.searchsorted(self.days, day, side='left'))
+    
+    def column(self, field: str, start: Optional[pd.Timestamp] = None) -> np.ndarray:
+        """Read-only view of one field from start on (no copy)"""
+        position = self.start_position(start)
+        if field == VOLUME_COLUMN:
+            return self.volume[position:]
+        return self.prices[PRICE_COLUMNS.index(field), position:]
+    
+    def frame(self, start: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        """
+        OHLCV DataFrame from start on
+        
+        Prices are widened back to float64 in the returned frame so callers' numerics and
+        JSON output are unchanged; only the stored copy is compact.
+        """
+        position = self.start_position(start)
+        data = {column: self.prices[row, position:].astype(np.float64) for row, column in enumerate(PRICE_COLUMNS)}
+        data[VOLUME_COLUMN] = self.volume[position:]
+        frame = pd.DataFrame(data, index=days_to_index(self.days[position:]))
+        frame.attrs['period'] = self.period
+        return frame
+
+
+class PriceStore:
+    """
+    Thread-safe LRU of PriceSeries bounded by total array bytes
+    
+    A series larger than the whole budget is handed back to the caller but not retained.
+    """
+    
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes if max_bytes is not None else int(PRICE_STORE_MAX_MB * 1024 * 1024)
+        self._series: 'OrderedDict[str, PriceSeries]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, ticker: str) -> Optional[PriceSeries]:
+        with self._lock:
+            series = self._series.get(ticker)
+            if series is None:
+                self.misses += 1
+                return None
+            self._series.move_to_end(ticker)
+            self.hits += 1
+            return series
+    
+    def put(self, series: PriceSeries) -> PriceSeries:
+        """Store a series, replacing the ticker's previous one and evicting as needed"""
+        with self._lock:
+            old = self._series.pop(series.ticker, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            if series.nbytes > self.max_bytes:
+                return series
+            self._series[series.ticker] = series
+            self._bytes += series.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._series.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+        return series
+    
+    def discard(self, ticker: str):
+        with self._lock:
+            series = self._series.pop(ticker, None)
+            if series is not None:
+                self._bytes -= series.nbytes
+    
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+            self._bytes = 0
+    
+    def stats(self, per_ticker: bool = False, limit: int = 50) -> Dict:
+        """
+        Memory and hit-rate counters
+        
+        Args:
+            per_ticker: Include the largest entries' bar counts and bytes
+            limit: Number of per-ticker entries to include
+        """
+        with self._lock:
+            entries = [(s.ticker, len(s), s.nbytes, s.period) for s in self._series.values()]
+            result = {
+                'entries': len(entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'utilization': round(self._bytes / self.max_bytes, 4) if self.max_bytes else 0.0,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+        if entries:
+            result['avg_bytes_per_ticker'] = round(sum(e[2] for e in entries) / len(entries))
+        if per_ticker:
+            entries.sort(key=lambda e: e[2], reverse=True)
+            result['tickers'] = [
+                {'ticker': t, 'bars': bars, 'bytes': nbytes, 'period': period}
+                for t, bars, nbytes, period in entries[:limit]
+            ]
+        return result
+
+
+def days_to_index(days: np.ndarray) -> pd.DatetimeIndex:
+    return pd.DatetimeIndex((_EPOCH_DAY + days.astype('timedelta64[D]')).astype('datetime64[ns]'))
+
+
+def aligned_panel(series: List[PriceSeries], field: str, start: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    """
+    Dates x tickers float64 frame for one field, filled straight from the stored arrays
+    
+    Dates are the union across tickers; bars a ticker doesn't have are NaN.
+    """
+    views = [(s.ticker, s.days[s.start_position(start):], s.column(field, start)) for s in series]
+    if not views:
+        return pd.DataFrame()
+    all_days = np.unique(np.concatenate([days for _, days, _ in views]))
+    values = np.full((len(all_days), len(views)), np.nan, dtype=np.float64)
+    for column, (_, days, data) in enumerate(views):
+        values[np.searchsorted(all_days, days), column] = data
+    return pd.DataFrame(values, index=days_to_index(all_days), columns=[t for t, _, _ in views])
@@ -0,0 +1,216 @@
+"""
+Quote Stream - Live quote fan-out with a single shared poller
+One background task polls quotes for the union of all subscribed tickers and pushes changes to every subscriber
+"""
+
+import asyncio
+import random
+import time
+from typing import List, Dict, Set, Callable, Optional
+
+from market_source import market_source
+from upstream_scheduler import scheduler
+
+
+QuoteFetcher = Callable[[List[str]], Dict[str, Dict]]
+
+
+def fetch_market_quotes(tickers: List[str]) -> Dict[str, Dict]:
+    """
+    Latest one-minute bar for each ticker, fetched from the market data source in a single bulk request
+    
+    Returns:
+        Dict mapping ticker to {'price', 'volume', 'timestamp'}
+    """
+    # One shared request serves every live viewer, so it is treated as interactive
+    bars_by_ticker = scheduler.call(market_source.download, tickers, '1d', interval='1m', priority='interactive',
+                                    cost=market_source.download_cost(tickers))
+    
+    quotes = {}
+    for ticker, bars in bars_by_ticker.items():
+        bars = bars.dropna(subset=['Close'])
+        if bars.empty:
+            continue
+        quotes[ticker] = {
+            'price': round(float(bars['Close'].iloc[-1]), 4),
+            'volume': int(bars['Volume'].iloc[-1]) if 'Volume' in bars else None,
+            'timestamp': bars.index[-1].isoformat(),
+        }
+    return quotes
+
+
+class FakeQuoteFeed:
+    """Local random-walk quote source for development and tests"""
+    
+    def __init__(self, start_price: float = 100.0, volatility: float = 0.001, seed: Optional[int] = None):
+        self.start_price = start_price
+        self.volatility = volatility
+        self.prices: Dict[str, float] = {}
+        self.requests = 0
+        self._random = random.Random(seed)
+    
+    def __call__(self, tickers: List[str]) -> Dict[str, Dict]:
+        self.requests += 1
+        quotes = {}
+        for ticker in tickers:
+            price = self.prices.get(ticker, self.start_price)
+            price *= 1 + self._random.gauss(0, self.volatility)
+            self.prices[ticker] = price
+            quotes[ticker] = {
+                'price': round(price, 4),
+                'volume': self._random.randint(100, 10000),
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            }
+        return quotes
+
+
+class Subscription:
+    """A subscriber's tickers and its outgoing queue of quote updates"""
+    
+    def __init__(self, tickers: Set[str], max_queue: int = 100):
+        self.tickers = set(tickers)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.last_sent: Dict[str, float] = {}
+    
+    def push(self, update: Dict):
+        """Queue an update, dropping the oldest one if a slow client has fallen behind"""
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(update)
+
+
+class QuotePoller:
+    """
+    Shared poller: upstream load scales with unique tickers, not with connected clients
+    
+    At most max_tickers unique tickers are polled; tickers a subscriber adds beyond that are
+    refused, and the subscriber gets an error update listing them.
+    """
+    
+    def __init__(self, fetch_quotes: QuoteFetcher = None, interval: float = 15.0, max_tickers: int = 500):
+        self.fetch_quotes = fetch_quotes or fetch_market_quotes
+        self.interval = interval
+        self.max_tickers = max_tickers
+        self.subscriptions: List[Subscription] = []
+        self.latest: Dict[str, Dict] = {}
+        # Called with every poll's quotes (e.g. to evaluate alerts on live prices)
+        self.listeners: List[Callable[[Dict[str, Dict]], None]] = []
+        self.polls = 0
+        self.errors = 0
+        self._task: Optional[asyncio.Task] = None
+    
+    def subscribe(self, tickers: List[str]) -> Subscription:
+        """Register a subscriber and start polling if this is the first one"""
+        subscription = Subscription(set())
+        subscription.tickers = self._admit(subscription, self._normalize(tickers))
+        self.subscriptions.append(subscription)
+        self._send_snapshot(subscription, subscription.tickers)
+        self._ensure_running()
+        return subscription
+    
+    def update(self, subscription: Subscription, add: List[str] = None, remove: List[str] = None):
+        """Change a subscriber's tickers"""
+        subscription.tickers -= self._normalize(remove or [])
+        added = self._admit(subscription, self._normalize(add or []) - subscription.tickers)
+        subscription.tickers |= added
+        self._send_snapshot(subscription, added)
+    
+    def unsubscribe(self, subscription: Subscription):
+        """Remove a subscriber; polling stops when nobody is subscribed"""
+        if subscription in self.subscriptions:
+            self.subscriptions.remove(subscription)
+        if not self.subscriptions and self._task is not None:
+            self._task.cancel()
+            self._task = None
+    
+    def subscribed_tickers(self) -> List[str]:
+        """Union of all subscribers' tickers"""
+        tickers = set()
+        for subscription in self.subscriptions:
+            tickers |= subscription.tickers
+        return sorted(tickers)
+    
+    async def poll_once(self) -> Dict[str, Dict]:
+        """Fetch quotes for every subscribed ticker once and fan the changes out"""
+        tickers = self.subscribed_tickers()
+        if not tickers:
+            return {}
+        
+        quotes = await asyncio.to_thread(self.fetch_quotes, tickers)
+        self.polls += 1
+        self.latest.update(quotes)
+        
+        for subscription in list(self.subscriptions):
+            changed = {
+                t: q for t, q in quotes.items()
+                if t in subscription.tickers and subscription.last_sent.get(t) != q['price']
+            }
+            if changed:
+                for ticker, quote in changed.items():
+                    subscription.last_sent[ticker] = quote['price']
+                subscription.push({'type': 'quotes', 'quotes': changed})
+        
+        # Listeners (e.g. alert evaluation) may block on locks and SQLite, so they run off the
+        # event loop after the subscribers have their quotes; one failing doesn't stop the others
+        for listener in self.listeners:
+            try:
+                await asyncio.to_thread(listener, quotes)
+            except Exception as e:
+                self.errors += 1
+                print(f"Quote listener failed: {e}")
+        return quotes
+    
+    def stats(self) -> Dict:
+        """Subscriber and polling counters"""
+        return {
+            'subscribers': len(self.subscriptions),
+            'unique_tickers': len(self.subscribed_tickers()),
+            'interval_seconds': self.interval,
+            'polls': self.polls,
+            'errors': self.errors,
+            'running': self._task is not None,
+        }
+    
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.errors += 1
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+    
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+    
+    def _admit(self, subscription: Subscription, tickers: Set[str]) -> Set[str]:
+        """Tickers that fit under max_tickers; the subscriber is told about the ones that don't"""
+        polled = set(self.subscribed_tickers())
+        room = max(self.max_tickers - len(polled), 0)
+        new = sorted(tickers - polled)
+        refused = new[room:]
+        if refused:
+            subscription.push({
+                'type': 'error',
+                'message': f"Quote subscriptions are limited to {self.max_tickers} tickers",
+                'rejected': refused,
+            })
+        return tickers - set(refused)
+    
+    def _send_snapshot(self, subscription: Subscription, tickers: Set[str]):
+        """Give a new subscriber the latest known quotes without waiting for the next poll"""
+        snapshot = {t: self.latest[t] for t in tickers if t in self.latest}
+        if snapshot:
+            for ticker, quote in snapshot.items():
+                subscription.last_sent[ticker] = quote['price']
+            subscription.push({'type': 'quotes', 'quotes': snapshot})
+    
+    @staticmethod
+    def _normalize(tickers: List[str]) -> Set[str]:
+        return {t.upper().strip() for t in tickers if t and t.strip()}
@@ -0,0 +1,207 @@
+"""
+Request Coalescer - Single-flight execution with stampede protection
+Concurrent identical computations share one result; cached results are refreshed early with probabilistic (XFetch) refresh,
+and may be served stale while a background refresh runs
+"""
+
+import asyncio
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from shared_cache import SharedCache, cache_key
+
+
+class _Entry:
+    __slots__ = ('value', 'computed_at', 'duration', 'expires_at', 'stale_until')
+    
+    def __init__(self, value: Any, computed_at: float, duration: float, expires_at: float,
+                 stale_until: Optional[float] = None):
+        self.value = value
+        self.computed_at = computed_at
+        self.duration = duration
+        self.expires_at = expires_at
+        self.stale_until = stale_until if stale_until is not None else expires_at
+
+
+class CachedResult:
+    """A result with the time it was computed and whether it was served past its freshness"""
+    
+    __slots__ = ('value', 'computed_at', 'stale')
+    
+    def __init__(self, value: Any, computed_at: float, stale: bool):
+        self.value = value
+        self.computed_at = computed_at
+        self.stale = stale
+
+
+class RequestCoalescer:
+    """
+    Deduplicates in-flight computations and caches their results for a TTL
+    
+    With a shared cache, misses are filled through it, so identical requests hitting
+    different worker processes are also computed only once per host.
+    
+    With stale_ttl, a result past its TTL (or computed before fresh_after) is still returned
+    immediately for stale_ttl more seconds while one background refresh replaces it; only
+    a missing or fully expired result makes the caller wait.
+    """
+    
+    def __init__(self, max_entries: int = 1024, beta: float = 1.0, shared: Optional[SharedCache] = None):
+        self.max_entries = max_entries
+        self.beta = beta  # > 1 refreshes earlier, < 1 later
+        self.shared = shared
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        # Thread-safe futures so callers on different event loops (e.g. several workers' threads) can share them
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.early_refreshes = 0
+        self.stale_hits = 0
+        self.refresh_errors = 0
+    
+    async def get(self, key: Hashable, compute: Callable[[], Any], ttl: float) -> Any:
+        """
+        Return the cached result for key, or compute it once for all concurrent callers
+        
+        Args:
+            key: Identity of the computation (endpoint, arguments and data version)
+            compute: Blocking function producing the result; runs in its own worker thread
+            ttl: Seconds the result stays valid
+        
+        Returns:
+            The computed (or cached) result; exceptions from compute are raised to every waiter
+        """
+        return (await self.get_result(key, compute, ttl)).value
+    
+    async def get_result(self, key: Hashable, compute: Callable[[], Any], ttl: float,
+                         stale_ttl: float = 0.0, fresh_after: Optional[float] = None) -> CachedResult:
+        """
+        Like get(), with stale-while-revalidate and the result's age
+        
+        Args:
+            key: Identity of the computation
+            compute: Blocking function producing the result
+            ttl: Seconds the result stays fresh
+            stale_ttl: Further seconds a result may be served stale while it is refreshed
+            fresh_after: Results computed before this time are stale (e.g. before the
+                current trading day began), even within their TTL
+        
+        Returns:
+            CachedResult with the value, when it was computed and whether it was stale
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now < entry.expires_at and (fresh_after is None or entry.computed_at >= fresh_after):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                # Occasionally recompute before expiry so the entry never expires under load
+                if key not in self._inflight and self._should_refresh_early(entry, now):
+                    self.early_refreshes += 1
+                    self._start(key, compute, ttl, stale_ttl, refresh=True)
+                return CachedResult(entry.value, entry.computed_at, stale=False)
+            
+            if entry is not None and now < entry.stale_until:
+                # Serve the old result now; one background refresh replaces it
+                self._entries.move_to_end(key)
+                self.stale_hits += 1
+                if key not in self._inflight:
+                    self._start(key, compute, ttl, stale_ttl, refresh=True)
+                return CachedResult(entry.value, entry.computed_at, stale=True)
+            
+            self.misses += 1
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._start(key, compute, ttl, stale_ttl, fresh_after=fresh_after)
+            else:
+                self.coalesced += 1
+        # Shield so one cancelled caller doesn't cancel the shared computation
+        return await asyncio.shield(asyncio.wrap_future(future))
+    
+    def peek(self, key: Hashable, fresh_after: Optional[float] = None) -> Optional[CachedResult]:
+        """This worker's fresh result for key, if any, without computing or refreshing it"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now >= entry.expires_at or (fresh_after is not None and entry.computed_at < fresh_after):
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return CachedResult(entry.value, entry.computed_at, stale=False)
+    
+    def invalidate(self, key: Hashable):
+        """Drop a cached result so the next request recomputes it"""
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.shared is not None:
+            self.shared.delete(cache_key('coalescer', key))
+    
+    def stats(self) -> Dict:
+        """Cache and coalescing counters"""
+        return {
+            'entries': len(self._entries),
+            'in_flight': len(self._inflight),
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'early_refreshes': self.early_refreshes,
+            'stale_hits': self.stale_hits,
+            'refresh_errors': self.refresh_errors,
+        }
+    
+    def _should_refresh_early(self, entry: _Entry, now: float) -> bool:
+        # XFetch: refresh with probability rising as expiry nears, scaled by how long a recompute takes
+        return now - entry.duration * self.beta * math.log(1.0 - random.random()) >= entry.expires_at
+    
+    def _start(self, key: Hashable, compute: Callable[[], Any], ttl: float, stale_ttl: float = 0.0,
+               refresh: bool = False, fresh_after: Optional[float] = None) -> Future:
+        """Launch compute in a worker thread; called with the lock held"""
+        future = Future()
+        self._inflight[key] = future
+        threading.Thread(
+            target=self._run, args=(key, compute, ttl, stale_ttl, future, refresh, fresh_after), daemon=True
+        ).start()
+        return future
+    
+    def _run(self, key: Hashable, compute: Callable[[], Any], ttl: float, stale_ttl: float, future: Future,
+             refresh: bool, fresh_after: Optional[float]):
+        started = time.time()
+        try:
+            if self.shared is not None:
+                # Another worker may already have the result, or be computing it; the shared
+                # entry is kept for the stale window too
+                shared = self.shared.fill(cache_key('coalescer', key), compute, ttl + stale_ttl, refresh=refresh)
+                value, duration, computed_at = shared.value, shared.duration, shared.created_at
+                stale_until = shared.expires_at
+            else:
+                value = compute()
+                computed_at = time.time()
+                duration, stale_until = computed_at - started, computed_at + ttl + stale_ttl
+        except Exception as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+                if refresh:
+                    self.refresh_errors += 1
+            future.set_exception(e)
+            return
+        
+        expires_at = computed_at + ttl
+        stale = time.time() >= expires_at or (fresh_after is not None and computed_at < fresh_after)
+        with self._lock:
+            self._entries[key] = _Entry(value, computed_at, duration, expires_at, stale_until)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._inflight.pop(key, None)
+            # A stale result found in the shared cache is returned now and refreshed behind it
+            if stale and not refresh:
+                self.stale_hits += 1
+                self._start(key, compute, ttl, stale_ttl, refresh=True)
+        future.set_result(CachedResult(value, computed_at, stale))
@@ -0,0 +1,147 @@
+"""
+Result Export - Columnar exports of scored results and price panels
+Builds Arrow tables from screen/daily-pick results and price history, served as Arrow IPC streams or Parquet files
+"""
+
+import io
+import os
+from datetime import datetime
+from typing import List, Dict, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from config import CACHE_DIR
+from market_data import PRICE_FIELDS
+
+
+FORMATS = {
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# Flat scalar fields of a screen / daily-pick row, in export column order
+RESULT_COLUMNS = [
+    ('ticker', pa.string()),
+    ('company_name', pa.string()),
+    ('sector', pa.string()),
+    ('current_price', pa.float64()),
+    ('fundamental_score', pa.float64()),
+    ('technical_score', pa.float64()),
+    ('risk_score', pa.float64()),
+    ('total_score', pa.float64()),
+    ('recommendation', pa.string()),
+]
+DICTIONARY_COLUMNS = {'recommendation', 'sector'}  # Low-cardinality strings stored as dictionary indices
+LIST_COLUMNS = ['why_choose', 'why_avoid', 'warnings']
+
+
+def results_table(results: List[Dict], kind: str = 'screen') -> pa.Table:
+    """
+    Arrow table with one row per scored ticker
+    
+    Scalar fields become typed columns (rank included), reasoning lists become list<string>
+    columns and every key metric becomes its own 'metric_<name>' string column.
+    
+    Args:
+        results: Rows as returned by screen_stocks() or analyze_and_rank()
+        kind: Result set name stored in the schema metadata
+    """
+    columns = {'rank': pa.array(range(1, len(results) + 1), type=pa.int32())}
+    for name, dtype in RESULT_COLUMNS:
+        column = pa.array([r.get(name) for r in results], type=dtype)
+        columns[name] = column.dictionary_encode() if name in DICTIONARY_COLUMNS else column
+    
+    for name in LIST_COLUMNS:
+        if any(name in r for r in results):
+            columns[name] = pa.array([r.get(name) or [] for r in results], type=pa.list_(pa.string()))
+    
+    metric_names = sorted({m for r in results for m in (r.get('key_metrics') or {})})
+    for metric in metric_names:
+        columns[f"metric_{metric}"] = pa.array(
+            [(r.get('key_metrics') or {}).get(metric) for r in results], type=pa.string()
+        )
+    
+    return _with_metadata(pa.table(columns), kind)
+
+
+def price_panel_table(panel: Dict[str, pd.DataFrame], kind: str = 'prices') -> pa.Table:
+    """
+    Long-format Arrow table (date, ticker, OHLCV) from a get_panel() result
+    
+    Long format keeps the schema fixed no matter how many tickers are exported;
+    tickers are dictionary-encoded so repeated symbols cost one integer per row.
+    """
+    fields = [f for f in PRICE_FIELDS if f in panel]
+    if not fields:
+        raise ValueError("Price panel has no OHLCV fields")
+    
+    stacked = pd.concat({f: panel[f].stack() for f in fields}, axis=1).dropna(how='all')
+    stacked.index.names = ['date', 'ticker']
+    frame = stacked.reset_index()
+    frame['date'] = pd.to_datetime(frame['date']).dt.tz_localize(None).astype('datetime64[ms]')
+    frame.columns = [c.lower() for c in frame.columns]
+    
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    ticker_index = table.schema.get_field_index('ticker')
+    table = table.set_column(ticker_index, 'ticker', table.column('ticker').dictionary_encode())
+    return _with_metadata(table, kind)
+
+
+def to_bytes(table: pa.Table, fmt: str) -> bytes:
+    """Serialize a table as an Arrow IPC stream or a Parquet file"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}'. Choose from: {', '.join(FORMATS)}")
+    
+    sink = io.BytesIO()
+    if fmt == 'arrow':
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        pq.write_table(table, sink, compression='zstd')
+    return sink.getvalue()
+
+
+class ResultExporter:
+    """Writes dated Parquet snapshots of results and price panels under the cache directory"""
+    
+    def __init__(self, export_dir: str = None):
+        self.export_dir = export_dir or os.path.join(CACHE_DIR, 'exports')
+    
+    def write(self, table: pa.Table, name: str, date: Optional[str] = None) -> str:
+        """
+        Write a table to <export_dir>/<name>/<date>.parquet, replacing any earlier file for that date
+        
+        Returns:
+            Path of the written file
+        """
+        date = date or datetime.now().strftime('%Y-%m-%d')
+        directory = os.path.join(self.export_dir, name)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{date}.parquet")
+        
+        # Write then rename so readers never see a half-written file
+        tmp_path = f"{path}.tmp"
+        pq.write_table(table, tmp_path, compression='zstd')
+        os.replace(tmp_path, path)
+        return path
+    
+    def list_files(self, name: str) -> List[str]:
+        """Dates with an export for a result set, newest first"""
+        directory = os.path.join(self.export_dir, name)
+        if not name.replace('_', '').isalnum() or not os.path.isdir(directory):
+            return []
+        return sorted((f[:-len('.parquet')] for f in os.listdir(directory) if f.endswith('.parquet')), reverse=True)
+    
+    def path(self, name: str, date: str) -> str:
+        return os.path.join(self.export_dir, name, f"{date}.parquet")
+
+
+def _with_metadata(table: pa.Table, kind: str) -> pa.Table:
+    metadata = dict(table.schema.metadata or {})
+    metadata.update({
+        b'kind': kind.encode(),
+        b'generated_at': datetime.now().isoformat().encode(),
+    })
+    return table.replace_schema_metadata(metadata)
@@ -0,0 +1,169 @@
+"""
+Risk Engine - Universe-wide risk metrics in one vectorized pass
+Realized volatility, max drawdown, downside deviation, historical VaR/CVaR and regression beta
+"""
+
+import threading
+import time
+import warnings
+import numpy as np
+import pandas as pd
+from typing import List, Dict, Optional
+
+from config import BENCHMARK_TICKER, NEGATIVE_CACHE_MISS_SECONDS
+from market_data import PriceHistoryCache
+
+
+RISK_COLUMNS = ['volatility', 'max_drawdown', 'downside_deviation', 'var_95', 'cvar_95', 'beta', 'observations']
+
+
+class RiskEngine:
+    """Computes and caches one-year risk metrics for every ticker in the returns panel"""
+    
+    def __init__(self, price_cache: PriceHistoryCache = None, benchmark: str = BENCHMARK_TICKER):
+        self.price_cache = price_cache or PriceHistoryCache()
+        self.benchmark = benchmark
+        self.window = 252  # One year of trading days
+        self.min_observations = 29  # Matches the 30-bar minimum used by the per-ticker scorers
+        self.max_age_seconds = 3600
+        self.retry_seconds = NEGATIVE_CACHE_MISS_SECONDS  # Before re-requesting a ticker that came back without data
+        self._metrics = pd.DataFrame(columns=RISK_COLUMNS)
+        self._computed_at: Dict[str, float] = {}
+        self._attempted_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+    
+    def compute(self, close: pd.DataFrame, benchmark: Optional[pd.Series] = None) -> pd.DataFrame:
+        """
+        Risk metrics for every column of a close panel
+        
+        Args:
+            close: Close prices (dates x tickers)
+            benchmark: Benchmark close prices; beta is NaN when not given
+        
+        Returns:
+            DataFrame indexed by ticker with RISK_COLUMNS, as fractions. Volatility and downside
+            deviation are annualized, max drawdown is negative, VaR/CVaR are 95% one-day losses.
+        """
+        close = _naive_dates(close)
+        returns = close.pct_change(fill_method=None).iloc[-self.window:]
+        prices = close.iloc[-self.window:].values
+        r = returns.values
+        observations = (~np.isnan(r)).sum(axis=0)
+        
+        with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+            warnings.simplefilter('ignore', RuntimeWarning)
+            
+            volatility = np.nanstd(r, axis=0, ddof=1) * np.sqrt(252)
+            downside = np.sqrt(np.nanmean(np.minimum(r, 0) ** 2, axis=0)) * np.sqrt(252)
+            
+            # Historical VaR / CVaR at 95%
+            cutoff = np.nanquantile(r, 0.05, axis=0)
+            var_95 = -cutoff
+            cvar_95 = -np.nanmean(np.where(r <= cutoff, r, np.nan), axis=0)
+            
+            # Max drawdown from the running peak
+            running_max = np.fmax.accumulate(prices, axis=0)
+            max_drawdown = np.nanmin(prices / running_max - 1, axis=0)
+            
+            # Beta regressed against the benchmark over the dates both have returns
+            beta = np.full(r.shape[1], np.nan)
+            if benchmark is not None and not benchmark.empty:
+                bench = _naive_dates(benchmark).reindex(close.index).pct_change(fill_method=None)
+                b = bench.iloc[-self.window:].values[:, None]
+                b = np.where(np.isnan(r), np.nan, b)
+                s = np.where(np.isnan(b), np.nan, r)
+                mean_b = np.nanmean(b, axis=0)
+                covariance = np.nanmean(s * b, axis=0) - np.nanmean(s, axis=0) * mean_b
+                variance = np.nanmean(b ** 2, axis=0) - mean_b ** 2
+                beta = np.where(variance > 0, covariance / variance, np.nan)
+        
+        metrics = pd.DataFrame({
+            'volatility': volatility,
+            'max_drawdown': max_drawdown,
+            'downside_deviation': downside,
+            'var_95': var_95,
+            'cvar_95': cvar_95,
+            'beta': beta,
+            'observations': observations,
+        }, index=close.columns)
+        insufficient = metrics['observations'] < self.min_observations
+        metrics.loc[insufficient, RISK_COLUMNS[:-1]] = np.nan
+        return metrics
+    
+    def refresh(self, tickers: List[str]) -> pd.DataFrame:
+        """
+        Recompute metrics for tickers whose cached metrics are missing or stale
+        
+        Tickers that came back without price history are not requested again for
+        retry_seconds, so callers asking for them repeatedly don't refetch them every time.
+        
+        Returns:
+            Metrics for the requested tickers that have price history
+        """
+        tickers = list(dict.fromkeys(t.upper().strip() for t in tickers))
+        now = time.time()
+        stale = [t for t in tickers if self._is_stale(t, now)]
+        
+        if stale:
+            with self._lock:
+                self._attempted_at.update((t, now) for t in stale)
+            close = self.price_cache.get_panel(stale + [self.benchmark], period='2y', fields=['Close'])['Close']
+            benchmark = close[self.benchmark] if self.benchmark in close.columns else None
+            close = close[[t for t in stale if t in close.columns]]
+            if not close.empty:
+                self._store(self.compute(close.ffill(limit=5), benchmark))
+        
+        with self._lock:
+            return self._metrics.loc[[t for t in tickers if t in self._metrics.index]]
+    
+    def get_metrics(self, ticker: str, close: Optional[pd.Series] = None) -> Optional[Dict]:
+        """
+        Risk metrics for a single ticker, from the cached universe output when fresh
+        
+        Args:
+            ticker: Stock ticker symbol
+            close: Close history already fetched by the caller, used instead of the price cache
+                when the ticker has no fresh metrics
+        
+        Returns:
+            Dict of RISK_COLUMNS values (NaN replaced with None), or None without price history
+        """
+        ticker = ticker.upper().strip()
+        now = time.time()
+        if now - self._computed_at.get(ticker, 0) > self.max_age_seconds:
+            if close is not None and not close.empty:
+                self._store(self.compute(close.to_frame(ticker), self._benchmark_close()))
+            elif self._is_stale(ticker, now):
+                self.refresh([ticker])
+        
+        with self._lock:
+            if ticker not in self._metrics.index:
+                return None
+            row = self._metrics.loc[ticker]
+        return {k: (None if pd.isna(v) else float(v)) for k, v in row.items()}
+    
+    def _is_stale(self, ticker: str, now: float) -> bool:
+        """Metrics missing or past max_age, and no attempt to load the ticker within retry_seconds"""
+        return (now - self._computed_at.get(ticker, 0) > self.max_age_seconds and
+                now - self._attempted_at.get(ticker, 0) > self.retry_seconds)
+    
+    def _benchmark_close(self) -> Optional[pd.Series]:
+        hist = self.price_cache.get_history(self.benchmark, period='2y')
+        return hist['Close'] if not hist.empty else None
+    
+    def _store(self, metrics: pd.DataFrame):
+        now = time.time()
+        with self._lock:
+            kept = self._metrics.drop(metrics.index, errors='ignore')
+            self._metrics = pd.concat([kept, metrics]) if not kept.empty else metrics
+            for ticker in metrics.index:
+                self._computed_at[ticker] = now
+
+
+def _naive_dates(data):
+    """Drop timezone and intraday time so yfinance and cached series align on dates"""
+    data = data.copy()
+    if getattr(data.index, 'tz', None) is not None:
+        data.index = data.index.tz_localize(None)
+    data.index = pd.DatetimeIndex(data.index).normalize()
+    return data
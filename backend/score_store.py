@@ -0,0 +1,394 @@
+"""
+Score Store - Persisted screen results for instant re-ranking and querying
+Keeps the latest scored row per ticker in indexed SQLite, re-ranks the component scores in memory with any weighting,
+and serves filtered, sorted, cursor-paginated queries
+"""
+
+import base64
+import json
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+from typing import List, Dict, Optional, Sequence, Tuple
+
+from config import CACHE_DIR
+from stock_screener import SCORING_PROFILES, scaled_cutoffs
+
+
+# Query sort keys (as named in result rows) and the columns they sort on; each column has a
+# (column, ticker) index so sorted pages are index scans
+SORT_COLUMNS = {
+    'total_score': 'total_score',
+    'fundamental_score': 'fundamental',
+    'technical_score': 'technical',
+    'risk_score': 'risk',
+    'current_price': 'current_price',
+    'ticker': 'ticker',
+    'company_name': 'company_name',
+    'sector': 'sector',
+    'screened_at': 'scored_at',
+}
+SORT_KEYS = list(SORT_COLUMNS)
+
+# Sort keys that accept min/max range filters
+RANGE_COLUMNS = ['total_score', 'fundamental_score', 'technical_score', 'risk_score', 'current_price']
+
+MAX_PAGE_SIZE = 500
+
+# Columns added after the first release of the table, with their types
+ADDED_COLUMNS = {
+    'sector': 'TEXT COLLATE NOCASE',
+    'total_score': 'REAL',
+    'recommendation': 'TEXT',
+    'warnings': 'TEXT',
+}
+
+INDEXES = [
+    # Equality filters that narrow the scan before sorting
+    "CREATE INDEX IF NOT EXISTS idx_component_scores_sector ON component_scores (sector, total_score)",
+    "CREATE INDEX IF NOT EXISTS idx_component_scores_recommendation ON component_scores (recommendation, total_score)",
+    # Rows recorded since a point in time (other workers' screens)
+    "CREATE INDEX IF NOT EXISTS idx_component_scores_scored_at ON component_scores (scored_at)",
+] + [
+    f"CREATE INDEX IF NOT EXISTS idx_component_scores_{column} ON component_scores ({column}, ticker)"
+    for column in SORT_COLUMNS.values() if column != 'ticker'
+]
+
+RESULT_COLUMNS = (
+    "ticker, company_name, sector, current_price, fundamental AS fundamental_score, "
+    "technical AS technical_score, risk AS risk_score, total_score, recommendation, warnings, "
+    "source, scored_at AS screened_at"
+)
+
+
+def encode_cursor(sort: str, order: str, row: Dict) -> str:
+    """Opaque cursor pointing just past row in the given ordering"""
+    payload = json.dumps([sort, order, row[sort], row['ticker']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, sort: str, order: str) -> Tuple:
+    """(sort value, ticker) of the last row of the previous page"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_sort, cursor_order, value, ticker = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if (cursor_sort, cursor_order) != (sort, order):
+        raise ValueError("Cursor was issued for a different sort; restart without a cursor")
+    return value, ticker
+
+
+def _after(column: str, value, ticker: str, descending: bool) -> Tuple[str, List]:
+    """
+    Keyset condition for rows after (value, ticker)
+    
+    Ties on the sort column are broken by ticker in the same direction. NULLs come first
+    ascending and last descending, as SQLite orders them.
+    """
+    if column == 'ticker':
+        return ("ticker < ?" if descending else "ticker > ?"), [ticker]
+    op = '<' if descending else '>'
+    if value is None:
+        if descending:
+            return f"({column} IS NULL AND ticker < ?)", [ticker]
+        return f"(({column} IS NULL AND ticker > ?) OR {column} IS NOT NULL)", [ticker]
+    condition = f"({column} {op} ? OR ({column} = ? AND ticker {op} ?)"
+    condition += f" OR {column} IS NULL)" if descending else ")"
+    return condition, [value, value, ticker]
+
+
+class ScoreStore:
+    """Latest screen row per ticker, with vectorized re-ranking and indexed queries"""
+    
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or os.path.join(CACHE_DIR, 'scores.sqlite')
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._arrays: Optional[Dict[str, np.ndarray]] = None
+        self._data_version = None
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS component_scores (
+                    ticker TEXT PRIMARY KEY,
+                    company_name TEXT,
+                    current_price REAL,
+                    fundamental REAL NOT NULL,
+                    technical REAL NOT NULL,
+                    risk REAL NOT NULL,
+                    source TEXT NOT NULL,
+                    scored_at REAL NOT NULL
+                )
+            """)
+            existing = {row[1] for row in self._conn.execute("PRAGMA table_info(component_scores)")}
+            for column, kind in ADDED_COLUMNS.items():
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE component_scores ADD COLUMN {column} {kind}")
+            for statement in INDEXES:
+                self._conn.execute(statement)
+            self._conn.commit()
+    
+    def record(self, results: List[Dict], source: str):
+        """
+        Store the rows of a screen or daily-picks run, replacing older rows per ticker
+        
+        Args:
+            results: Scored rows as returned by the screener (ticker, scores, recommendation, ...)
+            source: Run type, e.g. 'screen' or 'daily_picks'
+        """
+        now = time.time()
+        rows = [
+            (r['ticker'], r.get('company_name'), r.get('sector'), r.get('current_price'),
+             r['fundamental_score'], r['technical_score'], r['risk_score'], r.get('total_score'),
+             r.get('recommendation'), json.dumps(r.get('warnings') or []), source, now)
+            for r in results
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO component_scores (ticker, company_name, sector, current_price, "
+                "fundamental, technical, risk, total_score, recommendation, warnings, source, scored_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+            self._arrays = None
+    
+    def rerank(self, weights: Optional[Sequence[float]] = None, profile: Optional[str] = None,
+               buy_cutoff: Optional[float] = None, hold_cutoff: Optional[float] = None,
+               tickers: Optional[List[str]] = None, source: Optional[str] = None,
+               max_age_days: Optional[float] = None, top_n: Optional[int] = 50) -> Dict:
+        """
+        Re-rank cached component scores with a new weighting
+        
+        Args:
+            weights: (fundamental, technical, risk) weights; normalized to sum to 1
+            profile: Named weighting from SCORING_PROFILES, used when weights aren't given
+            buy_cutoff: Total score for a Buy (default: the default cutoff scaled to the weighting)
+            hold_cutoff: Total score for a Hold (default: scaled like buy_cutoff)
+            tickers: Only rank these tickers
+            source: Only rank scores from this run type
+            max_age_days: Ignore scores older than this
+            top_n: Number of rows to return (None for all)
+        
+        Returns:
+            Weighting used, recommendation counts and the ranked rows
+        """
+        if weights is None:
+            profile = profile or 'balanced'
+            if profile not in SCORING_PROFILES:
+                raise ValueError(f"Unknown profile '{profile}'. Choose from: {', '.join(SCORING_PROFILES)}")
+            weights = SCORING_PROFILES[profile]
+        weights = np.asarray(weights, dtype=float)
+        if weights.shape != (3,) or np.any(weights < 0) or weights.sum() <= 0:
+            raise ValueError("weights must be three non-negative numbers (fundamental, technical, risk), not all zero")
+        weights = weights / weights.sum()
+        
+        default_buy, default_hold = scaled_cutoffs(weights)
+        buy_cutoff = default_buy if buy_cutoff is None else buy_cutoff
+        hold_cutoff = default_hold if hold_cutoff is None else hold_cutoff
+        if hold_cutoff > buy_cutoff:
+            raise ValueError("hold_cutoff must not exceed buy_cutoff")
+        
+        data = self._load()
+        mask = np.ones(len(data['ticker']), dtype=bool)
+        if tickers:
+            mask &= np.isin(data['ticker'], [t.upper().strip() for t in tickers])
+        if source:
+            mask &= data['source'] == source
+        if max_age_days is not None:
+            mask &= data['scored_at'] >= time.time() - max_age_days * 86400
+        idx = np.flatnonzero(mask)
+        
+        total = data['components'][idx] @ weights
+        # Stable sort on the negated total keeps ticker order for ties
+        order = idx[np.argsort(-total, kind='stable')]
+        total = data['components'][order] @ weights
+        labels = np.where(total >= buy_cutoff, 'Buy', np.where(total >= hold_cutoff, 'Hold', 'Avoid'))
+        
+        shown = len(order) if top_n is None else min(top_n, len(order))
+        results = []
+        for rank in range(shown):
+            i = order[rank]
+            fundamental, technical, risk = data['components'][i]
+            results.append({
+                'rank': rank + 1,
+                'ticker': data['ticker'][i],
+                'company_name': data['company_name'][i],
+                'current_price': data['current_price'][i],
+                'fundamental_score': round(float(fundamental), 2),
+                'technical_score': round(float(technical), 2),
+                'risk_score': round(float(risk), 2),
+                'total_score': round(float(total[rank]), 2),
+                'recommendation': str(labels[rank]),
+                'source': data['source'][i],
+                'scored_at': float(data['scored_at'][i]),
+            })
+        
+        return {
+            'profile': profile,
+            'weights': {
+                'fundamental': round(float(weights[0]), 4),
+                'technical': round(float(weights[1]), 4),
+                'risk': round(float(weights[2]), 4),
+            },
+            'buy_cutoff': round(float(buy_cutoff), 2),
+            'hold_cutoff': round(float(hold_cutoff), 2),
+            'total_ranked': int(len(order)),
+            'recommendation_counts': {
+                label: int((labels == label).sum()) for label in ('Buy', 'Hold', 'Avoid')
+            },
+            'results': results,
+        }
+    
+    def query(self, sectors: Optional[List[str]] = None, recommendations: Optional[List[str]] = None,
+              ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+              tickers: Optional[List[str]] = None, source: Optional[str] = None,
+              max_age_days: Optional[float] = None, sort: str = 'total_score', order: str = 'desc',
+              limit: int = 50, cursor: Optional[str] = None) -> Dict:
+        """
+        Filtered, sorted page of stored rows, as scored by the run that stored them
+        
+        Args:
+            sectors: Only these sectors (case-insensitive)
+            recommendations: Only these recommendations (Buy, Hold, Avoid)
+            ranges: Inclusive (min, max) bounds per RANGE_COLUMNS key; either bound may be None
+            tickers: Only these tickers
+            source: Only rows from this run type
+            max_age_days: Ignore rows screened longer ago than this
+            sort: Key from SORT_KEYS; ties are broken by ticker
+            order: 'asc' or 'desc'
+            limit: Page size (up to MAX_PAGE_SIZE)
+            cursor: next_cursor of the previous page
+        
+        Returns:
+            Matching row count, the page of rows and the cursor for the next page (None on the last)
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Unknown sort key '{sort}'. Choose from: {', '.join(SORT_KEYS)}")
+        if order not in ('asc', 'desc'):
+            raise ValueError("order must be 'asc' or 'desc'")
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+        
+        where, params = [], []
+        if sectors:
+            where.append(f"sector IN ({', '.join('?' * len(sectors))})")
+            params.extend(sectors)
+        if recommendations:
+            names = [r.strip().capitalize() for r in recommendations]
+            where.append(f"recommendation IN ({', '.join('?' * len(names))})")
+            params.extend(names)
+        for key, (low, high) in (ranges or {}).items():
+            if key not in RANGE_COLUMNS:
+                raise ValueError(f"Unknown range column '{key}'. Choose from: {', '.join(RANGE_COLUMNS)}")
+            column = SORT_COLUMNS[key]
+            if low is not None:
+                where.append(f"{column} >= ?")
+                params.append(low)
+            if high is not None:
+                where.append(f"{column} <= ?")
+                params.append(high)
+        if tickers:
+            where.append(f"ticker IN ({', '.join('?' * len(tickers))})")
+            params.extend(t.upper().strip() for t in tickers)
+        if source:
+            where.append("source = ?")
+            params.append(source)
+        if max_age_days is not None:
+            where.append("scored_at >= ?")
+            params.append(time.time() - max_age_days * 86400)
+        
+        column = SORT_COLUMNS[sort]
+        descending = order == 'desc'
+        page_where, page_params = list(where), list(params)
+        if cursor:
+            value, ticker = decode_cursor(cursor, sort, order)
+            condition, condition_params = _after(column, value, ticker, descending)
+            page_where.append(condition)
+            page_params.extend(condition_params)
+        
+        direction = 'DESC' if descending else 'ASC'
+        order_by = f"ticker {direction}" if column == 'ticker' else f"{column} {direction}, ticker {direction}"
+        filters = f"WHERE {' AND '.join(where)}" if where else ""
+        page_filters = f"WHERE {' AND '.join(page_where)}" if page_where else ""
+        with self._lock:
+            matched = self._conn.execute(f"SELECT COUNT(*) FROM component_scores {filters}", params).fetchone()[0]
+            statement = self._conn.execute(
+                f"SELECT {RESULT_COLUMNS} FROM component_scores {page_filters} ORDER BY {order_by} LIMIT ?",
+                page_params + [limit + 1]
+            )
+            names = [d[0] for d in statement.description]
+            rows = statement.fetchall()
+        
+        results = []
+        for row in rows[:limit]:
+            result = dict(zip(names, row))
+            result['warnings'] = json.loads(result['warnings']) if result['warnings'] else []
+            results.append(result)
+        return {
+            'total_matched': matched,
+            'sort': sort,
+            'order': order,
+            'results': results,
+            'next_cursor': encode_cursor(sort, order, results[-1]) if len(rows) > limit else None,
+        }
+    
+    def scored_since(self, since: float, overlap: float = 60.0) -> Tuple[List[str], float]:
+        """
+        Tickers recorded (by any worker) after since
+        
+        Rows are stamped before they commit, so the returned watermark trails the newest row
+        by overlap seconds; a row committed late is then still picked up by the next call.
+        
+        Returns:
+            (tickers, since for the next call)
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT ticker, scored_at FROM component_scores WHERE scored_at > ?", (since,)
+            ).fetchall()
+        if not rows:
+            return [], since
+        return [ticker for ticker, _ in rows], max(since, max(at for _, at in rows) - overlap)
+    
+    def stats(self) -> Dict:
+        """Stored tickers per source and recommendation, and the available weighting profiles"""
+        data = self._load()
+        with self._lock:
+            labels = self._conn.execute(
+                "SELECT recommendation, COUNT(*) FROM component_scores "
+                "WHERE recommendation IS NOT NULL GROUP BY recommendation"
+            ).fetchall()
+        return {
+            'tickers': int(len(data['ticker'])),
+            'sources': {s: int((data['source'] == s).sum()) for s in np.unique(data['source'])},
+            'recommendations': {name: count for name, count in labels},
+            'profiles': {name: list(w) for name, w in SCORING_PROFILES.items()},
+        }
+    
+    def _load(self) -> Dict[str, np.ndarray]:
+        """Column arrays of the whole table, reloaded only when it has changed"""
+        with self._lock:
+            # data_version changes when another connection (e.g. another worker) commits
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if self._arrays is None or version != self._data_version:
+                rows = self._conn.execute(
+                    "SELECT ticker, company_name, current_price, fundamental, technical, risk, source, scored_at "
+                    "FROM component_scores ORDER BY ticker"
+                ).fetchall()
+                columns = list(zip(*rows)) if rows else [()] * 8
+                self._arrays = {
+                    'ticker': np.array(columns[0], dtype=object),
+                    'company_name': np.array(columns[1], dtype=object),
+                    'current_price': np.array(columns[2], dtype=object),
+                    'components': np.array(list(zip(columns[3], columns[4], columns[5])), dtype=float).reshape(-1, 3),
+                    'source': np.array(columns[6], dtype=object),
+                    'scored_at': np.array(columns[7], dtype=float),
+                }
+                self._data_version = version
+            return self._arrays
@@ -0,0 +1,330 @@
+"""
+Shared Cache - Host-wide result cache shared by all API worker processes
+SQLite (WAL) key-value store with lease rows as cross-process fill locks, so each value is fetched or computed once per host
+"""
+
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from config import SHARED_CACHE_PATH, SHARED_CACHE_LEASE_SECONDS
+
+
+# Lease token handed out when the database can't be reached; the caller computes without coordination
+UNSHARED_LEASE = 'unshared'
+
+
+class SharedEntry:
+    __slots__ = ('value', 'created_at', 'expires_at', 'duration')
+    
+    def __init__(self, value: Any, created_at: float, expires_at: float, duration: float):
+        self.value = value
+        self.created_at = created_at
+        self.expires_at = expires_at
+        self.duration = duration
+
+
+class SharedCache:
+    """
+    Cross-process cache with single-flight fills
+    
+    Values are pickled into one SQLite database in WAL mode, so readers in any worker never
+    block the writer. A lease row per key acts as a lock: the worker that inserts it computes
+    the value while the others poll for the result. A background thread renews every lease
+    this process holds, so waiters keep waiting however long the computation takes, while
+    a crashed worker's leases expire and only delay others by lease_seconds.
+    
+    The cache is an optimization: when the database fails (locked past its timeout, disk
+    full, corrupt file) reads miss and acquire grants UNSHARED_LEASE, so every worker
+    falls back to computing locally instead of failing the request.
+    """
+    
+    def __init__(self, path: str = SHARED_CACHE_PATH, lease_seconds: float = SHARED_CACHE_LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._held: Dict[str, str] = {}  # Leases this process holds: key -> token
+        self._held_lock = threading.Lock()
+        self._renewer: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+        self.fills = 0
+        self.waits = 0
+        self.lease_renewals = 0
+        self.errors = 0
+    
+    def get(self, key: str) -> Optional[SharedEntry]:
+        """Unexpired entry for key, or None (also when the database can't be read)"""
+        try:
+            row = self._conn().execute(
+                "SELECT value, created_at, expires_at, duration FROM entries WHERE key = ? AND expires_at > ?",
+                (key, time.time())
+            ).fetchone()
+        except sqlite3.Error:
+            self.errors += 1
+            return None
+        if row is None:
+            return None
+        try:
+            return SharedEntry(pickle.loads(row[0]), row[1], row[2], row[3])
+        except Exception:
+            return None  # Written by an incompatible version of the code
+    
+    def set(self, key: str, entry: SharedEntry):
+        try:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                (key, pickle.dumps(entry.value, protocol=pickle.HIGHEST_PROTOCOL),
+                 entry.created_at, entry.expires_at, entry.duration)
+            )
+        except Exception:
+            self.errors += 1
+            return  # Caching is best-effort
+        # Expired rows are cleared out now and then instead of on every write
+        if random.random() < 0.01:
+            self.purge_expired()
+    
+    def fill(self, key: str, compute: Callable[[], Any], ttl: float, refresh: bool = False,
+             cache_if: Optional[Callable[[Any], bool]] = None) -> SharedEntry:
+        """
+        Return the cached entry for key, computing it in at most one worker at a time
+        
+        Args:
+            key: Cache key
+            compute: Blocking function producing the value
+            ttl: Seconds the value stays valid
+            refresh: Recompute even if a valid entry exists (a worker that finds another
+                one already refreshing keeps the current entry)
+            cache_if: Predicate deciding whether a computed value is stored
+        
+        Returns:
+            The shared entry (or a local one if the computed value isn't cached)
+        """
+        delay = 0.02
+        waited = False
+        while True:
+            if not refresh:
+                entry = self.get(key)
+                if entry is not None:
+                    self.hits += 1
+                    return entry
+            
+            token = self.acquire(key)
+            if token is not None:
+                try:
+                    # Another worker may have filled it between our read and the lease
+                    entry = None if refresh else self.get(key)
+                    if entry is not None:
+                        self.hits += 1
+                        return entry
+                    self.misses += 1
+                    return self._compute(key, compute, ttl, cache_if)
+                finally:
+                    self.release(key, token)
+            
+            if refresh:
+                entry = self.get(key)
+                if entry is not None:
+                    return entry
+                refresh = False
+            
+            # The lease holder renews it while computing; if it dies the lease expires and is taken over
+            if not waited:
+                self.waits += 1
+                waited = True
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+    
+    def get_or_compute(self, key: str, compute: Callable[[], Any], ttl: float,
+                       cache_if: Optional[Callable[[Any], bool]] = None) -> Any:
+        """Value for key, computed once across workers"""
+        return self.fill(key, compute, ttl, cache_if=cache_if).value
+    
+    def acquire(self, key: str, seconds: Optional[float] = None) -> Optional[str]:
+        """
+        Take the lease on key if it is free or expired; returns a token for release()
+        
+        None means another worker holds the lease. If the database fails, UNSHARED_LEASE is
+        returned, so the caller goes ahead as if it held the lease.
+        """
+        token = uuid.uuid4().hex
+        now = time.time()
+        try:
+            cursor = self._conn().execute(
+                """
+                INSERT INTO leases VALUES (?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+                WHERE leases.expires_at <= ?
+                """,
+                (key, token, now + (seconds or self.lease_seconds), now)
+            )
+        except sqlite3.Error:
+            self.errors += 1
+            return UNSHARED_LEASE
+        if cursor.rowcount != 1:
+            return None
+        with self._held_lock:
+            self._held[key] = token
+            if self._renewer is None:
+                self._renewer = threading.Thread(target=self._renew_held, name='lease-renewer', daemon=True)
+                self._renewer.start()
+        return token
+    
+    def release(self, key: str, token: str):
+        if token == UNSHARED_LEASE:
+            return
+        with self._held_lock:
+            if self._held.get(key) == token:
+                del self._held[key]
+        try:
+            self._conn().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, token))
+        except sqlite3.Error:
+            self.errors += 1  # The lease expires on its own now that it is no longer renewed
+    
+    def wait_for_leases(self, keys: Iterable[str], timeout: Optional[float] = None) -> bool:
+        """
+        Block until no live lease is held on any of keys; False on timeout
+        
+        Without a timeout this waits for as long as the holders keep their leases renewed.
+        If the database fails it stops waiting, and the caller goes on as if the leases were
+        released.
+        """
+        keys = list(keys)
+        deadline = time.time() + timeout if timeout is not None else None
+        delay = 0.02
+        while keys:
+            placeholders = ', '.join('?' * len(keys))
+            try:
+                held = self._conn().execute(
+                    f"SELECT key FROM leases WHERE key IN ({placeholders}) AND expires_at > ?",
+                    (*keys, time.time())
+                ).fetchall()
+            except sqlite3.Error:
+                self.errors += 1
+                break
+            keys = [row[0] for row in held]
+            if not keys:
+                break
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+        return True
+    
+    def delete(self, key: str):
+        try:
+            self._conn().execute("DELETE FROM entries WHERE key = ?", (key,))
+        except sqlite3.Error:
+            self.errors += 1
+    
+    def purge_expired(self):
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+            conn.execute("DELETE FROM leases WHERE expires_at <= ?", (now,))
+        except sqlite3.Error:
+            self.errors += 1
+    
+    def stats(self) -> Dict:
+        """Host-wide entry counts plus this worker's hit, fill and wait counters"""
+        now = time.time()
+        try:
+            conn = self._conn()
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM entries WHERE expires_at > ?", (now,)
+            ).fetchone()
+            leases = conn.execute("SELECT COUNT(*) FROM leases WHERE expires_at > ?", (now,)).fetchone()[0]
+        except sqlite3.Error:
+            entries = size = leases = None  # Database unavailable; the counters below still apply
+        return {
+            'path': self.path,
+            'entries': entries,
+            'bytes': size,
+            'active_leases': leases,
+            'worker_pid': os.getpid(),
+            'hits': self.hits,
+            'misses': self.misses,
+            'fills': self.fills,
+            'waits': self.waits,
+            'lease_renewals': self.lease_renewals,
+            'errors': self.errors,
+        }
+    
+    def _renew_held(self):
+        """Extend every lease this process holds, three times per lease period"""
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            with self._held_lock:
+                held = list(self._held.items())
+            if not held:
+                continue
+            try:
+                cursor = self._conn().executemany(
+                    "UPDATE leases SET expires_at = ? WHERE key = ? AND owner = ?",
+                    [(time.time() + self.lease_seconds, key, token) for key, token in held]
+                )
+                self.lease_renewals += cursor.rowcount
+            except sqlite3.Error:
+                pass  # Retried on the next beat, well before the leases run out
+    
+    def _compute(self, key: str, compute: Callable[[], Any], ttl: float,
+                 cache_if: Optional[Callable[[Any], bool]]) -> SharedEntry:
+        started = time.time()
+        value = compute()
+        finished = time.time()
+        entry = SharedEntry(value, finished, finished + ttl, finished - started)
+        if cache_if is None or cache_if(value):
+            self.set(key, entry)
+            self.fills += 1
+        return entry
+    
+    def _conn(self) -> sqlite3.Connection:
+        """Per-thread autocommit connection (SQLite connections aren't shared between threads)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._ensure_schema(conn)
+            self._local.conn = conn
+        return conn
+    
+    def _ensure_schema(self, conn: sqlite3.Connection):
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    duration REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS leases (
+                    key TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            self._schema_ready = True
+
+
+def cache_key(*parts: Any) -> str:
+    """Stable string key from simple values (str, numbers, None, tuples of those)"""
+    return repr(parts)
+
+
+# Process-wide handle; every worker on the host opens the same database file
+shared_cache = SharedCache()
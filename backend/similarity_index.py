@@ -0,0 +1,328 @@
+"""
+Similarity Index - "Stocks like this one" by nearest-neighbour search over the universe
+Keeps a normalized feature matrix (fundamental and price metrics, recent returns, sector) in memory and ranks by batched cosine similarity
+"""
+
+import threading
+import warnings
+from typing import List, Dict, Optional, Iterable, Tuple
+
+import numpy as np
+
+from price_store import PriceSeries
+
+
+# Company metrics taken from yfinance-style info, and metrics derived from the daily closes
+INFO_FEATURES = [
+    'trailingPE', 'forwardPE', 'pegRatio', 'priceToBook', 'profitMargins', 'returnOnEquity',
+    'revenueGrowth', 'earningsQuarterlyGrowth', 'debtToEquity', 'currentRatio', 'beta', 'marketCap',
+]
+PRICE_FEATURES = ['volatility', 'max_drawdown', 'momentum_3m', 'momentum_12m', 'price_vs_ma200']
+FEATURES = INFO_FEATURES + PRICE_FEATURES
+LOG_FEATURES = {'marketCap'}  # Spread over orders of magnitude; compared on a log scale
+
+# Share of the similarity each block contributes: metrics, return correlation and same sector
+BLOCK_WEIGHTS = {'metrics': 0.6, 'returns': 0.3, 'sector': 0.1}
+
+RETURN_WINDOW = 126  # Trading days of returns whose correlation enters the similarity (six months)
+MIN_BARS = 60  # Shorter series (e.g. intraday or five-day loads) don't update the price features
+CLIP = 3.0  # Robust z-scores are clipped so one outlier metric can't dominate a comparison
+RESCALE_FRACTION = 0.1  # Share of rows updated in place before the metric scaling is recomputed
+
+
+def price_features(closes: np.ndarray) -> Dict[str, float]:
+    """One-year volatility and drawdown, 3/12-month momentum and distance from the 200-day average"""
+    closes = closes[~np.isnan(closes)]
+    features = dict.fromkeys(PRICE_FEATURES, np.nan)
+    if len(closes) < MIN_BARS:
+        return features
+    year = closes[-253:]
+    returns = np.diff(np.log(year))
+    features['volatility'] = float(np.std(returns, ddof=1) * np.sqrt(252))
+    features['max_drawdown'] = float(np.min(year / np.maximum.accumulate(year) - 1))
+    features['momentum_3m'] = float(closes[-1] / closes[-64] - 1) if len(closes) > 63 else np.nan
+    features['momentum_12m'] = float(closes[-1] / closes[-253] - 1) if len(closes) > 252 else np.nan
+    if len(closes) >= 200:
+        features['price_vs_ma200'] = float(closes[-1] / closes[-200:].mean() - 1)
+    return features
+
+
+def scale_stats(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Column medians and 1.4826 * MAD (missing medians at 0, unusable MADs at 1)"""
+    with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+        warnings.simplefilter('ignore', RuntimeWarning)  # All-NaN columns (a metric no ticker reports)
+        median = np.nanmedian(matrix, axis=0) if len(matrix) else np.zeros(matrix.shape[1])
+        mad = np.nanmedian(np.abs(matrix - median), axis=0) * 1.4826 if len(matrix) else np.ones(matrix.shape[1])
+    return np.nan_to_num(median), np.where(np.isfinite(mad) & (mad > 0), mad, 1.0)
+
+
+def apply_scale(matrix: np.ndarray, median: np.ndarray, mad: np.ndarray) -> np.ndarray:
+    """(x - median) / mad, clipped to +-CLIP, with missing values at 0"""
+    with np.errstate(invalid='ignore'):
+        scaled = np.clip((matrix - median) / mad, -CLIP, CLIP)
+    return np.nan_to_num(scaled, nan=0.0)
+
+
+def robust_scale(matrix: np.ndarray) -> np.ndarray:
+    """Column-wise (x - median) / (1.4826 * MAD), clipped to +-CLIP, with missing values at 0"""
+    return apply_scale(matrix, *scale_stats(matrix))
+
+
+def unit_rows(matrix: np.ndarray) -> np.ndarray:
+    """Rows scaled to unit length; all-zero rows (no data) stay zero"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+class SimilarityIndex:
+    """
+    Feature vectors for every known ticker, queried by cosine similarity
+    
+    Each vector joins three unit-length blocks scaled by BLOCK_WEIGHTS: robust-normalized
+    company and price metrics, z-scored daily returns over the last RETURN_WINDOW trading days
+    (whose dot product is the return correlation) and a sector one-hot. A ticker missing a
+    block (e.g. no company info yet) simply gets no credit for it; only tickers with company
+    info are returned as neighbours.
+    
+    Updates only replace the changed ticker's raw row and mark it dirty; the next query
+    rebuilds the vectors of dirty rows in place, scaled with the column statistics of the last
+    full build. The whole matrix is rebuilt (metric columns re-normalized in one vectorized
+    pass) only when a new trading day moves the return window, a new sector appears or more
+    than RESCALE_FRACTION of the rows were patched since. A k-nearest query is then one
+    matrix-vector product over the universe.
+    """
+    
+    def __init__(self, return_window: int = RETURN_WINDOW, block_weights: Optional[Dict[str, float]] = None):
+        self.return_window = return_window
+        self.block_weights = dict(block_weights or BLOCK_WEIGHTS)
+        self._lock = threading.Lock()
+        self._rows: Dict[str, int] = {}
+        self._tickers: List[str] = []
+        self._names: List[Optional[str]] = []
+        self._sectors: List[Optional[str]] = []
+        self._tails: List[Optional[tuple]] = []  # (days, closes) of the last return_window + 1 bars
+        self._metrics = np.full((0, len(FEATURES)), np.nan)
+        self._returns = np.zeros((0, return_window), dtype=np.float32)
+        self._has_info = np.zeros(0, dtype=bool)
+        self._stale_returns: set = set()
+        self._last_day: Optional[int] = None
+        self._grid: Optional[np.ndarray] = None
+        self._vectors: Optional[np.ndarray] = None  # One row per capacity slot; None when a full rebuild is due
+        self._sector_of: Optional[np.ndarray] = None
+        self._scale: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._vocabulary: Dict[str, int] = {}
+        self._dirty: set = set()
+        self._patched = 0  # Rows rebuilt in place since the last full rebuild
+        self.synced_at = 0.0  # Score-store time up to which other workers' scored tickers were indexed
+        self.counters = {'row_updates': 0, 'row_refreshes': 0, 'rebuilds': 0, 'queries': 0}
+    
+    def on_series(self, series: PriceSeries):
+        """Price cache listener: refresh a ticker's price features and recent returns"""
+        if len(series) < MIN_BARS:
+            return
+        closes = series.prices[3].astype(np.float64)
+        features = price_features(closes)
+        tail = self.return_window + 1
+        with self._lock:
+            i = self._row(series.ticker)
+            for name, value in features.items():
+                self._metrics[i, FEATURES.index(name)] = value
+            self._tails[i] = (series.days[-tail:].astype(np.int64), closes[-tail:])
+            self._stale_returns.add(i)
+            last_day = int(series.days[-1])
+            if self._last_day is None or last_day > self._last_day:
+                self._last_day = last_day
+                self._grid = None  # The return window moved; every return block is rebuilt
+            self._changed(i)
+    
+    def on_info(self, ticker: str, info: Dict):
+        """Refresh a ticker's company metrics, name and sector from its info"""
+        if not info:
+            return
+        values = []
+        for name in INFO_FEATURES:
+            value = info.get(name)
+            value = float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else np.nan
+            if name in LOG_FEATURES:
+                value = np.log(value) if value > 0 else np.nan
+            values.append(value)
+        columns = [FEATURES.index(name) for name in INFO_FEATURES]
+        name, sector = info.get('longName') or info.get('shortName'), info.get('sector')
+        with self._lock:
+            i = self._row(ticker.upper().strip())
+            if (self._has_info[i] and self._names[i] == name and self._sectors[i] == sector and
+                    np.array_equal(self._metrics[i, columns], values, equal_nan=True)):
+                return  # The same info again (e.g. re-read from the shared cache)
+            self._metrics[i, columns] = values
+            self._names[i] = name
+            self._sectors[i] = sector
+            self._has_info[i] = True
+            self._changed(i)
+    
+    def neighbors(self, tickers: Iterable[str], k: int = 10, same_sector: bool = False) -> Dict[str, List[Dict]]:
+        """
+        Most similar tickers for each query ticker, from one batched matrix product
+        
+        Args:
+            tickers: Query tickers (unknown ones are left out of the result)
+            k: Neighbours per ticker
+            same_sector: Only return neighbours from the query ticker's sector
+        
+        Returns:
+            Dict mapping each known query ticker to its neighbours, most similar first, with
+            cosine similarity and return correlation
+        """
+        with self._lock:
+            self._compose()
+            self.counters['queries'] += 1
+            queries = [t.upper().strip() for t in tickers]
+            queries = [t for t in queries if t in self._rows]
+            if not queries:
+                return {}
+            n = len(self._tickers)
+            rows = np.array([self._rows[t] for t in queries])
+            vectors, returns, sector_of = self._vectors[:n], self._returns, self._sector_of[:n]
+            similarity = vectors[rows] @ vectors.T
+            similarity[np.arange(len(rows)), rows] = -np.inf  # Never a match for itself
+            # Only companies are suggested, not rows with price history alone (e.g. the benchmark ETF)
+            similarity[:, ~self._has_info[:n]] = -np.inf
+            if same_sector:
+                similarity[sector_of[rows][:, None] != sector_of[None, :]] = -np.inf
+                similarity[sector_of[rows] < 0] = -np.inf
+            
+            result = {}
+            count = min(k, len(self._tickers) - 1)
+            for q, (ticker, row) in enumerate(zip(queries, rows)):
+                if count <= 0:
+                    result[ticker] = []
+                    continue
+                top = np.argpartition(-similarity[q], count - 1)[:count]
+                top = top[np.argsort(-similarity[q, top], kind='stable')]
+                result[ticker] = [
+                    {
+                        'ticker': self._tickers[j],
+                        'company_name': self._names[j],
+                        'sector': self._sectors[j],
+                        'similarity': round(float(similarity[q, j]), 4),
+                        'return_correlation': round(float(returns[row] @ returns[j]), 4)
+                        if returns[row].any() and returns[j].any() else None,
+                    }
+                    for j in top if np.isfinite(similarity[q, j])
+                ]
+            return result
+    
+    def contains(self, ticker: str, with_info: bool = True) -> bool:
+        """Whether a ticker has a row (and its company metrics, with with_info)"""
+        with self._lock:
+            i = self._rows.get(ticker.upper().strip())
+            return i is not None and (self._has_info[i] or not with_info) and self._tails[i] is not None
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            n = len(self._tickers)
+            return {
+                'tickers': n,
+                'with_info': int(self._has_info[:n].sum()),
+                'with_prices': sum(t is not None for t in self._tails),
+                'dimensions': int(self._vectors.shape[1]) if self._vectors is not None else None,
+                'block_weights': self.block_weights,
+                **self.counters,
+            }
+    
+    def _row(self, ticker: str) -> int:
+        """Row of a ticker, appended (growing the arrays geometrically) if new; called with the lock held"""
+        i = self._rows.get(ticker)
+        if i is not None:
+            return i
+        i = len(self._tickers)
+        if i >= len(self._metrics):
+            capacity = max(64, 2 * len(self._metrics))
+            metrics = np.full((capacity, len(FEATURES)), np.nan)
+            metrics[:i] = self._metrics[:i]
+            returns = np.zeros((capacity, self.return_window), dtype=np.float32)
+            returns[:i] = self._returns[:i]
+            has_info = np.zeros(capacity, dtype=bool)
+            has_info[:i] = self._has_info[:i]
+            self._metrics, self._returns, self._has_info = metrics, returns, has_info
+            self._vectors = None
+        self._rows[ticker] = i
+        self._tickers.append(ticker)
+        self._names.append(None)
+        self._sectors.append(None)
+        self._tails.append(None)
+        return i
+    
+    def _changed(self, i: int):
+        self.counters['row_updates'] += 1
+        self._dirty.add(i)
+    
+    def _compose(self):
+        """Rebuild stale return blocks and the vectors of changed rows; called with the lock held"""
+        n = len(self._tickers)
+        if self._grid is None and self._last_day is not None:
+            # The return window: the last return_window + 1 business days up to the newest bar
+            last = np.datetime64(int(self._last_day), 'D')
+            start = np.busday_offset(last, -self.return_window, roll='backward')
+            self._grid = np.arange(start, last + 1, dtype='datetime64[D]')
+            self._grid = self._grid[np.is_busday(self._grid)].astype(np.int64)
+            self._stale_returns = {i for i in range(n) if self._tails[i] is not None}
+            self._vectors = None
+        for i in self._stale_returns:
+            self._returns[i] = self._return_block(self._tails[i])
+        self._stale_returns = set()
+        
+        if self._vectors is not None and not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        new_sector = any(self._sectors[i] and self._sectors[i] not in self._vocabulary for i in dirty)
+        if self._vectors is None or new_sector or self._patched + len(dirty) > RESCALE_FRACTION * n:
+            self._scale = scale_stats(self._metrics[:n])
+            self._vocabulary = {s: j for j, s in enumerate(sorted({s for s in self._sectors if s}))}
+            self._sector_of = np.full(len(self._metrics), -1, dtype=np.int64)
+            vectors = self._assemble(np.arange(n))
+            self._vectors = np.zeros((len(self._metrics), vectors.shape[1]), dtype=np.float32)
+            self._vectors[:n] = vectors
+            self._patched = 0
+            self.counters['rebuilds'] += 1
+        else:
+            rows = np.array(sorted(dirty), dtype=np.int64)
+            self._vectors[rows] = self._assemble(rows)
+            self._patched += len(rows)
+            self.counters['row_refreshes'] += len(rows)
+    
+    def _assemble(self, rows: np.ndarray) -> np.ndarray:
+        """Weighted metric, return and sector blocks of some rows, with the current scaling and sectors"""
+        metrics = unit_rows(apply_scale(self._metrics[rows], *self._scale))
+        sector_of = np.array([self._vocabulary.get(self._sectors[i], -1) for i in rows], dtype=np.int64)
+        sectors = np.zeros((len(rows), max(len(self._vocabulary), 1)), dtype=np.float32)
+        known = sector_of >= 0
+        sectors[np.flatnonzero(known), sector_of[known]] = 1.0
+        self._sector_of[rows] = sector_of
+        
+        weights = self.block_weights
+        return np.hstack([
+            metrics.astype(np.float32) * np.sqrt(weights['metrics']),
+            self._returns[rows] * np.float32(np.sqrt(weights['returns'])),
+            sectors * np.float32(np.sqrt(weights['sector'])),
+        ])
+    
+    def _return_block(self, tail: Optional[tuple]) -> np.ndarray:
+        """Unit-length z-scored daily returns on the shared business-day grid (zeros without data)"""
+        block = np.zeros(self.return_window, dtype=np.float32)
+        if tail is None or self._grid is None:
+            return block
+        days, closes = tail
+        # Carry the last close forward over holidays and days the ticker didn't trade
+        positions = np.searchsorted(days, self._grid, side='right') - 1
+        aligned = np.where(positions >= 0, closes[np.maximum(positions, 0)], np.nan)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            returns = np.diff(np.log(aligned))
+        returns = returns[-self.return_window:]
+        valid = np.isfinite(returns)
+        if valid.sum() < MIN_BARS // 2:
+            return block
+        centered = np.where(valid, returns - returns[valid].mean(), 0.0)
+        norm = np.linalg.norm(centered)
+        if norm > 0:
+            block[-len(centered):] = centered / norm
+        return block
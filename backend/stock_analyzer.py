@@ -3,14 +3,19 @@ Stock Analyzer - Core analysis engine
 Performs comprehensive stock analysis including fundamentals, valuation, technicals, and risk
 """
 
-import yfinance as yf
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, Optional, Tuple
+from typing import Dict, Optional, Tuple, Iterable, Set
 import ta
 from scipy import stats
 
+from risk_engine import RiskEngine
+from upstream_scheduler import scheduler
+from market_source import market_source, STATEMENTS
+from shared_cache import shared_cache, cache_key
+from config import INFO_CACHE_TTL
+from ticker_status import negative_cache, CircuitOpenError, INVALID
 from models import (
     StockAnalysisResponse,
     FundamentalMetrics,
@@ -21,48 +26,88 @@ from models import (
     Recommendation
 )
 
+# Sections of an analysis that callers may select; the derived ones need all four base sections
+ANALYSIS_SECTIONS = ['fundamentals', 'valuation', 'technicals', 'risk', 'scoring', 'recommendation', 'insights']
+BASE_SECTIONS = ['fundamentals', 'valuation', 'technicals', 'risk']
+
+
+def required_sections(sections: Optional[Iterable[str]] = None) -> Set[str]:
+    """Sections that must be computed to produce the given ones (all when None)"""
+    if sections is None:
+        return set(ANALYSIS_SECTIONS)
+    needed = set(sections)
+    if needed - set(BASE_SECTIONS):
+        needed |= set(BASE_SECTIONS)
+    return needed
+
 
 class StockAnalyzer:
     """Main stock analysis engine"""
     
-    def __init__(self):
+    def __init__(self, risk_engine: RiskEngine = None):
         self.lookback_years = 5
         self.lookback_days = 252  # Trading days in a year
+        self.risk_engine = risk_engine or RiskEngine()
     
-    def analyze(self, ticker: str) -> StockAnalysisResponse:
+    def analyze(self, ticker: str, sections: Optional[Iterable[str]] = None) -> StockAnalysisResponse:
         """
         Perform comprehensive stock analysis
         
         Args:
             ticker: Stock ticker symbol
+            sections: Optional subset of ANALYSIS_SECTIONS to compute; the others are left
+                empty and the data only they need (statements, price history) is not fetched
             
         Returns:
             Complete stock analysis response
         """
+        needed = required_sections(sections)
         try:
+            # Tickers that recently failed validation are rejected without an upstream call
+            negative_cache.check(ticker)
+            
             # Fetch stock data
-            stock = yf.Ticker(ticker)
-            info = stock.info
+            info = shared_cache.get_or_compute(
+                cache_key('info', ticker),
+                lambda: scheduler.call(market_source.info, ticker),
+                ttl=INFO_CACHE_TTL,
+                cache_if=lambda info: bool(info) and 'symbol' in info
+            )
             
             # Validate ticker
             if not info or 'symbol' not in info:
+                negative_cache.mark(ticker, INVALID, f"Invalid ticker symbol: {ticker}")
                 raise ValueError(f"Invalid ticker symbol: {ticker}")
             
-            # Get historical data
-            hist = stock.history(period="2y")
-            if hist.empty:
-                raise ValueError(f"No historical data available for {ticker}")
+            # Historical data from the shared price cache (compact in memory, OHLCV only)
+            hist = None
+            if needed & {'valuation', 'technicals', 'risk'}:
+                hist = self.risk_engine.price_cache.get_history(ticker, period="2y")
+                if hist.empty:
+                    # Left to the price cache to negatively cache, once it has confirmed the ticker is empty
+                    raise ValueError(f"No historical data available for {ticker}")
+            
+            # Annual statements, each fetched once per analysis (risk only needs the income statement)
+            if 'fundamentals' in needed:
+                names = STATEMENTS
+            elif 'risk' in needed:
+                names = ['financials']
+            else:
+                names = []
+            statements = {name: scheduler.call(market_source.statement, ticker, name) for name in names}
             
             # Perform analyses
-            fundamentals = self._analyze_fundamentals(stock, info)
-            valuation = self._analyze_valuation(stock, info, hist)
-            technicals = self._analyze_technicals(hist)
-            risk = self._analyze_risk(stock, hist, info)
+            fundamentals = self._analyze_fundamentals(statements, info) if 'fundamentals' in needed else None
+            valuation = self._analyze_valuation(info, hist) if 'valuation' in needed else None
+            technicals = self._analyze_technicals(hist) if 'technicals' in needed else None
+            risk = self._analyze_risk(ticker, hist, info, statements['financials']) if 'risk' in needed else None
             
             # Calculate scores and recommendation
-            scoring = self._calculate_scores(fundamentals, valuation, technicals, risk)
-            recommendation = self._generate_recommendation(scoring, fundamentals, valuation, technicals, risk)
-            insights = self._generate_insights(fundamentals, valuation, technicals, risk, scoring)
+            scoring = recommendation = insights = None
+            if 'scoring' in needed or 'recommendation' in needed or 'insights' in needed:
+                scoring = self._calculate_scores(fundamentals, valuation, technicals, risk)
+                recommendation = self._generate_recommendation(scoring, fundamentals, valuation, technicals, risk)
+                insights = self._generate_insights(fundamentals, valuation, technicals, risk, scoring)
             
             return StockAnalysisResponse(
                 ticker=ticker,
@@ -79,16 +124,18 @@ class StockAnalyzer:
                 last_updated=datetime.now().isoformat()
             )
             
+        except CircuitOpenError:
+            raise
         except Exception as e:
             raise ValueError(f"Error analyzing {ticker}: {str(e)}")
     
-    def _analyze_fundamentals(self, stock: yf.Ticker, info: Dict) -> FundamentalMetrics:
+    def _analyze_fundamentals(self, statements: Dict[str, pd.DataFrame], info: Dict) -> FundamentalMetrics:
         """Analyze fundamental metrics"""
         
         # Get financials
-        financials = stock.financials
-        balance_sheet = stock.balance_sheet
-        cashflow = stock.cashflow
+        financials = statements['financials']
+        balance_sheet = statements['balance_sheet']
+        cashflow = statements['cashflow']
         
         # Revenue growth
         revenue_growth_yoy = None
@@ -171,7 +218,7 @@ class StockAnalyzer:
             profit_margin=profit_margin
         )
     
-    def _analyze_valuation(self, stock: yf.Ticker, info: Dict, hist: pd.DataFrame) -> ValuationMetrics:
+    def _analyze_valuation(self, info: Dict, hist: pd.DataFrame) -> ValuationMetrics:
         """Analyze valuation metrics"""
         
         current_price = hist['Close'].iloc[-1]
@@ -298,38 +345,27 @@ class StockAnalyzer:
             trend_direction=trend_direction
         )
     
-    def _analyze_risk(self, stock: yf.Ticker, hist: pd.DataFrame, info: Dict) -> RiskMetrics:
+    def _analyze_risk(self, ticker: str, hist: pd.DataFrame, info: Dict, financials: pd.DataFrame) -> RiskMetrics:
         """Analyze risk metrics"""
         
-        # Beta
-        beta = info.get('beta', 1.0)
+        # Price-based metrics from the universe risk engine
+        metrics = self.risk_engine.get_metrics(ticker, hist['Close']) or {}
         
-        # Volatility (annualized)
-        if len(hist) >= 30:
-            returns = hist['Close'].pct_change().dropna()
-            volatility_1y = returns.std() * np.sqrt(252) * 100  # Annualized percentage
-        else:
-            volatility_1y = None
-        
-        # Max drawdown (1 year)
-        max_drawdown_1y = None
-        if len(hist) >= 252:
-            one_year = hist.tail(252)
-            cumulative = (1 + one_year['Close'].pct_change()).cumprod()
-            running_max = cumulative.expanding().max()
-            drawdown = (cumulative - running_max) / running_max
-            max_drawdown_1y = drawdown.min() * 100
-        elif len(hist) >= 30:
-            # Use available data
-            cumulative = (1 + hist['Close'].pct_change()).cumprod()
-            running_max = cumulative.expanding().max()
-            drawdown = (cumulative - running_max) / running_max
-            max_drawdown_1y = drawdown.min() * 100
+        # Beta (regressed against the benchmark, falling back to the reported beta)
+        beta = metrics.get('beta')
+        if beta is None:
+            beta = info.get('beta', 1.0)
+        
+        # Volatility, downside deviation, drawdown and VaR/CVaR (1 year, percentages)
+        volatility_1y = _as_percent(metrics.get('volatility'))
+        downside_deviation_1y = _as_percent(metrics.get('downside_deviation'))
+        max_drawdown_1y = _as_percent(metrics.get('max_drawdown'))
+        var_95 = _as_percent(metrics.get('var_95'))
+        cvar_95 = _as_percent(metrics.get('cvar_95'))
         
         # Earnings variability (coefficient of variation of earnings)
         earnings_variability = None
         try:
-            financials = stock.financials
             if not financials.empty and 'Net Income' in financials.index:
                 earnings = financials.loc['Net Income'].dropna()
                 if len(earnings) >= 3:
@@ -379,6 +415,9 @@ class StockAnalyzer:
             beta=beta,
             max_drawdown_1y=max_drawdown_1y,
             volatility_1y=volatility_1y,
+            downside_deviation_1y=downside_deviation_1y,
+            var_95=var_95,
+            cvar_95=cvar_95,
             earnings_variability=earnings_variability,
             debt_risk_score=debt_risk_score,
             overall_risk_level=overall_risk_level
@@ -629,3 +668,7 @@ class StockAnalyzer:
         
         return insights
 
+
+def _as_percent(value: Optional[float]) -> Optional[float]:
+    """Convert a fraction to a percentage, keeping missing values as None"""
+    return value * 100 if value is not None else None
@@ -3,7 +3,6 @@ Stock Screener - Scan and rank multiple stocks
 Based on fundamental, technical, and risk analysis
 """
 
-import yfinance as yf
 import pandas as pd
 import numpy as np
 from datetime import datetime
@@ -11,28 +10,155 @@ from typing import List, Dict, Optional
 from ta.momentum import RSIIndicator
 from ta.trend import MACD
 
+from risk_engine import RiskEngine
+from upstream_scheduler import scheduler, SYMBOL_ERRORS
+from market_source import market_source
+from shared_cache import shared_cache, cache_key
+from config import INFO_CACHE_TTL
+from ticker_status import (
+    TickerError, CircuitOpenError, negative_cache, error_entry, INVALID, NO_DATA, UPSTREAM_ERROR, CIRCUIT_OPEN
+)
+
+
+# Maximum points of each component score
+MAX_SCORES = {'fundamental': 30, 'technical': 20, 'risk': 10}
+
+# Named (fundamental, technical, risk) weightings; 'balanced' is the default screen
+SCORING_PROFILES = {
+    'balanced': (0.4, 0.4, 0.2),
+    'growth': (0.55, 0.35, 0.1),
+    'momentum': (0.2, 0.65, 0.15),
+    'defensive': (0.35, 0.15, 0.5),
+}
+
+# Buy/Hold cutoffs for the balanced weights, as points out of its maximum total (22)
+DEFAULT_BUY_CUTOFF = 20
+DEFAULT_HOLD_CUTOFF = 15
+
+
+def scaled_cutoffs(weights) -> tuple:
+    """
+    Buy/Hold cutoffs for a weighting, keeping the default cutoffs' share of the maximum total
+    
+    Args:
+        weights: (fundamental, technical, risk) weights
+    
+    Returns:
+        (buy_cutoff, hold_cutoff)
+    """
+    balanced = SCORING_PROFILES['balanced']
+    maximum = lambda w: w[0] * MAX_SCORES['fundamental'] + w[1] * MAX_SCORES['technical'] + w[2] * MAX_SCORES['risk']
+    scale = maximum(weights) / maximum(balanced)
+    return DEFAULT_BUY_CUTOFF * scale, DEFAULT_HOLD_CUTOFF * scale
+
 
 class StockScreener:
     """Stock screener that ranks stocks based on multiple criteria"""
     
-    def __init__(self):
-        self.fundamental_weight = 0.4
-        self.technical_weight = 0.4
-        self.risk_weight = 0.2
+    def __init__(self, risk_engine: RiskEngine = None):
+        self.fundamental_weight, self.technical_weight, self.risk_weight = SCORING_PROFILES['balanced']
+        self.buy_cutoff = DEFAULT_BUY_CUTOFF
+        self.hold_cutoff = DEFAULT_HOLD_CUTOFF
+        self.risk_engine = risk_engine or RiskEngine()
+    
+    def fetch_info(self, ticker: str) -> Dict:
+        """
+        Fetch and validate company info
+        
+        Args:
+            ticker: Stock ticker symbol
+            
+        Returns:
+            yfinance info dict
+            
+        Raises:
+            TickerError: Ticker is invalid (and is negatively cached), or the upstream failed
+        """
+        negative_cache.check(ticker)
+        try:
+            # Valid info is shared by all workers, so each ticker is fetched once per INFO_CACHE_TTL
+            info = shared_cache.get_or_compute(
+                cache_key('info', ticker),
+                lambda: scheduler.call(market_source.info, ticker),
+                ttl=INFO_CACHE_TTL,
+                cache_if=lambda info: bool(info) and 'symbol' in info
+            )
+        except CircuitOpenError as e:
+            raise TickerError(ticker, CIRCUIT_OPEN, str(e))
+        except SYMBOL_ERRORS:
+            info = None
+        except Exception as e:
+            raise TickerError(ticker, UPSTREAM_ERROR, f"Failed to fetch data for {ticker}: {str(e)}")
+        
+        if not info or 'symbol' not in info:
+            message = f"Invalid or delisted ticker symbol: {ticker}"
+            negative_cache.mark(ticker, INVALID, message)
+            raise TickerError(ticker, INVALID, message)
+        return info
+    
+    def score_ticker(self, ticker: str, info: Optional[Dict] = None) -> Dict:
+        """
+        Component and weighted scores for one ticker, with warnings wherever a
+        component fell back to a default instead of real data
+        
+        Args:
+            ticker: Stock ticker symbol
+            info: Company info already fetched by the caller
+            
+        Returns:
+            Dict with fundamental/technical/risk/total scores and a list of warnings
+            
+        Raises:
+            TickerError: Ticker is invalid, has no price history, or the upstream failed
+        """
+        if info is None:
+            info = self.fetch_info(ticker)
+        hist = self.risk_engine.price_cache.get_history(ticker, period='1y')
+        if hist.empty:
+            # The price cache negatively caches tickers it confirmed have no history
+            raise TickerError(ticker, NO_DATA, f"No price history available for {ticker}")
+        
+        warnings = []
+        f_score = self.fundamental_score(ticker, info)
+        if all(info.get(k) is None for k in ('revenueGrowth', 'earningsQuarterlyGrowth', 'debtToEquity')):
+            warnings.append("No growth or leverage data; fundamental score is 0")
+        
+        t_score = self.technical_score(ticker, hist)
+        if len(hist) < 200:
+            warnings.append(f"Only {len(hist)} days of price history; technical score needs 200 and is 0")
+        
+        metrics = self.risk_engine.get_metrics(ticker, hist['Close'])
+        r_score = self.risk_score(ticker)
+        if not metrics or metrics['volatility'] is None:
+            warnings.append("Not enough returns for risk metrics; neutral risk score of 5 used")
+        
+        total_score = (
+            f_score * self.fundamental_weight +
+            t_score * self.technical_weight +
+            r_score * self.risk_weight
+        )
+        return {
+            'fundamental': f_score,
+            'technical': t_score,
+            'risk': r_score,
+            'total': total_score,
+            'warnings': warnings,
+        }
     
-    def fundamental_score(self, ticker: str) -> float:
+    def fundamental_score(self, ticker: str, info: Optional[Dict] = None) -> float:
         """
         Calculate fundamental score (0-30 points)
         
         Args:
             ticker: Stock ticker symbol
+            info: Company info already fetched by the caller (fetched if not given)
             
         Returns:
             Fundamental score (0-30)
         """
         try:
-            stock = yf.Ticker(ticker)
-            info = stock.info
+            if info is None:
+                info = self.fetch_info(ticker)
             
             if not info or 'symbol' not in info:
                 return 0
@@ -63,18 +189,21 @@ class StockScreener:
         except Exception as e:
             return 0
     
-    def technical_score(self, ticker: str) -> float:
+    def technical_score(self, ticker: str, hist: Optional[pd.DataFrame] = None) -> float:
         """
         Calculate technical score (0-20 points)
         
         Args:
             ticker: Stock ticker symbol
+            hist: Daily price history already loaded by the caller (at least 200 bars to score)
             
         Returns:
             Technical score (0-20)
         """
         try:
-            df = yf.download(ticker, period='6mo', interval='1d', progress=False)
+            if hist is None:
+                hist = self.risk_engine.price_cache.get_history(ticker, period='1y')
+            df = hist.copy()
             if df.empty or len(df) < 200:
                 return 0
             
@@ -137,21 +266,15 @@ class StockScreener:
             Risk score (0-10, inverted - higher score = lower risk)
         """
         try:
-            df = yf.download(ticker, period='1y', interval='1d', progress=False)
-            if df.empty or len(df) < 30:
+            metrics = self.risk_engine.get_metrics(ticker)
+            if not metrics or metrics['volatility'] is None:
                 return 5  # Neutral if insufficient data
             
-            returns = df['Close'].pct_change().dropna()
-            if len(returns) < 10:
-                return 5
-            
             # Volatility (annualized)
-            volatility = returns.std() * np.sqrt(252)
+            volatility = metrics['volatility']
             
-            # Beta (if available)
-            stock = yf.Ticker(ticker)
-            info = stock.info
-            beta = info.get('beta', 1.0)
+            # Beta (regressed against the benchmark)
+            beta = metrics['beta'] if metrics['beta'] is not None else 1.0
             
             score = 10
             
@@ -173,76 +296,214 @@ class StockScreener:
         except Exception as e:
             return 5  # Neutral if error
     
-    def screen_stocks(self, tickers: List[str], top_n: int = 10) -> List[Dict]:
+    def risk_score_from_metrics(self, metrics: pd.DataFrame) -> pd.Series:
+        """
+        Vectorized risk_score() for a RiskEngine metrics table
+        
+        Args:
+            metrics: DataFrame indexed by ticker with 'volatility' and 'beta' columns
+        
+        Returns:
+            Risk scores (0-10) by ticker; 5 (neutral) where volatility is missing
+        """
+        volatility = metrics['volatility'].astype(float)
+        beta = metrics['beta'].astype(float).fillna(1.0).abs()
+        volatility_penalty = np.where(volatility > 0.5, 5, np.where(volatility > 0.35, 3, np.where(volatility > 0.2, 1, 0)))
+        beta_penalty = np.where(beta > 1.5, 3, np.where(beta > 1.2, 1, 0))
+        score = pd.Series(np.clip(10 - volatility_penalty - beta_penalty, 0, 10), index=metrics.index, dtype=float)
+        return score.where(volatility.notna(), 5.0)
+    
+    def price_scores(self, tickers: List[str]) -> pd.DataFrame:
+        """
+        Technical and risk scores for a whole universe from the bulk price panel
+        
+        Needs no per-ticker upstream calls, so it can cheaply rank thousands of tickers
+        before the expensive fundamentals are fetched for the best of them.
+        
+        Args:
+            tickers: Ticker symbols
+        
+        Returns:
+            DataFrame indexed by ticker with 'technical', 'risk' and 'price_score' (their
+            weighted contribution to the total), best first. Tickers without prices are left out.
+        """
+        close = self.risk_engine.price_cache.get_panel(tickers, period='1y', fields=['Close'])['Close']
+        if close.empty:
+            return pd.DataFrame(columns=['technical', 'risk', 'price_score'])
+        
+        technical = self.technical_score_panel(close).ffill().iloc[-1].fillna(0.0)
+        metrics = self.risk_engine.refresh(list(close.columns)).reindex(close.columns)
+        risk = self.risk_score_from_metrics(metrics)
+        
+        scores = pd.DataFrame({'technical': technical, 'risk': risk})
+        scores['price_score'] = scores['technical'] * self.technical_weight + scores['risk'] * self.risk_weight
+        return scores.sort_values('price_score', ascending=False, kind='stable')
+    
+    def technical_score_panel(self, close: pd.DataFrame) -> pd.DataFrame:
+        """
+        Vectorized technical score (0-20 points) for every date and ticker
+        
+        Applies the same rules as technical_score() to a whole close-price panel at once,
+        so historical scores can be replayed without per-ticker downloads.
+        
+        Args:
+            close: Close prices (dates x tickers)
+        
+        Returns:
+            Technical scores (dates x tickers); 0 before 200 bars are available, NaN where there is no price
+        """
+        ma50 = close.rolling(50).mean()
+        ma200 = close.rolling(200).mean()
+        
+        # Moving Averages (0-5 points)
+        ma_points = np.where(ma50 > ma200, 5, np.where(close > ma50, 3, 0))
+        
+        # RSI (0-5 points) - Wilder smoothing, as in ta's RSIIndicator
+        diff = close.diff()
+        up = diff.where(diff > 0, 0.0).where(close.notna())
+        down = (-diff).where(diff < 0, 0.0).where(close.notna())
+        ema_up = up.ewm(alpha=1 / 14, min_periods=14, adjust=False).mean()
+        ema_down = down.ewm(alpha=1 / 14, min_periods=14, adjust=False).mean()
+        rsi = (100 - 100 / (1 + ema_up / ema_down)).where(ema_down != 0, 100)
+        rsi_points = np.where(rsi < 30, 5, np.where(rsi < 50, 3, np.where(rsi < 70, 2, 0)))
+        
+        # MACD (0-5 points)
+        macd = (
+            close.ewm(span=12, min_periods=12, adjust=False).mean() -
+            close.ewm(span=26, min_periods=26, adjust=False).mean()
+        )
+        macd_diff = macd - macd.ewm(span=9, min_periods=9, adjust=False).mean()
+        macd_points = np.where(macd_diff > 0, 5, np.where(macd_diff > -0.5, 2, 0))
+        
+        # Price momentum over the last 20 bars (0-5 points)
+        price_change = (close - close.shift(19)) / close.shift(19) * 100
+        momentum_points = np.where(price_change > 10, 5, np.where(price_change > 5, 3, np.where(price_change > 0, 1, 0)))
+        
+        score = pd.DataFrame(
+            np.minimum(ma_points + rsi_points + macd_points + momentum_points, 20),
+            index=close.index, columns=close.columns, dtype=float
+        )
+        score = score.where(close.notna().cumsum() >= 200, 0.0)
+        return score.where(close.notna())
+    
+    def risk_score_panel(self, close: pd.DataFrame, benchmark: Optional[pd.Series] = None) -> pd.DataFrame:
+        """
+        Vectorized risk score (0-10 points, higher = lower risk) for every date and ticker
+        
+        Applies the same rules as risk_score() over a rolling one-year window. Beta is
+        regressed against the benchmark close series when given, otherwise it is taken as 1.0.
+        
+        Args:
+            close: Close prices (dates x tickers)
+            benchmark: Benchmark close prices aligned to the same dates
+        
+        Returns:
+            Risk scores (dates x tickers); 5 (neutral) with insufficient data, NaN where there is no price
+        """
+        window = 252
+        returns = close.pct_change(fill_method=None)
+        
+        # Volatility (annualized)
+        volatility = returns.rolling(window, min_periods=29).std() * np.sqrt(252)
+        
+        # Beta against the benchmark
+        if benchmark is not None:
+            bench_returns = benchmark.reindex(close.index).pct_change(fill_method=None)
+            bench = returns.mul(0).add(bench_returns, axis=0)
+            stock = returns.where(bench.notna())
+            mean_stock = stock.rolling(window, min_periods=29).mean()
+            mean_bench = bench.rolling(window, min_periods=29).mean()
+            covariance = (stock * bench).rolling(window, min_periods=29).mean() - mean_stock * mean_bench
+            variance = (bench ** 2).rolling(window, min_periods=29).mean() - mean_bench ** 2
+            beta = (covariance / variance.where(variance > 0)).fillna(1.0).abs()
+        else:
+            beta = pd.DataFrame(1.0, index=close.index, columns=close.columns)
+        
+        # Volatility penalty
+        volatility_penalty = np.where(volatility > 0.5, 5, np.where(volatility > 0.35, 3, np.where(volatility > 0.2, 1, 0)))
+        
+        # Beta penalty
+        beta_penalty = np.where(beta > 1.5, 3, np.where(beta > 1.2, 1, 0))
+        
+        score = pd.DataFrame(
+            np.clip(10 - volatility_penalty - beta_penalty, 0, 10),
+            index=close.index, columns=close.columns, dtype=float
+        )
+        score = score.where(volatility.notna(), 5.0)
+        return score.where(close.notna())
+    
+    def screen_stocks(self, tickers: List[str], top_n: int = 10,
+                      errors: Optional[List[Dict]] = None,
+                      scored: Optional[List[Dict]] = None) -> List[Dict]:
         """
         Screen and rank multiple stocks
         
         Args:
             tickers: List of ticker symbols to screen
             top_n: Number of top stocks to return
+            errors: If given, a structured entry ({'ticker', 'status', 'message', 'cached'})
+                is appended for every ticker that could not be scored
+            scored: If given, every scored row is appended, not just the top N
             
         Returns:
             List of ranked stock results
         """
         results = []
+        errors = errors if errors is not None else []
+        
+        # Known-bad tickers are reported straight away without touching the upstream
+        tickers, cached_errors = negative_cache.partition(
+            list(dict.fromkeys(t.upper().strip() for t in tickers))
+        )
+        errors.extend(cached_errors)
+        
+        # Risk metrics for the whole batch in one pass
+        self.risk_engine.refresh(tickers)
         
         for ticker in tickers:
             try:
-                ticker = ticker.upper().strip()
-                
-                # Calculate scores
-                f_score = self.fundamental_score(ticker)
-                t_score = self.technical_score(ticker)
-                r_score = self.risk_score(ticker)
-                
-                # Weighted total score
-                total_score = (
-                    f_score * self.fundamental_weight +
-                    t_score * self.technical_weight +
-                    r_score * self.risk_weight
-                )
+                info = self.fetch_info(ticker)
+                scores = self.score_ticker(ticker, info)
+                total_score = scores['total']
                 
                 # Get current price
-                stock = yf.Ticker(ticker)
-                info = stock.info
                 current_price = info.get('currentPrice') or info.get('regularMarketPrice')
                 
                 # Get company name
                 company_name = info.get('longName') or info.get('shortName') or ticker
                 
                 # Determine recommendation
-                if total_score >= 20:
-                    recommendation = "Buy"
-                elif total_score >= 15:
-                    recommendation = "Hold"
-                else:
-                    recommendation = "Avoid"
+                recommendation = self.get_recommendation(total_score)
                 
                 results.append({
                     'ticker': ticker,
                     'company_name': company_name,
+                    'sector': info.get('sector'),
                     'current_price': current_price,
-                    'fundamental_score': round(f_score, 2),
-                    'technical_score': round(t_score, 2),
-                    'risk_score': round(r_score, 2),
+                    'fundamental_score': round(scores['fundamental'], 2),
+                    'technical_score': round(scores['technical'], 2),
+                    'risk_score': round(scores['risk'], 2),
                     'total_score': round(total_score, 2),
-                    'recommendation': recommendation
+                    'recommendation': recommendation,
+                    'warnings': scores['warnings']
                 })
             except Exception as e:
-                # Skip stocks that fail to analyze
-                continue
+                # Report stocks that fail to analyze instead of silently dropping them
+                errors.append(error_entry(ticker, e))
         
         # Sort by total score (descending)
         results.sort(key=lambda x: x['total_score'], reverse=True)
+        if scored is not None:
+            scored.extend(results)
         
         # Return top N
         return results[:top_n]
     
     def get_recommendation(self, score: float) -> str:
         """Get recommendation based on score"""
-        if score >= 20:
+        if score >= self.buy_cutoff:
             return "Buy"
-        elif score >= 15:
+        elif score >= self.hold_cutoff:
             return "Hold"
         else:
             return "Avoid"
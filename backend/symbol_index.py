@@ -0,0 +1,242 @@
+"""
+Symbol Index - In-memory ticker and company-name search
+Sorted-array prefix lookups on tickers and name tokens, with one-typo fuzzy matching, loaded from a local symbol-master file
+"""
+
+import csv
+import os
+import re
+from bisect import bisect_left
+from typing import List, Dict, Optional, Iterable
+
+from config import SYMBOL_MASTER_PATH
+
+
+# Match quality, best first; results are ordered by tier, then popularity
+TIER_EXACT_TICKER = 0
+TIER_TICKER_PREFIX = 1
+TIER_NAME_PREFIX = 2
+TIER_FUZZY = 3
+
+# Corporate suffixes that carry no search signal
+STOP_WORDS = {'inc', 'corp', 'corporation', 'co', 'company', 'the', 'ltd', 'plc', 'class', 'and', 'of', 'sa', 'nv', 'n'}
+
+# Prefixes up to this length match so many symbols that their best matches are precomputed
+SHORT_PREFIX = 2
+MAX_LIMIT = 50
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case alphanumeric tokens of a company name, without corporate suffixes"""
+    return [t for t in _TOKEN_RE.findall(text.lower().replace("'", '')) if t not in STOP_WORDS]
+
+
+class SymbolIndex:
+    """
+    Read-only search index over a symbol master
+    
+    Ticker and name-token lookups are binary searches over sorted arrays, so a prefix
+    query costs O(log n + matches). One- and two-character prefixes, which match large
+    parts of the universe, are answered from precomputed top-ranked lists. Fuzzy matching
+    uses a precomputed single-deletion neighbourhood of every name token (edit distance 1
+    without scanning the vocabulary).
+    """
+    
+    def __init__(self, symbols: Iterable[Dict], popular: Optional[List[str]] = None):
+        """
+        Args:
+            symbols: Rows with 'ticker' and 'name', optionally 'exchange', 'sector' and a
+                numeric 'popularity' (e.g. market cap or volume)
+            popular: Tickers to rank above others with the same popularity
+        """
+        boost = {t.upper(): len(popular) - i for i, t in enumerate(popular or [])}
+        self.symbols: List[Dict] = []
+        seen = set()
+        for row in symbols:
+            ticker = (row.get('ticker') or '').upper().strip()
+            if not ticker or ticker in seen:
+                continue
+            seen.add(ticker)
+            self.symbols.append({
+                'ticker': ticker,
+                'name': (row.get('name') or ticker).strip(),
+                'exchange': (row.get('exchange') or '').strip() or None,
+                'sector': (row.get('sector') or '').strip() or None,
+                '_rank': (_as_float(row.get('popularity')), boost.get(ticker, 0)),
+            })
+        
+        # Global rank: higher popularity first, then curated boost, then shorter (primary) tickers
+        by_rank = sorted(range(len(self.symbols)), key=lambda i: (
+            -self.symbols[i]['_rank'][0], -self.symbols[i]['_rank'][1],
+            len(self.symbols[i]['ticker']), self.symbols[i]['ticker']
+        ))
+        self._rank = [0] * len(self.symbols)
+        for position, i in enumerate(by_rank):
+            self._rank[i] = position
+        self._name_tokens = [tokenize(s['name']) for s in self.symbols]
+        
+        # Sorted ticker array for prefix ranges
+        order = sorted(range(len(self.symbols)), key=lambda i: self.symbols[i]['ticker'])
+        self._tickers = [self.symbols[i]['ticker'] for i in order]
+        self._ticker_ids = order
+        
+        # Sorted (token, symbol id) arrays for name-token prefix ranges
+        postings = sorted(
+            (token, i) for i, tokens in enumerate(self._name_tokens) for token in set(tokens)
+        )
+        self._tokens = [p[0] for p in postings]
+        self._token_ids = [p[1] for p in postings]
+        
+        # Single-deletion neighbourhood: every token and its deletions map to the tokens they came from
+        self._deletions: Dict[str, set] = {}
+        for token in set(self._tokens):
+            if len(token) < 4:
+                continue  # Too short for a typo to be meaningful
+            for variant in _deletions(token) | {token}:
+                self._deletions.setdefault(variant, set()).add(token)
+        
+        # Best-ranked matches for every short ticker and name-token prefix
+        self._short_tickers = self._top_by_prefix(self._tickers, self._ticker_ids)
+        self._short_tokens = self._top_by_prefix(self._tokens, self._token_ids)
+    
+    @classmethod
+    def from_file(cls, path: str = SYMBOL_MASTER_PATH, popular: Optional[List[str]] = None) -> 'SymbolIndex':
+        """
+        Load a symbol master CSV
+        
+        Column names are matched case-insensitively; 'symbol' is accepted for ticker,
+        'security name'/'company' for name, and 'market_cap' for popularity.
+        """
+        aliases = {
+            'symbol': 'ticker', 'security name': 'name', 'company': 'name',
+            'company name': 'name', 'market_cap': 'popularity', 'marketcap': 'popularity',
+        }
+        if not os.path.exists(path):
+            return cls([], popular)
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            rows = [
+                {aliases.get(k.strip().lower(), k.strip().lower()): v for k, v in row.items() if k}
+                for row in reader
+            ]
+        return cls(rows, popular)
+    
+    def __len__(self) -> int:
+        return len(self.symbols)
+    
+    def search(self, query: str, limit: int = 10) -> List[Dict]:
+        """
+        Find symbols by ticker prefix or company-name token prefixes
+        
+        Multi-word queries must match a prefix of some name token for every word. When
+        exact lookups find fewer than limit results, name tokens one edit away are tried.
+        
+        Args:
+            query: Partial ticker or company name
+            limit: Maximum number of results
+        
+        Returns:
+            Symbols ordered by match quality, then popularity, each with a 'match' tier name
+        """
+        query = query.strip()
+        limit = min(limit, MAX_LIMIT)
+        if not query or limit <= 0:
+            return []
+        matches: Dict[int, int] = {}
+        
+        # Ticker prefix range
+        prefix = query.upper()
+        exact = self._find_ticker(prefix)
+        if exact is not None:
+            matches[exact] = TIER_EXACT_TICKER
+        for i in self._prefix_ids(self._tickers, self._ticker_ids, self._short_tickers, prefix):
+            matches.setdefault(i, TIER_TICKER_PREFIX)
+        
+        # Every query word must prefix-match a token of the name: look up the longest
+        # (most selective) word, then filter its matches by the others
+        words = sorted(tokenize(query) or [query.lower()], key=len, reverse=True)
+        candidates = self._prefix_ids(self._tokens, self._token_ids, self._short_tokens, words[0])
+        for word in words[1:]:
+            candidates = [i for i in candidates if any(t.startswith(word) for t in self._name_tokens[i])]
+        for i in candidates:
+            matches.setdefault(i, TIER_NAME_PREFIX)
+        
+        if len(matches) < limit:
+            for i in self._fuzzy(words):
+                matches.setdefault(i, TIER_FUZZY)
+        
+        ranked = sorted(matches.items(), key=lambda m: (m[1], self._rank[m[0]]))[:limit]
+        tier_names = {
+            TIER_EXACT_TICKER: 'ticker', TIER_TICKER_PREFIX: 'ticker_prefix',
+            TIER_NAME_PREFIX: 'name', TIER_FUZZY: 'fuzzy',
+        }
+        return [
+            {**{k: v for k, v in self.symbols[i].items() if not k.startswith('_')}, 'match': tier_names[tier]}
+            for i, tier in ranked
+        ]
+    
+    def get(self, ticker: str) -> Optional[Dict]:
+        """Exact ticker lookup"""
+        i = self._find_ticker(ticker.upper().strip())
+        if i is None:
+            return None
+        return {k: v for k, v in self.symbols[i].items() if not k.startswith('_')}
+    
+    def _find_ticker(self, ticker: str) -> Optional[int]:
+        pos = bisect_left(self._tickers, ticker)
+        if pos < len(self._tickers) and self._tickers[pos] == ticker:
+            return self._ticker_ids[pos]
+        return None
+    
+    def _fuzzy(self, words: List[str]) -> set:
+        """Symbols whose name has a token within one edit of every query word"""
+        candidates = None
+        for word in words:
+            if len(word) < 4:
+                tokens = {word}
+            else:
+                tokens = set()
+                for variant in _deletions(word) | {word}:
+                    tokens |= self._deletions.get(variant, set())
+            ids = set()
+            for token in tokens:
+                ids.update(self._prefix_range(self._tokens, self._token_ids, token, exact=True))
+            candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                return set()
+        return candidates or set()
+    
+    def _prefix_ids(self, keys: List[str], ids: List[int], short: Dict[str, List[int]], prefix: str) -> List[int]:
+        if len(prefix) <= SHORT_PREFIX:
+            return short.get(prefix, [])
+        return list(dict.fromkeys(self._prefix_range(keys, ids, prefix)))
+    
+    def _top_by_prefix(self, keys: List[str], ids: List[int]) -> Dict[str, List[int]]:
+        """Best-ranked MAX_LIMIT symbol ids for every key prefix of up to SHORT_PREFIX characters"""
+        grouped: Dict[str, set] = {}
+        for key, i in zip(keys, ids):
+            for length in range(1, min(len(key), SHORT_PREFIX) + 1):
+                grouped.setdefault(key[:length], set()).add(i)
+        return {p: sorted(members, key=self._rank.__getitem__)[:MAX_LIMIT] for p, members in grouped.items()}
+    
+    @staticmethod
+    def _prefix_range(keys: List[str], ids: List[int], prefix: str, exact: bool = False):
+        start = bisect_left(keys, prefix)
+        for pos in range(start, len(keys)):
+            key = keys[pos]
+            if (key != prefix) if exact else (not key.startswith(prefix)):
+                break
+            yield ids[pos]
+
+
+def _deletions(word: str) -> set:
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def _as_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
@@ -0,0 +1,326 @@
+"""
+Synthetic Universe - Seedable fake market for offline scale tests
+Generates correlated OHLCV paths (market and sector factors plus jumps), Ticker.info dicts and annual statements
+"""
+
+import zlib
+from functools import lru_cache
+from typing import List, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import BENCHMARK_TICKER
+
+
+SECTORS = [
+    'Technology', 'Healthcare', 'Financial Services', 'Consumer Cyclical', 'Industrials',
+    'Communication Services', 'Consumer Defensive', 'Energy', 'Utilities', 'Real Estate', 'Basic Materials',
+]
+SECTOR_WEIGHTS = np.array([0.2, 0.14, 0.13, 0.11, 0.12, 0.06, 0.06, 0.05, 0.04, 0.05, 0.04])
+
+# Sector tilts: (revenue growth, profit margin, debt-to-equity median, P/E multiple)
+SECTOR_PROFILES = {
+    'Technology': (0.12, 0.18, 40, 28),
+    'Healthcare': (0.08, 0.12, 60, 24),
+    'Financial Services': (0.05, 0.2, 180, 13),
+    'Consumer Cyclical': (0.07, 0.07, 90, 20),
+    'Industrials': (0.05, 0.09, 90, 19),
+    'Communication Services': (0.06, 0.12, 80, 18),
+    'Consumer Defensive': (0.04, 0.08, 80, 21),
+    'Energy': (0.03, 0.1, 60, 11),
+    'Utilities': (0.03, 0.11, 150, 17),
+    'Real Estate': (0.04, 0.15, 120, 30),
+    'Basic Materials': (0.03, 0.09, 60, 14),
+}
+
+NAME_PREFIXES = ['Apex', 'Blue', 'Cedar', 'Delta', 'Ember', 'Falcon', 'Granite', 'Harbor', 'Iron', 'Juniper',
+                 'Keystone', 'Lumen', 'Meridian', 'Nova', 'Orion', 'Pioneer', 'Quartz', 'Summit', 'Titan', 'Vertex']
+NAME_SUFFIXES = {
+    'Technology': 'Systems', 'Healthcare': 'Therapeutics', 'Financial Services': 'Financial',
+    'Consumer Cyclical': 'Brands', 'Industrials': 'Industries', 'Communication Services': 'Media',
+    'Consumer Defensive': 'Foods', 'Energy': 'Energy', 'Utilities': 'Power', 'Real Estate': 'Realty',
+    'Basic Materials': 'Materials',
+}
+
+# Trading days per period; the generated history is HISTORY_DAYS long
+PERIOD_DAYS = {'1d': 1, '5d': 5, '1mo': 21, '3mo': 63, '6mo': 126, '1y': 252, '2y': 504,
+               '5y': 1260, '10y': 2520, 'max': 2520}
+HISTORY_DAYS = PERIOD_DAYS['max']
+
+# Random streams per ticker, so each kind of data is stable no matter what is requested first
+_PARAMS, _PATH, _STATEMENTS = 0, 1, 2
+
+
+class SyntheticUniverse:
+    """
+    Deterministic universe of size generated tickers plus a benchmark
+    
+    Daily log returns follow a factor model:
+        r = drift + beta * market + loading * sector + idiosyncratic + jump
+    with Gaussian factors shared by every ticker (and by a sector), and Poisson jumps.
+    Fundamentals come from per-ticker growth and quality factors tilted by sector. Market
+    cap is earnings times a sector P/E multiple, and shares outstanding follow from the
+    last close, so info, statements and prices agree. The same seed always produces the
+    same universe.
+    """
+    
+    def __init__(self, size: int = 5000, seed: int = 0, tickers: Optional[List[str]] = None,
+                 open_universe: bool = False, end: Optional[pd.Timestamp] = None,
+                 benchmark: str = BENCHMARK_TICKER):
+        """
+        Args:
+            size: Number of generated tickers
+            seed: Seed for symbols, factors and every ticker's parameters
+            tickers: Extra named tickers to include (e.g. real symbols for UI testing)
+            open_universe: Also generate any other requested symbol on demand from its name
+            end: Last bar date (default: today at each call)
+            benchmark: Index ticker whose path is the market factor alone
+        """
+        self.seed = seed
+        self.open_universe = open_universe
+        self.end = end
+        self.benchmark = benchmark.upper()
+        
+        rng = np.random.default_rng([seed, 0xFAC7])
+        self._market = rng.normal(0.00035, 0.0095, HISTORY_DAYS)
+        self._sectors = rng.normal(0.0, 0.007, (len(SECTORS), HISTORY_DAYS))
+        
+        names = [t.upper() for t in (tickers or [])] + _generate_symbols(size, seed)
+        self.tickers: List[str] = list(dict.fromkeys(t for t in names if t != self.benchmark))
+        self._index = {t: i for i, t in enumerate(self.tickers)}
+        self._params = lru_cache(maxsize=None)(self._draw_params)
+        self._calendar = lru_cache(maxsize=4)(lambda end: pd.bdate_range(end=end, periods=HISTORY_DAYS))
+        self._path = lru_cache(maxsize=2048)(self._generate_path)
+    
+    def __len__(self) -> int:
+        return len(self.tickers)
+    
+    def __contains__(self, ticker: str) -> bool:
+        ticker = ticker.upper()
+        return ticker == self.benchmark or ticker in self._index or (self.open_universe and _is_symbol(ticker))
+    
+    def history(self, ticker: str, days: int = 252) -> pd.DataFrame:
+        """Daily OHLCV bars (most recent days business days); empty for unknown tickers"""
+        ticker = ticker.upper()
+        if ticker not in self:
+            return pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+        return self._path(ticker, self._end()).tail(days)
+    
+    def download(self, tickers: List[str], period: str, interval: str = '1d') -> Dict[str, pd.DataFrame]:
+        """History for many tickers; intraday intervals return a few one-minute bars at the last close"""
+        days = PERIOD_DAYS.get(period, 252)
+        result = {}
+        for ticker in tickers:
+            hist = self.history(ticker, days if interval == '1d' else 1)
+            if hist.empty:
+                continue
+            if interval != '1d':
+                index = pd.date_range(end=pd.Timestamp.now().floor('min'), periods=5, freq='min')
+                hist = pd.DataFrame({c: [hist[c].iloc[-1]] * 5 for c in hist.columns}, index=index)
+            result[ticker.upper()] = hist
+        return result
+    
+    def info(self, ticker: str) -> Dict:
+        """Ticker.info-style dict with the fields the scorers read; empty for unknown tickers"""
+        ticker = ticker.upper()
+        if ticker not in self:
+            return {}
+        p = self._params(ticker)
+        price = float(self.history(ticker, 1)['Close'].iloc[-1])
+        if ticker == self.benchmark:
+            return {'symbol': ticker, 'shortName': 'Synthetic Market Index', 'longName': 'Synthetic Market Index',
+                    'quoteType': 'ETF', 'currentPrice': round(price, 2), 'regularMarketPrice': round(price, 2),
+                    'beta': 1.0}
+        
+        revenue = p['revenue']
+        net_income = revenue * p['margin']
+        shares = _market_cap(p) / price
+        eps = net_income / shares
+        info = {
+            'symbol': ticker,
+            'shortName': p['name'],
+            'longName': f"{p['name']} Inc.",
+            'quoteType': 'EQUITY',
+            'exchange': p['exchange'],
+            'sector': p['sector'],
+            'industry': f"{p['sector']} - Synthetic",
+            'currency': 'USD',
+            'currentPrice': round(price, 2),
+            'regularMarketPrice': round(price, 2),
+            'marketCap': int(price * shares),
+            'sharesOutstanding': int(shares),
+            'averageVolume': int(p['avg_volume']),
+            'beta': round(p['beta'], 2),
+            'totalRevenue': int(revenue),
+            'revenueGrowth': round(p['revenue_growth'], 4),
+            'earningsQuarterlyGrowth': round(p['earnings_growth'], 4),
+            'profitMargins': round(p['margin'], 4),
+            'returnOnEquity': round(p['roe'], 4),
+            'returnOnInvestedCapital': round(p['roe'] * 0.75, 4),
+            'debtToEquity': round(p['debt_to_equity'], 2),
+            'currentRatio': round(p['current_ratio'], 2),
+            'freeCashflow': int(net_income * p['cash_conversion'] - revenue * p['capex_ratio']),
+            'trailingEps': round(eps, 2),
+            'industryTrailingPE': float(SECTOR_PROFILES[p['sector']][3]),
+        }
+        if eps > 0:
+            pe = price / eps
+            info['trailingPE'] = round(pe, 2)
+            info['forwardPE'] = round(pe / (1 + max(p['earnings_growth'], -0.5)), 2)
+            if p['earnings_growth'] > 0:
+                info['pegRatio'] = round(pe / (p['earnings_growth'] * 100), 2)
+        return info
+    
+    def statement(self, ticker: str, name: str) -> pd.DataFrame:
+        """Four annual periods (line items x period-end dates, newest first)"""
+        ticker = ticker.upper()
+        if ticker not in self or ticker == self.benchmark:
+            return pd.DataFrame()
+        p = self._params(ticker)
+        rng = self._rng(ticker, _STATEMENTS)
+        year = self._end().year
+        columns = pd.to_datetime([f"{year - i}-12-31" for i in range(1, 5)])
+        
+        # Walk revenue back from the latest year with noisy growth
+        growth = p['revenue_growth'] + rng.normal(0, 0.03, 4)
+        revenue = p['revenue'] / np.cumprod(np.concatenate([[1.0], 1 + growth[:3]]))
+        margins = np.clip(p['margin'] + rng.normal(0, 0.02, 4), -0.3, 0.5)
+        net_income = revenue * margins
+        assets = revenue * p['asset_turnover']
+        equity = assets / (1 + p['debt_to_equity'] / 100 + 0.3)
+        operating_cash = net_income * p['cash_conversion'] + revenue * 0.02
+        capex = -revenue * p['capex_ratio']
+        
+        rows = {
+            'financials': {
+                'Total Revenue': revenue,
+                'Gross Profit': revenue * np.clip(margins + 0.25, 0.05, 0.9),
+                'Operating Income': net_income * 1.3,
+                'Net Income': net_income,
+            },
+            'balance_sheet': {
+                'Total Assets': assets,
+                'Total Debt': equity * p['debt_to_equity'] / 100,
+                'Stockholders Equity': equity,
+                'Current Assets': assets * 0.3,
+                'Current Liabilities': assets * 0.3 / p['current_ratio'],
+            },
+            'cashflow': {
+                'Operating Cash Flow': operating_cash,
+                'Capital Expenditure': capex,
+                'Free Cash Flow': operating_cash + capex,
+            },
+        }
+        if name not in rows:
+            raise ValueError(f"Unknown statement '{name}'")
+        return pd.DataFrame(rows[name], index=columns).T
+    
+    def symbols(self) -> List[Dict]:
+        """Symbol-master rows (ticker, name, exchange, sector, popularity = market cap)"""
+        rows = []
+        for ticker in self.tickers:
+            p = self._params(ticker)
+            rows.append({'ticker': ticker, 'name': f"{p['name']} Inc.", 'exchange': p['exchange'],
+                         'sector': p['sector'], 'popularity': round(_market_cap(p))})
+        rows.append({'ticker': self.benchmark, 'name': 'Synthetic Market Index', 'exchange': 'NYSEARCA',
+                     'sector': None, 'popularity': 0})
+        return rows
+    
+    def _end(self) -> pd.Timestamp:
+        return self.end if self.end is not None else pd.Timestamp.now().normalize()
+    
+    def _rng(self, ticker: str, stream: int) -> np.random.Generator:
+        key = self._index.get(ticker)
+        if key is None:
+            key = (1 << 32) + zlib.crc32(ticker.encode())
+        return np.random.default_rng([self.seed, key, stream])
+    
+    def _draw_params(self, ticker: str) -> Dict:
+        """Static per-ticker parameters, drawn in a fixed order from the ticker's own stream"""
+        rng = self._rng(ticker, _PARAMS)
+        sector = SECTORS[int(rng.choice(len(SECTORS), p=SECTOR_WEIGHTS / SECTOR_WEIGHTS.sum()))]
+        sector_growth, sector_margin, sector_leverage, _ = SECTOR_PROFILES[sector]
+        growth_factor, quality_factor = rng.normal(0, 1, 2)
+        revenue_growth = sector_growth + 0.08 * growth_factor
+        margin = sector_margin + 0.05 * quality_factor + rng.normal(0, 0.02)
+        return {
+            'sector': sector,
+            'sector_index': SECTORS.index(sector),
+            'name': f"{NAME_PREFIXES[int(rng.integers(len(NAME_PREFIXES)))]} {NAME_SUFFIXES[sector]}",
+            'exchange': 'NASDAQ' if rng.random() < 0.55 else 'NYSE',
+            'beta': float(np.clip(rng.normal(1.0, 0.3), 0.2, 2.5)),
+            'sector_loading': float(rng.uniform(0.5, 1.2)),
+            'idio_vol': float(np.exp(rng.normal(np.log(0.014), 0.35))),
+            'drift': float(rng.normal(0.0001, 0.0002) + 0.0003 * growth_factor * 0.5),
+            'jump_rate': float(rng.uniform(0.002, 0.015)),
+            'jump_mean': float(rng.normal(-0.005, 0.01)),
+            'jump_vol': float(rng.uniform(0.03, 0.09)),
+            'start_price': float(np.exp(rng.normal(np.log(50), 0.8))),
+            'avg_volume': float(np.exp(rng.normal(np.log(2e6), 1.0))),
+            'pe_multiple': float(SECTOR_PROFILES[sector][3] * np.exp(0.25 * growth_factor + rng.normal(0, 0.2))),
+            'revenue': float(np.exp(rng.normal(np.log(4e9), 1.2))),
+            'revenue_growth': float(revenue_growth),
+            'earnings_growth': float(revenue_growth * 1.5 + rng.normal(0, 0.15)),
+            'margin': float(margin),
+            'roe': float(0.12 + 0.08 * quality_factor + rng.normal(0, 0.03)),
+            'debt_to_equity': float(sector_leverage * np.exp(rng.normal(0, 0.5) - 0.2 * quality_factor)),
+            'current_ratio': float(np.clip(1.5 + 0.5 * quality_factor + rng.normal(0, 0.3), 0.3, 5.0)),
+            'cash_conversion': float(rng.uniform(1.0, 1.5)),
+            'capex_ratio': float(rng.uniform(0.02, 0.08)),
+            'asset_turnover': float(rng.uniform(0.8, 3.0)),
+        }
+    
+    def _generate_path(self, ticker: str, end: pd.Timestamp) -> pd.DataFrame:
+        index = self._calendar(end)
+        if ticker == self.benchmark:
+            returns = self._market
+            start_price, idio_vol, avg_volume = 300.0, 0.0, 8e7
+            rng = np.random.default_rng([self.seed, 0xBE4C])
+        else:
+            p = self._params(ticker)
+            rng = self._rng(ticker, _PATH)
+            jumps = rng.poisson(p['jump_rate'], HISTORY_DAYS) * rng.normal(p['jump_mean'], p['jump_vol'], HISTORY_DAYS)
+            returns = (p['drift'] + p['beta'] * (self._market - self._market.mean())
+                       + p['sector_loading'] * self._sectors[p['sector_index']]
+                       + rng.normal(0, p['idio_vol'], HISTORY_DAYS) + jumps)
+            start_price, idio_vol, avg_volume = p['start_price'], p['idio_vol'], p['avg_volume']
+        
+        close = start_price * np.exp(np.cumsum(returns))
+        previous = np.concatenate([[start_price], close[:-1]])
+        open_ = previous * np.exp(rng.normal(0, max(idio_vol, 0.004) / 3, HISTORY_DAYS))
+        wick = np.abs(rng.normal(0, max(idio_vol, 0.004) / 2, (2, HISTORY_DAYS)))
+        high = np.maximum(open_, close) * (1 + wick[0])
+        low = np.minimum(open_, close) * (1 - wick[1])
+        # Volume rises with the size of the move
+        volume = avg_volume * np.exp(rng.normal(0, 0.3, HISTORY_DAYS)) * (1 + 20 * np.abs(returns))
+        return pd.DataFrame({
+            'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume.astype(np.int64),
+        }, index=index)
+
+
+def _market_cap(p: Dict) -> float:
+    """Earnings times the ticker's P/E multiple; loss makers are valued on sales"""
+    earnings = p['revenue'] * p['margin']
+    return earnings * p['pe_multiple'] if earnings > 0 else p['revenue'] * 1.5
+
+
+def _generate_symbols(size: int, seed: int) -> List[str]:
+    """size unique 3-4 letter symbols"""
+    rng = np.random.default_rng([seed, 0x5E1])
+    letters = np.array(list('ABCDEFGHIJKLMNOPQRSTUVWXYZ'))
+    symbols: Dict[str, None] = {}
+    while len(symbols) < size:
+        batch = max(size - len(symbols), 16) * 2
+        lengths = rng.choice([3, 4], batch, p=[0.4, 0.6])
+        codes = rng.choice(letters, (batch, 4))
+        for code, length in zip(codes, lengths):
+            symbol = ''.join(code[:length])
+            symbols.setdefault(symbol, None)
+            if len(symbols) == size:
+                break
+    return list(symbols)
+
+
+def _is_symbol(ticker: str) -> bool:
+    return 0 < len(ticker) <= 10 and all(c.isalnum() or c in '.-^=' for c in ticker)
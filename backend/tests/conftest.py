@@ -0,0 +1,19 @@
+"""
+Test setup - points every cache and store at a throwaway directory and uses the synthetic source
+Runs before the backend modules are imported, since config reads the environment at import time
+"""
+
+import os
+import sys
+import tempfile
+
+_cache_dir = tempfile.TemporaryDirectory(prefix='stock-tests-', ignore_cleanup_errors=True)
+os.environ['STOCK_CACHE_DIR'] = _cache_dir.name
+os.environ['SHARED_CACHE_PATH'] = os.path.join(_cache_dir.name, 'shared_cache.sqlite')
+os.environ['MARKET_DATA_SOURCE'] = 'synthetic'
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def pytest_unconfigure(config):
+    _cache_dir.cleanup()
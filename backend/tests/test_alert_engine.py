@@ -0,0 +1,90 @@
+"""
+Alert engine tests - edge-triggered firing, claiming across workers, rule sync and ownership
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from alert_engine import AlertEngine, check_webhook_url
+from price_store import PriceSeries
+
+
+def series(ticker: str, close: float, days: int = 30) -> PriceSeries:
+    index = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=days)
+    closes = np.full(days, close)
+    frame = pd.DataFrame({'Open': closes, 'High': closes, 'Low': closes, 'Close': closes,
+                          'Volume': np.full(days, 1000)}, index=index)
+    return PriceSeries.from_frame(ticker, frame, '1y')
+
+
+def quote(bars: PriceSeries, price: float):
+    """A live quote revising the series' last bar"""
+    day = pd.Timestamp('1970-01-01') + pd.Timedelta(days=int(bars.days[-1]))
+    return {bars.ticker: {'price': price, 'timestamp': day.isoformat()}}
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'alerts.sqlite')
+
+
+def test_fires_on_each_false_to_true_transition_only(db_path):
+    engine = AlertEngine(db_path, webhook_url=None)
+    engine.add_rule('ann', 'AAA', 'price_above', threshold=100)
+    bars = series('AAA', 90)
+    assert engine.on_series(bars) == []
+    
+    assert len(engine.on_quotes(quote(bars, 110))) == 1
+    assert engine.on_quotes(quote(bars, 120)) == []  # Still above: no repeat
+    assert engine.on_quotes(quote(bars, 95)) == []
+    assert len(engine.on_quotes(quote(bars, 105))) == 1
+    assert [e['price'] for e in engine.events(user='ann')] == [110, 105]
+
+
+def test_rule_already_true_when_created_is_armed_without_firing(db_path):
+    engine = AlertEngine(db_path, webhook_url=None)
+    engine.add_rule('ann', 'AAA', 'price_above', threshold=100)
+    bars = series('AAA', 110)
+    assert engine.on_series(bars) == []
+    assert engine.on_quotes(quote(bars, 115)) == []
+    assert engine.events() == []
+
+
+def test_only_one_worker_claims_a_crossing(db_path):
+    first, second = AlertEngine(db_path, webhook_url=None), AlertEngine(db_path, webhook_url=None)
+    first.add_rule('ann', 'AAA', 'price_above', threshold=100)
+    bars = series('AAA', 90)
+    first.on_series(bars)
+    second.on_series(bars)
+    
+    fired = first.on_quotes(quote(bars, 110)) + second.on_quotes(quote(bars, 110))
+    assert len(fired) == 1
+    assert len(first.events()) == 1
+
+
+def test_other_workers_pick_up_added_and_removed_rules(db_path):
+    first, second = AlertEngine(db_path, webhook_url=None), AlertEngine(db_path, webhook_url=None)
+    rule = first.add_rule('ann', 'AAA', 'price_above', threshold=100)
+    second.add_rule('bob', 'BBB', 'price_below', threshold=10)
+    assert [r['ticker'] for r in first.rules()] == ['AAA', 'BBB']
+    assert [r['ticker'] for r in second.rules()] == ['AAA', 'BBB']
+    
+    assert first.remove_rule(rule['id'], 'ann')
+    assert [r['ticker'] for r in second.rules()] == ['BBB']
+
+
+def test_only_the_owner_can_remove_a_rule(db_path):
+    engine = AlertEngine(db_path, webhook_url=None)
+    rule = engine.add_rule('ann', 'AAA', 'price_above', threshold=100)
+    assert not engine.remove_rule(rule['id'], 'bob')
+    assert engine.remove_rule(rule['id'], 'ann')
+
+
+@pytest.mark.parametrize('url', [
+    'ftp://example.com/hook', 'http://127.0.0.1/hook', 'http://10.1.2.3/hook',
+    'http://169.254.169.254/latest', 'http://[::1]/hook', 'not a url',
+])
+def test_webhooks_must_be_public_http(url):
+    with pytest.raises(ValueError):
+        check_webhook_url(url)
@@ -0,0 +1,113 @@
+"""
+Price history cache tests - which missing tickers get negatively cached, and for how long
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import market_data
+from config import NEGATIVE_CACHE_MISS_SECONDS
+from market_data import PriceHistoryCache
+from market_source import MarketDataSource
+from ticker_status import NegativeCache, NO_DATA
+
+
+def bars(days: int = 30) -> pd.DataFrame:
+    index = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=days)
+    close = np.linspace(100, 110, days)
+    return pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close,
+                         'Volume': np.full(days, 1000)}, index=index)
+
+
+class FakeSource(MarketDataSource):
+    """Bulk downloads leave out failing tickers; single-ticker checks raise for them"""
+    
+    name = 'fake'
+    
+    def __init__(self, histories, failing=()):
+        self.histories = histories
+        self.failing = set(failing)
+        self.downloads = []
+        self.checked = []
+    
+    def info(self, ticker):
+        return {}
+    
+    def statement(self, ticker, name):
+        return pd.DataFrame()
+    
+    def download(self, tickers, period, interval='1d'):
+        self.downloads.append(list(tickers))
+        return {t: self.histories[t] for t in tickers if t in self.histories and t not in self.failing}
+    
+    def download_one(self, ticker, period):
+        self.checked.append(ticker)
+        if ticker in self.failing:
+            raise ConnectionError("upstream timed out")
+        return self.histories.get(ticker)
+
+
+@pytest.fixture
+def negative(monkeypatch):
+    cache = NegativeCache(ttl_seconds=3600)
+    monkeypatch.setattr(market_data, 'negative_cache', cache)
+    return cache
+
+
+def use_source(monkeypatch, source):
+    monkeypatch.setattr(market_data, 'market_source', source)
+    return source
+
+
+def remaining_ttl(negative, ticker):
+    status, _, expires_at = negative._entries[ticker]
+    return status, expires_at - time.time()
+
+
+def test_confirmed_missing_ticker_is_cached_for_the_full_ttl(tmp_path, monkeypatch, negative):
+    source = use_source(monkeypatch, FakeSource({'AAA': bars()}))
+    panel = PriceHistoryCache(cache_dir=str(tmp_path)).get_panel(['AAA', 'GONE'], period='1mo')
+    
+    assert list(panel['Close'].columns) == ['AAA']
+    assert source.checked == ['GONE']
+    status, ttl = remaining_ttl(negative, 'GONE')
+    assert status == NO_DATA and ttl > 3000
+    assert not negative.is_cached('AAA')
+
+
+def test_failed_confirmation_is_only_a_short_miss(tmp_path, monkeypatch, negative):
+    use_source(monkeypatch, FakeSource({'AAA': bars(), 'FLAKY': bars()}, failing={'FLAKY'}))
+    PriceHistoryCache(cache_dir=str(tmp_path)).get_panel(['AAA', 'FLAKY'], period='1mo')
+    
+    status, ttl = remaining_ttl(negative, 'FLAKY')
+    assert status == NO_DATA and ttl <= NEGATIVE_CACHE_MISS_SECONDS
+
+
+def test_ticker_recovered_by_its_own_request_is_not_cached(tmp_path, monkeypatch, negative):
+    source = use_source(monkeypatch, FakeSource({'AAA': bars(), 'LATE': bars()}))
+    source.download = lambda tickers, period, interval='1d': {'AAA': source.histories['AAA']}
+    panel = PriceHistoryCache(cache_dir=str(tmp_path)).get_panel(['AAA', 'LATE'], period='1mo')
+    
+    assert sorted(panel['Close'].columns) == ['AAA', 'LATE']
+    assert not negative.is_cached('LATE')
+
+
+def test_empty_bulk_response_marks_nothing(tmp_path, monkeypatch, negative):
+    source = use_source(monkeypatch, FakeSource({}))
+    PriceHistoryCache(cache_dir=str(tmp_path)).get_panel(['AAA', 'BBB'], period='1mo')
+    
+    assert source.checked == []
+    assert not negative.is_cached('AAA') and not negative.is_cached('BBB')
+
+
+def test_negatively_cached_ticker_is_not_requested_again(tmp_path, monkeypatch, negative):
+    source = use_source(monkeypatch, FakeSource({'AAA': bars()}))
+    cache = PriceHistoryCache(cache_dir=str(tmp_path))
+    cache.get_panel(['AAA', 'GONE'], period='1mo')
+    requests = len(source.downloads) + len(source.checked)
+    
+    cache.get_panel(['AAA', 'GONE'], period='1mo')
+    assert len(source.downloads) + len(source.checked) == requests
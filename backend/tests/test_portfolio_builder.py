@@ -0,0 +1,68 @@
+"""
+Portfolio builder tests - return samples need enough history jointly, not just per ticker
+"""
+
+import numpy as np
+import pandas as pd
+
+from portfolio_builder import PortfolioBuilder
+
+
+class FakePriceCache:
+    def __init__(self, close: pd.DataFrame):
+        self.close = close
+    
+    def get_panel(self, tickers, period='2y', fields=None):
+        return {'Close': self.close[[t for t in tickers if t in self.close.columns]]}
+
+
+def closes(days: int = 300, tickers: str = 'ABCD') -> pd.DataFrame:
+    rng = np.random.default_rng(1)
+    index = pd.bdate_range('2024-01-01', periods=days)
+    return pd.DataFrame(100 * np.exp(np.cumsum(rng.normal(0, 0.01, (days, len(tickers))), axis=0)),
+                        index=index, columns=list(tickers))
+
+
+def test_full_histories_are_all_kept():
+    returns, excluded = PortfolioBuilder(FakePriceCache(closes()))._load_returns(list('ABCD'))
+    assert list(returns.columns) == list('ABCD')
+    assert excluded == []
+    assert len(returns) == 299
+
+
+def test_ticker_below_min_observations_is_excluded():
+    close = closes()
+    close.loc[close.index[:-30], 'D'] = np.nan
+    returns, excluded = PortfolioBuilder(FakePriceCache(close))._load_returns(list('ABCD'))
+    assert excluded == ['D']
+    assert len(returns) == 299
+
+
+def test_shortest_history_is_dropped_until_the_overlap_is_long_enough():
+    close = closes()
+    close.loc[:close.index[200], 'C'] = np.nan  # Listed late: 99 bars
+    close.loc[close.index[150]:, 'D'] = np.nan  # Delisted early: 150 bars, no overlap with C
+    builder = PortfolioBuilder(FakePriceCache(close))
+    returns, excluded = builder._load_returns(list('ABCD'))
+    
+    assert list(returns.columns) == ['A', 'B', 'D']
+    assert excluded == ['C']
+    assert len(returns) >= builder.min_observations
+    assert not returns.isna().any().any()
+
+
+def test_unknown_tickers_are_reported_as_excluded():
+    returns, excluded = PortfolioBuilder(FakePriceCache(closes()))._load_returns(['a', 'B', 'NOPE'])
+    assert list(returns.columns) == ['A', 'B']
+    assert excluded == ['NOPE']
+
+
+def test_build_reports_the_overlap_it_used():
+    close = closes()
+    close.loc[:close.index[200], 'C'] = np.nan
+    close.loc[close.index[150]:, 'D'] = np.nan
+    result = PortfolioBuilder(FakePriceCache(close)).build(list('ABCD'), method='equal_weight')
+    
+    assert sorted(h['ticker'] for h in result['holdings']) == ['A', 'B', 'D']
+    assert result['excluded'] == ['C']
+    assert result['observations'] >= 60
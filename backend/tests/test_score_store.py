@@ -0,0 +1,66 @@
+"""
+Score store tests - keyset pagination over columns with NULLs and ties
+"""
+
+import pytest
+
+from score_store import ScoreStore
+
+
+ROWS = [
+    # ticker, current_price, sector (None where a screen didn't report it)
+    ('AAA', 10.0, 'Tech'), ('BBB', None, None), ('CCC', 10.0, 'energy'), ('DDD', 5.0, 'Tech'),
+    ('EEE', None, 'Health'), ('FFF', 20.0, None), ('GGG', 5.0, 'Energy'), ('HHH', None, 'tech'),
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ScoreStore(str(tmp_path / 'scores.sqlite'))
+    store.record([
+        {'ticker': t, 'current_price': price, 'sector': sector, 'fundamental_score': 20.0,
+         'technical_score': 10.0, 'risk_score': 10.0, 'total_score': None if price is None else price * 2,
+         'recommendation': 'Hold'}
+        for t, price, sector in ROWS
+    ], source='screen')
+    return store
+
+
+def expected(key, descending):
+    """SQLite order: NULLs first ascending and last descending, ties broken by ticker the same way"""
+    present = [r for r in ROWS if key(r) is not None]
+    missing = [r for r in ROWS if key(r) is None]
+    present.sort(key=lambda r: (key(r), r[0]), reverse=descending)
+    missing.sort(key=lambda r: r[0], reverse=descending)
+    return [r[0] for r in (present + missing if descending else missing + present)]
+
+
+def all_pages(store, sort, order, limit):
+    tickers, cursor, pages = [], None, 0
+    while True:
+        page = store.query(sort=sort, order=order, limit=limit, cursor=cursor)
+        tickers += [row['ticker'] for row in page['results']]
+        pages += 1
+        cursor = page['next_cursor']
+        if cursor is None or pages > len(ROWS):
+            return tickers
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3])
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+@pytest.mark.parametrize('sort, key', [
+    ('current_price', lambda r: r[1]),
+    ('total_score', lambda r: None if r[1] is None else r[1] * 2),
+    ('sector', lambda r: None if r[2] is None else r[2].lower()),  # Sectors compare case-insensitively
+    ('ticker', lambda r: r[0]),
+])
+def test_pages_follow_the_full_ordering_through_nulls(store, sort, key, order, limit):
+    assert all_pages(store, sort, order, limit) == expected(key, order == 'desc')
+
+
+def test_cursor_from_another_sort_is_rejected(store):
+    cursor = store.query(sort='current_price', order='asc', limit=2)['next_cursor']
+    with pytest.raises(ValueError):
+        store.query(sort='current_price', order='desc', limit=2, cursor=cursor)
+    with pytest.raises(ValueError):
+        store.query(sort='total_score', order='asc', limit=2, cursor='not-a-cursor')
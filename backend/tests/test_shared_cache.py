@@ -0,0 +1,77 @@
+"""
+Shared cache tests - lease exclusion, renewal, expiry and fallback when SQLite fails
+"""
+
+import threading
+import time
+
+from shared_cache import SharedCache, UNSHARED_LEASE
+
+
+def make_cache(tmp_path, lease_seconds=0.3):
+    return SharedCache(str(tmp_path / 'shared.sqlite'), lease_seconds=lease_seconds)
+
+
+def test_lease_is_exclusive_until_released(tmp_path):
+    cache, other = make_cache(tmp_path), make_cache(tmp_path)
+    token = cache.acquire('key')
+    assert token is not None
+    assert other.acquire('key') is None
+    cache.release('key', token)
+    assert other.acquire('key') is not None
+
+
+def test_held_lease_is_renewed_past_its_period(tmp_path):
+    cache, other = make_cache(tmp_path), make_cache(tmp_path)
+    token = cache.acquire('key')
+    time.sleep(1.0)  # Over three lease periods
+    assert other.acquire('key') is None
+    assert cache.stats()['lease_renewals'] > 0
+    cache.release('key', token)
+
+
+def test_abandoned_lease_expires_and_is_taken_over(tmp_path):
+    crashed, other = make_cache(tmp_path), make_cache(tmp_path)
+    assert crashed.acquire('key') is not None
+    with crashed._held_lock:
+        crashed._held.clear()  # As if the holder died: nothing renews the lease any more
+    time.sleep(0.5)
+    assert other.acquire('key') is not None
+
+
+def test_wait_for_leases_returns_once_released(tmp_path):
+    cache, other = make_cache(tmp_path), make_cache(tmp_path)
+    token = cache.acquire('key')
+    assert other.wait_for_leases(['key'], timeout=0.2) is False
+    threading.Timer(0.3, cache.release, ('key', token)).start()
+    assert other.wait_for_leases(['key'], timeout=5) is True
+
+
+def test_fill_computes_once_while_others_wait(tmp_path):
+    cache, other = make_cache(tmp_path), make_cache(tmp_path)
+    calls = []
+    
+    def compute():
+        calls.append(1)
+        time.sleep(0.3)
+        return 42
+    
+    results = []
+    threads = [threading.Thread(target=lambda c=c: results.append(c.get_or_compute('key', compute, 60)))
+               for c in (cache, other)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [42, 42]
+    assert len(calls) == 1
+
+
+def test_database_errors_fall_back_to_local_compute(tmp_path):
+    (tmp_path / 'broken.sqlite').mkdir()  # A directory can't be opened as a database
+    cache = SharedCache(str(tmp_path / 'broken.sqlite'))
+    assert cache.get('key') is None
+    assert cache.acquire('key') == UNSHARED_LEASE
+    assert cache.wait_for_leases(['key'], timeout=1) is True
+    assert cache.get_or_compute('key', lambda: 42, 60) == 42
+    assert cache.stats()['errors'] > 0
@@ -0,0 +1,80 @@
+"""
+Timeframe tests - incremental resampling matches a full rebuild, and indicators fit the history
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from price_store import PriceSeries
+from timeframes import TimeframeCache, compute_technicals, resample, _extends
+
+
+def daily(days: int, seed: int = 0, end: str = '2026-10-16') -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end=end, periods=days)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, days)))
+    return pd.DataFrame({'Open': close * 0.99, 'High': close * 1.01, 'Low': close * 0.98, 'Close': close,
+                         'Volume': rng.integers(1000, 5000, days)}, index=index)
+
+
+def pack(frame: pd.DataFrame) -> PriceSeries:
+    return PriceSeries.from_frame('AAA', frame, '2y')
+
+
+def assert_same_bars(left, right):
+    assert len(left) == len(right)
+    for field in ('days', 'open', 'high', 'low', 'close', 'volume'):
+        np.testing.assert_array_equal(getattr(left, field), getattr(right, field))
+    assert left.last_start == right.last_start
+
+
+@pytest.mark.parametrize('timeframe', ['weekly', 'monthly'])
+@pytest.mark.parametrize('appended', [1, 3, 7, 30])
+def test_appended_bars_rebuild_like_a_full_resample(timeframe, appended):
+    history = daily(520)
+    previous = resample(pack(history.iloc[:-appended]), timeframe)
+    current = pack(history)
+    
+    assert _extends(previous, current)
+    assert_same_bars(resample(current, timeframe, previous), resample(current, timeframe))
+
+
+@pytest.mark.parametrize('timeframe', ['weekly', 'monthly'])
+def test_revised_last_bar_rebuilds_like_a_full_resample(timeframe):
+    history = daily(520)
+    previous = resample(pack(history), timeframe)
+    revised = history.copy()
+    revised.iloc[-1, revised.columns.get_loc('Close')] *= 1.03
+    revised.iloc[-1, revised.columns.get_loc('High')] *= 1.05
+    current = pack(revised)
+    
+    assert_same_bars(resample(current, timeframe, previous), resample(current, timeframe))
+
+
+@pytest.mark.parametrize('timeframe', ['weekly', 'monthly'])
+def test_readjusted_history_falls_back_to_a_full_resample(timeframe):
+    history = daily(520)
+    previous = resample(pack(history.iloc[:-5]), timeframe)
+    adjusted = history.copy()
+    adjusted[['Open', 'High', 'Low', 'Close']] *= 0.5  # e.g. a split applied to the whole history
+    current = pack(adjusted)
+    
+    assert not _extends(previous, current)
+    assert_same_bars(resample(current, timeframe, previous), resample(current, timeframe))
+
+
+def test_cache_updates_incrementally_and_matches_fresh_technicals():
+    history = daily(520)
+    cache = TimeframeCache()
+    cache.get(pack(history.iloc[:-3]), 'weekly')
+    cached = cache.get(pack(history), 'weekly')
+    
+    assert cache.stats()['incremental'] == 1
+    assert cached == compute_technicals(resample(pack(history), 'weekly'))
+
+
+def test_monthly_macd_fits_two_years_of_history():
+    technicals = compute_technicals(resample(pack(daily(504)), 'monthly'))
+    assert technicals.bars <= 25
+    assert technicals.macd is not None and technicals.macd_signal is not None
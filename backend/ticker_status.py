@@ -0,0 +1,234 @@
+"""
+Ticker Status - Negative caching and circuit breaking for upstream failures
+Remembers tickers that are invalid or have no data, and fails fast while the upstream is erroring
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from config import NEGATIVE_CACHE_TTL_SECONDS, CIRCUIT_FAILURE_RATE, CIRCUIT_MIN_CALLS, CIRCUIT_COOLDOWN_SECONDS
+from shared_cache import shared_cache, cache_key, SharedEntry
+
+
+# Per-ticker error statuses reported alongside results
+INVALID = 'invalid'              # Upstream doesn't know the symbol (delisted or mistyped)
+NO_DATA = 'no_data'              # Symbol exists but has no usable price history
+UPSTREAM_ERROR = 'upstream_error'  # Request failed; not cached, the next run retries
+CIRCUIT_OPEN = 'circuit_open'    # Skipped because the upstream is currently failing
+
+
+class TickerError(Exception):
+    """A ticker could not be analyzed; carries a machine-readable status"""
+    
+    def __init__(self, ticker: str, status: str, message: str, cached: bool = False):
+        super().__init__(message)
+        self.ticker = ticker
+        self.status = status
+        self.message = message
+        self.cached = cached
+    
+    def to_dict(self) -> Dict:
+        return {
+            'ticker': self.ticker,
+            'status': self.status,
+            'message': self.message,
+            'cached': self.cached,
+        }
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the upstream while the circuit breaker is open"""
+    pass
+
+
+class NegativeCache:
+    """
+    Tickers known to be invalid or empty, remembered for a TTL so they aren't re-fetched every run
+    
+    Marks are also published to the shared cache, so a worker that waited on another's
+    download can pick up its verdict (is_cached with shared=True) instead of refetching.
+    """
+    
+    CACHEABLE = (INVALID, NO_DATA)
+    
+    def __init__(self, ttl_seconds: float = NEGATIVE_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+    
+    def mark(self, ticker: str, status: str, message: str, ttl_seconds: Optional[float] = None):
+        """Remember a failed ticker, for ttl_seconds if given (e.g. an unconfirmed miss); transient statuses are ignored"""
+        if status not in self.CACHEABLE:
+            return
+        ticker = ticker.upper().strip()
+        now = time.time()
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._entries[ticker] = (status, message, now + ttl_seconds)
+        shared_cache.set(cache_key('negative', ticker), SharedEntry((status, message), now, now + ttl_seconds, 0.0))
+    
+    def check(self, ticker: str):
+        """Raise TickerError if the ticker is negatively cached"""
+        ticker = ticker.upper().strip()
+        with self._lock:
+            entry = self._entries.get(ticker)
+            if entry is None:
+                return
+            status, message, expires_at = entry
+            if time.time() >= expires_at:
+                del self._entries[ticker]
+                return
+            self.hits += 1
+        raise TickerError(ticker, status, message, cached=True)
+    
+    def is_cached(self, ticker: str, shared: bool = False) -> bool:
+        """Whether the ticker is negatively cached (with shared, also by another worker on the host)"""
+        try:
+            self.check(ticker)
+        except TickerError:
+            return True
+        if not shared:
+            return False
+        ticker = ticker.upper().strip()
+        entry = shared_cache.get(cache_key('negative', ticker))
+        if entry is None:
+            return False
+        status, message = entry.value
+        with self._lock:
+            self._entries[ticker] = (status, message, entry.expires_at)
+        return True
+    
+    def partition(self, tickers: List[str]) -> Tuple[List[str], List[Dict]]:
+        """Split tickers into those worth fetching and error entries for the cached failures"""
+        remaining, errors = [], []
+        for ticker in tickers:
+            try:
+                self.check(ticker)
+                remaining.append(ticker)
+            except TickerError as e:
+                errors.append(e.to_dict())
+        return remaining, errors
+    
+    def clear(self, ticker: Optional[str] = None):
+        """Forget one ticker (e.g. after a symbol change), or all of them"""
+        with self._lock:
+            if ticker is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(ticker.upper().strip(), None)
+        if ticker is not None:
+            shared_cache.delete(cache_key('negative', ticker.upper().strip()))
+    
+    def stats(self) -> Dict:
+        now = time.time()
+        with self._lock:
+            live = {t: e for t, e in self._entries.items() if e[2] > now}
+        return {
+            'entries': len(live),
+            'hits': self.hits,
+            'ttl_seconds': self.ttl_seconds,
+            'tickers': sorted([{'ticker': t, 'status': e[0]} for t, e in live.items()], key=lambda x: x['ticker']),
+        }
+
+
+class CircuitBreaker:
+    """
+    Opens when the recent upstream failure rate spikes, then lets a single probe through
+    after a cooldown; a successful probe closes it again
+    """
+    
+    def __init__(self, failure_rate: float = CIRCUIT_FAILURE_RATE, min_calls: int = CIRCUIT_MIN_CALLS,
+                 cooldown_seconds: float = CIRCUIT_COOLDOWN_SECONDS, window: int = 50):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.cooldown_seconds = cooldown_seconds
+        self._outcomes: deque = deque(maxlen=window)  # True for failure
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.trips = 0
+    
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+    
+    def before_call(self):
+        """Raise CircuitOpenError if calls are currently blocked"""
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return
+            if state == 'half_open' and not self._probing:
+                self._probing = True
+                return
+            self.rejected += 1
+        raise CircuitOpenError("Market data provider is failing; request skipped until it recovers")
+    
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                if not self._probing:
+                    return  # A call admitted before the trip; only the probe decides
+                # Probe succeeded: start over with a clean history
+                self._opened_at = None
+                self._probing = False
+                self._outcomes.clear()
+            self._outcomes.append(False)
+    
+    def record_failure(self):
+        with self._lock:
+            if self._opened_at is not None:
+                if self._probing:
+                    # Probe failed: stay open for another cooldown
+                    self._opened_at = time.time()
+                    self._probing = False
+                return
+            self._outcomes.append(True)
+            failures = sum(self._outcomes)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+                self._opened_at = time.time()
+                self.trips += 1
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            calls = len(self._outcomes)
+            return {
+                'state': self._state(),
+                'recent_calls': calls,
+                'recent_failure_rate': round(sum(self._outcomes) / calls, 3) if calls else 0.0,
+                'trips': self.trips,
+                'rejected': self.rejected,
+            }
+    
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return 'closed'
+        if time.time() - self._opened_at >= self.cooldown_seconds:
+            return 'half_open'
+        return 'open'
+
+
+def error_entry(ticker: str, error: Exception) -> Dict:
+    """Structured per-ticker error for API responses"""
+    if isinstance(error, TickerError):
+        return error.to_dict()
+    if isinstance(error, CircuitOpenError):
+        return TickerError(ticker, CIRCUIT_OPEN, str(error)).to_dict()
+    return TickerError(ticker, UPSTREAM_ERROR, str(error)).to_dict()
+
+
+def summarize_errors(errors: List[Dict]) -> Dict[str, int]:
+    """Count of errors by status"""
+    counts: Dict[str, int] = {}
+    for error in errors:
+        counts[error['status']] = counts.get(error['status'], 0) + 1
+    return counts
+
+
+# Process-wide negative cache shared by the analyzer, screener and price cache
+negative_cache = NegativeCache()
@@ -0,0 +1,259 @@
+"""
+Timeframes - Weekly and monthly bars and indicators derived from the cached daily history
+Resamples the compact daily arrays with vectorized reductions, so other timeframes cost no upstream requests
+"""
+
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from models import TimeframeTechnicals
+from price_store import PriceSeries, days_to_index
+
+
+TIMEFRAMES = ['daily', 'weekly', 'monthly']
+
+# Moving-average windows (short, long), MACD spans (fast, slow, signal) and support/resistance
+# lookback, in bars of each timeframe. Daily matches TechnicalMetrics (50/200-day, MACD 12/26/9,
+# 60 bars); weekly uses the classic 10/40-week pair. Monthly is shortened to fit the two years
+# (~24 bars) of history the analyzer keeps cached rather than fetching more: MACD 12/26/9 would
+# need 34 monthly bars, so monthly uses 6/12/4 (half-year against one-year trend).
+TIMEFRAME_SETTINGS = {
+    'daily': {'ma': (50, 200), 'macd': (12, 26, 9), 'lookback': 60},
+    'weekly': {'ma': (10, 40), 'macd': (12, 26, 9), 'lookback': 13},
+    'monthly': {'ma': (6, 12), 'macd': (6, 12, 4), 'lookback': 6},
+}
+RSI_WINDOW = 14
+
+
+def parse_timeframes(text: Optional[str]) -> List[str]:
+    """Comma-separated timeframe names ('all' for every timeframe)"""
+    if not text:
+        return []
+    names = [t.strip().lower() for t in text.split(',') if t.strip()]
+    if 'all' in names:
+        return list(TIMEFRAMES)
+    unknown = [t for t in names if t not in TIMEFRAMES]
+    if unknown:
+        raise ValueError(f"Unknown timeframe(s): {', '.join(unknown)}. Choose from: {', '.join(TIMEFRAMES)}, all")
+    return list(dict.fromkeys(names))
+
+
+def period_ids(days: np.ndarray, timeframe: str) -> np.ndarray:
+    """Bucket number of each daily bar (day numbers since 1970-01-01)"""
+    days = days.astype(np.int64)
+    if timeframe == 'weekly':
+        return (days + 3) // 7  # Weeks start on Monday; 1970-01-01 was a Thursday
+    if timeframe == 'monthly':
+        return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    return days
+
+
+class ResampledBars:
+    """
+    OHLCV bars of one timeframe, each dated by its last trading day
+    
+    source_len, last_start and anchor record where the newest (possibly still open) bar
+    begins in the daily series, so new daily bars only rebuild the bars from there on.
+    """
+    
+    __slots__ = ('timeframe', 'days', 'open', 'high', 'low', 'close', 'volume',
+                 'source_len', 'last_start', 'anchor')
+    
+    def __init__(self, timeframe: str, days: np.ndarray, open_: np.ndarray, high: np.ndarray,
+                 low: np.ndarray, close: np.ndarray, volume: np.ndarray, source_len: int,
+                 last_start: int, anchor: tuple):
+        self.timeframe = timeframe
+        self.days = days
+        self.open = open_
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.source_len = source_len
+        self.last_start = last_start
+        self.anchor = anchor
+    
+    def __len__(self) -> int:
+        return len(self.days)
+    
+    def frame(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            'Open': self.open, 'High': self.high, 'Low': self.low, 'Close': self.close, 'Volume': self.volume,
+        }, index=days_to_index(self.days))
+
+
+def resample(series: PriceSeries, timeframe: str, previous: Optional[ResampledBars] = None) -> ResampledBars:
+    """
+    Aggregate daily bars into timeframe bars (open first, high max, low min, close last, volume sum)
+    
+    With previous bars built from an earlier version of the same series, only the bars from
+    the previous newest bar on are recomputed, provided the earlier daily bars are unchanged
+    (a re-adjusted history is rebuilt in full).
+    """
+    start = 0
+    if previous is not None and _extends(previous, series):
+        start = previous.last_start
+    
+    days = series.days[start:]
+    ids = period_ids(days, timeframe)
+    firsts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]]) if len(ids) else np.zeros(0, dtype=np.int64)
+    lasts = np.r_[firsts[1:], len(ids)] - 1 if len(ids) else firsts
+    
+    prices = series.prices[:, start:].astype(np.float64)
+    volume = series.volume[start:]
+    if len(firsts):
+        tail = {
+            'days': days[lasts],
+            'open': prices[0, firsts],
+            'high': np.fmax.reduceat(prices[1], firsts),
+            'low': np.fmin.reduceat(prices[2], firsts),
+            'close': prices[3, lasts],
+            'volume': np.add.reduceat(volume, firsts),
+        }
+    else:
+        tail = {k: np.zeros(0) for k in ('days', 'open', 'high', 'low', 'close', 'volume')}
+    
+    if start:
+        keep = len(previous) - 1
+        head = {'days': previous.days, 'open': previous.open, 'high': previous.high, 'low': previous.low,
+                'close': previous.close, 'volume': previous.volume}
+        columns = {k: np.concatenate([head[k][:keep], tail[k]]) for k in head}
+    else:
+        columns = tail
+    
+    last_start = start + int(firsts[-1]) if len(firsts) else 0
+    return ResampledBars(
+        timeframe, columns['days'], columns['open'], columns['high'], columns['low'], columns['close'],
+        columns['volume'], len(series), last_start, _anchor(series, last_start)
+    )
+
+
+def _anchor(series: PriceSeries, last_start: int) -> tuple:
+    """First day of the newest bar and the daily close just before it"""
+    if len(series) == 0:
+        return ()
+    before = float(series.prices[3, last_start - 1]) if last_start > 0 else None
+    return (int(series.days[last_start]), before)
+
+
+def _extends(previous: ResampledBars, series: PriceSeries) -> bool:
+    """Whether series is previous's source with bars appended (or its newest bar revised)"""
+    if len(previous) < 2 or len(series) < previous.source_len or not previous.anchor:
+        return False
+    day, before = previous.anchor
+    i = previous.last_start
+    if int(series.days[i]) != day:
+        return False
+    return before is not None and i > 0 and float(series.prices[3, i - 1]) == before
+
+
+def compute_technicals(bars: ResampledBars) -> TimeframeTechnicals:
+    """Moving averages, RSI(14), MACD, support/resistance and trend on a timeframe's bars"""
+    settings = TIMEFRAME_SETTINGS[bars.timeframe]
+    short_window, long_window = settings['ma']
+    fast, slow, signal_span = settings['macd']
+    result = TimeframeTechnicals(
+        timeframe=bars.timeframe, bars=len(bars),
+        ma_short_window=short_window, ma_long_window=long_window, macd_spans=[fast, slow, signal_span]
+    )
+    if len(bars) == 0:
+        return result
+    close = pd.Series(bars.close)
+    price = float(close.iloc[-1])
+    result.last_bar_date = days_to_index(bars.days[-1:])[0].strftime('%Y-%m-%d')
+    
+    # Moving averages (each needs a full window)
+    if len(close) >= short_window:
+        result.ma_short = float(close.iloc[-short_window:].mean())
+        result.price_vs_ma_short = (price - result.ma_short) / result.ma_short * 100
+    if len(close) >= long_window:
+        result.ma_long = float(close.iloc[-long_window:].mean())
+        result.price_vs_ma_long = (price - result.ma_long) / result.ma_long * 100
+    
+    # RSI - Wilder smoothing, as in ta's RSIIndicator
+    diff = close.diff()
+    up = diff.where(diff > 0, 0.0).ewm(alpha=1 / RSI_WINDOW, min_periods=RSI_WINDOW, adjust=False).mean()
+    down = (-diff).where(diff < 0, 0.0).ewm(alpha=1 / RSI_WINDOW, min_periods=RSI_WINDOW, adjust=False).mean()
+    if pd.notna(down.iloc[-1]):
+        result.rsi_14 = 100.0 if down.iloc[-1] == 0 else float(100 - 100 / (1 + up.iloc[-1] / down.iloc[-1]))
+    
+    # MACD, as in ta's MACD
+    macd = (
+        close.ewm(span=fast, min_periods=fast, adjust=False).mean() -
+        close.ewm(span=slow, min_periods=slow, adjust=False).mean()
+    )
+    signal = macd.ewm(span=signal_span, min_periods=signal_span, adjust=False).mean()
+    if pd.notna(macd.iloc[-1]):
+        result.macd = float(macd.iloc[-1])
+    if pd.notna(signal.iloc[-1]):
+        result.macd_signal = float(signal.iloc[-1])
+        result.macd_histogram = float(macd.iloc[-1] - signal.iloc[-1])
+    
+    # Support and resistance (recent lows/highs)
+    lookback = settings['lookback']
+    result.support_level = float(np.nanmin(bars.low[-lookback:]))
+    result.resistance_level = float(np.nanmax(bars.high[-lookback:]))
+    
+    # Trend direction, as for daily technicals
+    result.trend_direction = "Neutral"
+    if result.ma_short is not None and result.ma_long is not None:
+        if price > result.ma_short > result.ma_long and result.price_vs_ma_short > 2:
+            result.trend_direction = "Bullish"
+        elif price < result.ma_short < result.ma_long and result.price_vs_ma_short < -2:
+            result.trend_direction = "Bearish"
+    return result
+
+
+class TimeframeCache:
+    """
+    Resampled bars and their indicators per (ticker, timeframe), kept in step with the daily series
+    
+    Indicators are recomputed only when the bars change; bars are rebuilt incrementally from
+    the newest bar on when daily bars are appended. Register on_series as a price cache
+    listener to update cached tickers as soon as new daily bars load.
+    """
+    
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'incremental': 0, 'full': 0}
+    
+    def get(self, series: PriceSeries, timeframe: str) -> TimeframeTechnicals:
+        """Indicators for a ticker's daily series resampled to timeframe"""
+        key = (series.ticker, timeframe)
+        version = (len(series), int(series.days[-1]) if len(series) else None,
+                   float(series.prices[3, -1]) if len(series) else None, series.period)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if entry[0] == version:
+                    self.counters['hits'] += 1
+                    return entry[2]
+        previous = entry[1] if entry is not None else None
+        bars = resample(series, timeframe, previous)
+        technicals = compute_technicals(bars)
+        with self._lock:
+            self.counters['incremental' if previous is not None and _extends(previous, series) else 'full'] += 1
+            self._entries[key] = (version, bars, technicals)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return technicals
+    
+    def on_series(self, series: PriceSeries):
+        """Bring already cached timeframes of a ticker up to date with a newly loaded series"""
+        with self._lock:
+            cached = [tf for tf in TIMEFRAMES if (series.ticker, tf) in self._entries]
+        for timeframe in cached:
+            self.get(series, timeframe)
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'max_entries': self.max_entries, **self.counters}
+
@@ -0,0 +1,227 @@
+"""
+Upstream HTTP - Pooled keep-alive connections for every market-data request
+One curl session (Yahoo) or httpx client (HTTP source) per worker, with bounded pools, timeouts and per-phase request timing
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+from curl_cffi import CurlInfo, CurlOpt
+from curl_cffi import requests as curl_requests
+
+from config import (
+    UPSTREAM_POOL_SIZE, UPSTREAM_CONNECT_TIMEOUT, UPSTREAM_READ_TIMEOUT, UPSTREAM_KEEPALIVE_SECONDS
+)
+
+
+# Request phases in seconds: DNS lookup, TCP connect, TLS handshake, waiting for the first
+# response byte after the request was sent, receiving the body, and the whole request.
+# A request on a reused keep-alive connection spends nothing in dns/connect/tls.
+PHASES = ['dns', 'connect', 'tls', 'wait', 'transfer', 'total']
+
+_CURL_INFOS = [
+    CurlInfo.NAMELOOKUP_TIME, CurlInfo.CONNECT_TIME, CurlInfo.APPCONNECT_TIME,
+    CurlInfo.PRETRANSFER_TIME, CurlInfo.STARTTRANSFER_TIME, CurlInfo.TOTAL_TIME, CurlInfo.NUM_CONNECTS,
+]
+
+
+class RequestTimings:
+    """Request counts, connection reuse and phase durations per upstream"""
+    
+    def __init__(self, recent: int = 500):
+        self.recent = recent
+        self._lock = threading.Lock()
+        self._upstreams: Dict[str, Dict] = {}
+    
+    def record(self, upstream: str, phases: Dict[str, float], new_connection: bool):
+        """Add one completed request"""
+        with self._lock:
+            entry = self._entry(upstream)
+            entry['requests'] += 1
+            entry['new_connections'] += int(new_connection)
+            for phase in PHASES:
+                value = max(phases.get(phase, 0.0), 0.0)
+                entry['totals'][phase] += value
+                entry['recent'][phase].append(value)
+    
+    def record_error(self, upstream: str):
+        """Count a request that failed before a response arrived (timeouts, refused connections)"""
+        with self._lock:
+            self._entry(upstream)['errors'] += 1
+    
+    def stats(self) -> Dict:
+        """Per upstream: requests, errors, connection reuse and average/p95 milliseconds per phase"""
+        with self._lock:
+            result = {}
+            for upstream, entry in self._upstreams.items():
+                requests = entry['requests']
+                phases = {}
+                for phase in PHASES:
+                    recent = sorted(entry['recent'][phase])
+                    phases[phase] = {
+                        'avg_ms': round(entry['totals'][phase] / requests * 1000, 2) if requests else 0.0,
+                        'p95_ms': round(recent[int(0.95 * (len(recent) - 1))] * 1000, 2) if recent else 0.0,
+                    }
+                result[upstream] = {
+                    'requests': requests,
+                    'errors': entry['errors'],
+                    'new_connections': entry['new_connections'],
+                    'reused_share': round(1 - entry['new_connections'] / requests, 3) if requests else 0.0,
+                    'phases': phases,
+                }
+            return result
+    
+    def _entry(self, upstream: str) -> Dict:
+        entry = self._upstreams.get(upstream)
+        if entry is None:
+            entry = {
+                'requests': 0, 'errors': 0, 'new_connections': 0,
+                'totals': {p: 0.0 for p in PHASES},
+                'recent': {p: deque(maxlen=self.recent) for p in PHASES},
+            }
+            self._upstreams[upstream] = entry
+        return entry
+
+
+# Process-wide timings of every upstream HTTP request
+request_timings = RequestTimings()
+
+
+def curl_phases(infos: Dict) -> Dict[str, float]:
+    """Phase durations from libcurl's cumulative timers"""
+    dns = infos.get(CurlInfo.NAMELOOKUP_TIME, 0.0)
+    connect = infos.get(CurlInfo.CONNECT_TIME, 0.0)
+    tls = infos.get(CurlInfo.APPCONNECT_TIME, 0.0)  # 0 for plain HTTP and reused connections
+    pretransfer = infos.get(CurlInfo.PRETRANSFER_TIME, 0.0)
+    first_byte = infos.get(CurlInfo.STARTTRANSFER_TIME, 0.0)
+    total = infos.get(CurlInfo.TOTAL_TIME, 0.0)
+    return {
+        'dns': dns,
+        'connect': connect - dns if connect else 0.0,
+        'tls': tls - connect if tls else 0.0,
+        'wait': first_byte - pretransfer,
+        'transfer': total - first_byte,
+        'total': total,
+    }
+
+
+class TimedSession(curl_requests.Session):
+    """
+    curl_cffi session (as yfinance uses) that records every request's phase timings
+    
+    Each thread gets its own curl handle, and with it its own keep-alive connection cache,
+    so the session is meant to be used from the long-lived threads of an UpstreamPool.
+    A plain timeout from the caller (yfinance passes its own) becomes the read timeout,
+    with connect_timeout bounding the connection setup.
+    """
+    
+    def __init__(self, upstream: str = 'yahoo', connect_timeout: float = UPSTREAM_CONNECT_TIMEOUT,
+                 read_timeout: float = UPSTREAM_READ_TIMEOUT, keepalive: float = UPSTREAM_KEEPALIVE_SECONDS,
+                 max_connections: int = 4, timings: RequestTimings = None, **kwargs):
+        curl_options = {
+            CurlOpt.MAXCONNECTS: max_connections,  # Idle connections kept per thread (Yahoo uses a few hosts)
+            CurlOpt.MAXAGE_CONN: int(keepalive),
+            CurlOpt.TCP_KEEPALIVE: 1,
+        }
+        super().__init__(
+            timeout=(connect_timeout, read_timeout), curl_options=curl_options, curl_infos=_CURL_INFOS, **kwargs
+        )
+        self.upstream = upstream
+        self.connect_timeout = connect_timeout
+        self.timings = timings or request_timings
+    
+    def request(self, method, url, *args, **kwargs):
+        timeout = kwargs.get('timeout')
+        if isinstance(timeout, (int, float)) and not isinstance(timeout, bool):
+            kwargs['timeout'] = (self.connect_timeout, timeout)
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except Exception:
+            self.timings.record_error(self.upstream)
+            raise
+        self.timings.record(self.upstream, curl_phases(response.infos),
+                            new_connection=bool(response.infos.get(CurlInfo.NUM_CONNECTS)))
+        return response
+
+
+class UpstreamPool:
+    """
+    Fixed set of long-lived threads that perform the blocking upstream requests
+    
+    Keeps the number of upstream connections bounded by the pool size, and lets each
+    thread's keep-alive connections be reused by every call it runs instead of being torn
+    down with short-lived threads.
+    """
+    
+    def __init__(self, size: int = UPSTREAM_POOL_SIZE):
+        self.size = size
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix='upstream')
+    
+    def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Call fn on a pool thread and wait for its result"""
+        return self._executor.submit(fn, *args, **kwargs).result()
+
+
+class _Trace:
+    """httpcore trace callback that records one request's phase timings"""
+    
+    __slots__ = ('upstream', 'timings', 'started', 'marks')
+    
+    def __init__(self, upstream: str, timings: RequestTimings):
+        self.upstream = upstream
+        self.timings = timings
+        self.started = time.perf_counter()
+        self.marks: Dict[str, float] = {}
+    
+    def __call__(self, event: str, info: Dict):
+        self.marks[event] = time.perf_counter()
+        if event.endswith('receive_response_body.complete'):
+            self._finish()
+    
+    def _span(self, start: str, end: str) -> float:
+        start_at = next((t for e, t in self.marks.items() if e.endswith(start)), None)
+        end_at = next((t for e, t in self.marks.items() if e.endswith(end)), None)
+        return end_at - start_at if start_at is not None and end_at is not None else 0.0
+    
+    def _finish(self):
+        now = time.perf_counter()
+        self.timings.record(self.upstream, {
+            'connect': self._span('connect_tcp.started', 'connect_tcp.complete'),
+            'tls': self._span('start_tls.started', 'start_tls.complete'),
+            'wait': self._span('send_request_body.complete', 'receive_response_headers.complete'),
+            'transfer': self._span('receive_response_body.started', 'receive_response_body.complete'),
+            'total': now - self.started,
+        }, new_connection=any(e.endswith('connect_tcp.complete') for e in self.marks))
+
+
+def make_http_client(base_url: str, upstream: str = 'http', pool_size: int = UPSTREAM_POOL_SIZE,
+                     connect_timeout: float = UPSTREAM_CONNECT_TIMEOUT, read_timeout: float = UPSTREAM_READ_TIMEOUT,
+                     keepalive: float = UPSTREAM_KEEPALIVE_SECONDS,
+                     timings: Optional[RequestTimings] = None) -> httpx.Client:
+    """
+    httpx client with a bounded keep-alive pool whose requests record their phase timings
+    
+    Args:
+        base_url: Upstream base URL
+        upstream: Name the timings are reported under
+        pool_size: Maximum open (and idle keep-alive) connections
+        connect_timeout: Seconds allowed to establish a connection
+        read_timeout: Seconds allowed between received bytes (and for writes and pool waits)
+        keepalive: Seconds an idle connection is kept for reuse
+    """
+    timings = timings or request_timings
+    
+    def trace_request(request: httpx.Request):
+        request.extensions['trace'] = _Trace(upstream, timings)
+    
+    return httpx.Client(
+        base_url=base_url,
+        timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size,
+                            keepalive_expiry=keepalive),
+        event_hooks={'request': [trace_request]},
+    )
@@ -0,0 +1,192 @@
+"""
+Upstream Scheduler - Priority-aware gate for every market-data request
+Interactive requests jump ahead of screens and prefetches under a shared rate budget and per-class concurrency caps
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional
+
+import yfinance as yf
+
+from config import (
+    UPSTREAM_RATE_PER_SECOND, UPSTREAM_BURST, UPSTREAM_MAX_CONCURRENCY, UPSTREAM_CLASS_CONCURRENCY
+)
+from ticker_status import CircuitBreaker
+
+
+PRIORITIES = ['interactive', 'screen', 'prefetch']  # Highest first
+
+# Errors caused by a bad symbol rather than a failing upstream; they don't count toward the circuit breaker.
+# Older yfinance releases have no dedicated exception, so nothing is treated as a symbol error there.
+SYMBOL_ERRORS = tuple(
+    error for error in [getattr(getattr(yf, 'exceptions', None), 'YFTickerMissingError', None)] if error
+)
+
+_current_priority: ContextVar[str] = ContextVar('upstream_priority', default='screen')
+
+
+@contextmanager
+def priority(name: str):
+    """Tag upstream requests made inside the block (in this thread or task) with a priority class"""
+    if name not in PRIORITIES:
+        raise ValueError(f"Unknown priority '{name}'. Choose from: {', '.join(PRIORITIES)}")
+    token = _current_priority.set(name)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def with_priority(name: str, fn: Callable, *args, **kwargs) -> Any:
+    """Call fn with its upstream requests tagged with a priority class"""
+    with priority(name):
+        return fn(*args, **kwargs)
+
+
+class UpstreamScheduler:
+    """
+    Admits upstream calls in priority order
+    
+    A call runs once its tokens from the global rate budget are available, the total number
+    of running calls is under max_concurrency, and its class is under its own cap. A call
+    costs one token per upstream HTTP request it makes, so bulk downloads are charged for
+    every request rather than once. Lower
+    classes are capped below the total, so some capacity is always left for interactive calls.
+    While the circuit breaker is open, calls fail fast with CircuitOpenError instead of queueing.
+    """
+    
+    def __init__(self, rate: float = UPSTREAM_RATE_PER_SECOND, burst: float = UPSTREAM_BURST,
+                 max_concurrency: int = UPSTREAM_MAX_CONCURRENCY,
+                 class_concurrency: Optional[Dict[str, int]] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.class_concurrency = dict(class_concurrency or UPSTREAM_CLASS_CONCURRENCY)
+        self.breaker = breaker or CircuitBreaker()
+        
+        self._tokens = burst
+        self._refilled_at = time.monotonic()
+        self._queues: Dict[str, deque] = {p: deque() for p in PRIORITIES}
+        self._running: Dict[str, int] = {p: 0 for p in PRIORITIES}
+        self._cond = threading.Condition()
+        
+        self._completed: Dict[str, int] = {p: 0 for p in PRIORITIES}
+        self._total_wait: Dict[str, float] = {p: 0.0 for p in PRIORITIES}
+        self._recent_waits: Dict[str, deque] = {p: deque(maxlen=500) for p in PRIORITIES}
+    
+    def call(self, fn: Callable, *args, priority: Optional[str] = None, cost: float = 1, **kwargs) -> Any:
+        """
+        Run a blocking upstream call once the scheduler admits it
+        
+        Args:
+            fn: Function performing the request
+            priority: Priority class; defaults to the class set by priority() for the caller
+            cost: Tokens the call uses, i.e. the upstream requests it makes
+        
+        Returns:
+            Whatever fn returns; exceptions propagate to the caller
+        
+        Raises:
+            CircuitOpenError: The upstream is failing and the call was not attempted
+        """
+        name = priority or _current_priority.get()
+        if name not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{name}'. Choose from: {', '.join(PRIORITIES)}")
+        
+        self.breaker.before_call()
+        self._acquire(name, cost)
+        try:
+            result = fn(*args, **kwargs)
+        except SYMBOL_ERRORS:
+            self.breaker.record_success()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        finally:
+            self._release(name)
+        self.breaker.record_success()
+        return result
+    
+    def stats(self) -> Dict:
+        """Queue depth, running calls and wait times per priority class"""
+        with self._cond:
+            self._refill()
+            classes = {}
+            for name in PRIORITIES:
+                waits = sorted(self._recent_waits[name])
+                completed = self._completed[name]
+                classes[name] = {
+                    'queued': len(self._queues[name]),
+                    'running': self._running[name],
+                    'concurrency_cap': self.class_concurrency.get(name, self.max_concurrency),
+                    'admitted': completed,
+                    'avg_wait_ms': round(self._total_wait[name] / completed * 1000, 1) if completed else 0.0,
+                    'p95_wait_ms': round(waits[int(0.95 * (len(waits) - 1))] * 1000, 1) if waits else 0.0,
+                    'max_wait_ms': round(waits[-1] * 1000, 1) if waits else 0.0,
+                }
+            return {
+                'rate_per_second': self.rate,
+                'burst': self.burst,
+                'tokens_available': round(self._tokens, 2),
+                'max_concurrency': self.max_concurrency,
+                'running': sum(self._running.values()),
+                'classes': classes,
+                'circuit_breaker': self.breaker.stats(),
+            }
+    
+    def _acquire(self, name: str, cost: float = 1):
+        # A call costing more than the burst waits for a full bucket and leaves it in debt,
+        # which later calls wait out, so the long-run rate still holds
+        needed = min(cost, self.burst)
+        ticket = object()
+        enqueued = time.monotonic()
+        with self._cond:
+            self._queues[name].append(ticket)
+            while True:
+                self._refill()
+                if self._next_admissible() is ticket:
+                    if self._tokens >= needed:
+                        break
+                    # Sleep just until enough tokens have arrived
+                    self._cond.wait((needed - self._tokens) / self.rate)
+                else:
+                    self._cond.wait()
+            
+            self._queues[name].popleft()
+            self._running[name] += 1
+            self._tokens -= cost
+            waited = time.monotonic() - enqueued
+            self._completed[name] += 1
+            self._total_wait[name] += waited
+            self._recent_waits[name].append(waited)
+            self._cond.notify_all()
+    
+    def _release(self, name: str):
+        with self._cond:
+            self._running[name] -= 1
+            self._cond.notify_all()
+    
+    def _next_admissible(self) -> Optional[object]:
+        """Head of the highest-priority queue whose class still has a free slot"""
+        if sum(self._running.values()) >= self.max_concurrency:
+            return None
+        for name in PRIORITIES:
+            queue = self._queues[name]
+            if queue and self._running[name] < self.class_concurrency.get(name, self.max_concurrency):
+                return queue[0]
+        return None
+    
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+
+# Process-wide scheduler shared by every module that talks to the market-data provider
+scheduler = UpstreamScheduler()
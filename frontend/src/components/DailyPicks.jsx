@@ -5,11 +5,33 @@ function DailyPicks() {
   const [picks, setPicks] = useState(null)
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState(null)
+  const [livePrices, setLivePrices] = useState({})
 
   useEffect(() => {
     loadDailyPicks()
   }, [])
 
+  // Subscribe to live quotes for the current picks instead of re-running the whole pipeline
+  useEffect(() => {
+    if (!picks?.results?.length) return
+
+    const tickers = picks.results.map((stock) => stock.ticker).join(',')
+    const source = new EventSource(`/api/quotes/stream?tickers=${encodeURIComponent(tickers)}`)
+
+    source.onmessage = (event) => {
+      const update = JSON.parse(event.data)
+      setLivePrices((prev) => {
+        const next = { ...prev }
+        Object.entries(update.quotes || {}).forEach(([ticker, quote]) => {
+          next[ticker] = quote.price
+        })
+        return next
+      })
+    }
+
+    return () => source.close()
+  }, [picks])
+
   const loadDailyPicks = async () => {
     setLoading(true)
     setError(null)
@@ -318,7 +340,7 @@ function DailyPicks() {
                   <h3 className="text-xl font-bold text-gray-900">{stock.ticker}</h3>
                   <p className="text-sm text-gray-600">{stock.company_name}</p>
                   <p className="text-lg font-semibold text-gray-900 mt-1">
-                    ${stock.current_price?.toFixed(2) || 'N/A'}
+                    ${(livePrices[stock.ticker] ?? stock.current_price)?.toFixed(2) || 'N/A'}
                   </p>
                 </div>
               </div>
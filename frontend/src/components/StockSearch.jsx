@@ -1,19 +1,54 @@
-import React, { useState } from 'react'
+import React, { useState, useEffect } from 'react'
 
 function StockSearch({ onAnalyze }) {
   const [ticker, setTicker] = useState('')
+  const [suggestions, setSuggestions] = useState([])
+  const [showSuggestions, setShowSuggestions] = useState(false)
+
+  useEffect(() => {
+    const query = ticker.trim()
+    if (!query) {
+      setSuggestions([])
+      return
+    }
+
+    // Debounce keystrokes and ignore responses for stale queries
+    let cancelled = false
+    const timer = setTimeout(async () => {
+      try {
+        const response = await fetch(`/api/search/${encodeURIComponent(query)}?limit=8`)
+        if (!response.ok) return
+        const data = await response.json()
+        if (!cancelled) setSuggestions(data.results || [])
+      } catch (err) {
+        if (!cancelled) setSuggestions([])
+      }
+    }, 150)
+
+    return () => {
+      cancelled = true
+      clearTimeout(timer)
+    }
+  }, [ticker])
 
   const handleSubmit = (e) => {
     e.preventDefault()
     if (ticker.trim()) {
+      setShowSuggestions(false)
       onAnalyze(ticker.trim().toUpperCase())
     }
   }
 
+  const handleSelect = (symbol) => {
+    setTicker(symbol.ticker)
+    setShowSuggestions(false)
+    onAnalyze(symbol.ticker)
+  }
+
   return (
     <div className="bg-white rounded-lg shadow-sm border border-gray-200 p-6">
       <form onSubmit={handleSubmit} className="flex gap-4">
-        <div className="flex-1">
+        <div className="flex-1 relative">
           <label htmlFor="ticker" className="block text-sm font-medium text-gray-700 mb-2">
             Enter Stock Ticker Symbol
           </label>
@@ -21,11 +56,39 @@ function StockSearch({ onAnalyze }) {
             type="text"
             id="ticker"
             value={ticker}
-            onChange={(e) => setTicker(e.target.value)}
+            onChange={(e) => {
+              setTicker(e.target.value)
+              setShowSuggestions(true)
+            }}
+            onFocus={() => setShowSuggestions(true)}
+            onBlur={() => setTimeout(() => setShowSuggestions(false), 150)}
             placeholder="e.g., AAPL, MSFT, GOOGL"
             className="w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-blue-500"
+            autoComplete="off"
             required
           />
+          {showSuggestions && suggestions.length > 0 && (
+            <ul className="absolute z-10 mt-1 w-full bg-white border border-gray-200 rounded-lg shadow-lg max-h-72 overflow-y-auto">
+              {suggestions.map((symbol) => (
+                <li key={symbol.ticker}>
+                  <button
+                    type="button"
+                    onMouseDown={(e) => e.preventDefault()}
+                    onClick={() => handleSelect(symbol)}
+                    className="w-full text-left px-4 py-2 hover:bg-blue-50 flex justify-between items-center"
+                  >
+                    <span>
+                      <span className="font-semibold text-gray-900">{symbol.ticker}</span>
+                      <span className="ml-2 text-sm text-gray-600">{symbol.name}</span>
+                    </span>
+                    {symbol.exchange && (
+                      <span className="text-xs text-gray-400">{symbol.exchange}</span>
+                    )}
+                  </button>
+                </li>
+              ))}
+            </ul>
+          )}
           <p className="mt-2 text-xs text-gray-500">
             Supports U.S. stocks listed on NYSE and NASDAQ
           </p>
@@ -44,4 +107,3 @@ function StockSearch({ onAnalyze }) {
 }
 
 export default StockSearch
-